@@ -2,7 +2,7 @@ import asyncio
 import json
 import logging
 import sys
-from scraper_engine import ScraperEngine
+from scraper_engine import BrowserPool, ScraperEngine
 from matcher_logic import MatchingEngine
 
 # Enterprise Logging Configuration tailored for SOC Analyst 
@@ -21,18 +21,21 @@ async def main():
     logger.info("[ORCHESTRATOR_INIT] Launching secure price correlation pipeline.")
     
     # Provision components
-    engine = ScraperEngine()
     matcher = MatchingEngine(threshold=90)
     
     # Replace URLs with the specific product layout directories based on platform taxonomy
     url_visuar = "https://www.visuar.com.py/" 
     url_bristol = "https://www.bristol.com.py/"
     
-    logger.info("[PIPELINE_PHASE] Commencing Source A ingestion")
-    visuar_products = await engine.scrape_visuar(url_visuar)
-    
-    logger.info("[PIPELINE_PHASE] Commencing Source B ingestion")
-    bristol_products = await engine.scrape_bristol(url_bristol)
+    # Both sources share one browser
+    async with BrowserPool() as pool:
+        engine = ScraperEngine(pool)
+
+        logger.info("[PIPELINE_PHASE] Commencing Source A ingestion")
+        visuar_products = await engine.scrape_visuar(url_visuar)
+
+        logger.info("[PIPELINE_PHASE] Commencing Source B ingestion")
+        bristol_products = await engine.scrape_bristol(url_bristol)
     
     logger.info("[PIPELINE_PHASE] Invoking correlation heuristics")
     final_payload = matcher.compare(visuar_products, bristol_products)
@@ -0,0 +1,46 @@
+"""
+Backend modules shared with the production scraper (market_intelligence/backend).
+
+Loads exactly the modules this prototype reuses by file path instead of putting
+the whole backend directory on sys.path, where its scraper_engine.py and the one
+in this directory would shadow each other depending on import order.
+
+The backend modules import each other by bare name (browser_pool does
+`import resource_blocking`), so each one is registered in sys.modules under
+that name before the next is loaded; dependencies come first in _SHARED.
+A same-named module imported from anywhere else is an error, not a silent mix.
+"""
+import importlib.util
+import os
+import sys
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "market_intelligence", "backend")
+
+# Dependency order: asset_cache <- resource_blocking <- browser_pool -> browser_state
+_SHARED = ("asset_cache", "resource_blocking", "browser_state", "browser_pool", "extraction", "waits")
+
+
+def _load(name: str):
+    path = os.path.join(BACKEND_DIR, f"{name}.py")
+    loaded = sys.modules.get(name)
+    if loaded is not None:
+        if os.path.abspath(getattr(loaded, "__file__", "") or "") != path:
+            raise ImportError(f"{name!r} is already imported from {getattr(loaded, '__file__', None)}, not {path}")
+        return loaded
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    try:
+        spec.loader.exec_module(module)
+    except BaseException:
+        del sys.modules[name]
+        raise
+    return module
+
+
+for _name in _SHARED:
+    _load(_name)
+
+browser_pool = sys.modules["browser_pool"]
+extraction = sys.modules["extraction"]
+waits = sys.modules["waits"]
@@ -17,12 +17,20 @@ Usage:
 import json
 import logging
 import os
-from typing import List, Optional
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List, Optional
 
+import openai
 from openai import OpenAI
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, Session
 
+from candidate_index import CandidateIndex
+from fuzzy_prematcher import run_fuzzy_prematching
+from match_cache import AI_CACHE_ENABLED, MatchResultCache, fingerprint
 from models import Base, Product, Competitor, CompetitorProduct, PendingMapping
 
 logger = logging.getLogger("ai_matcher")
@@ -38,9 +46,22 @@ if not NVIDIA_API_KEY:
         "NVIDIA_API_KEY environment variable is required for AI matching. "
         "Please set it in your .env file or deployment environment."
     )
-NVIDIA_BASE_URL = "https://integrate.api.nvidia.com/v1"
+NVIDIA_BASE_URL = os.environ.get("NVIDIA_BASE_URL", "https://integrate.api.nvidia.com/v1")
 NVIDIA_MODEL = "deepseek-ai/deepseek-v3.2"
 
+# ─── Matching Engine Tuning ─────────────────────────────────────────
+# Concurrent requests in flight, request budget per minute (0 = unlimited),
+# retries on 429/5xx/connection errors, and how many competitor products
+# go into one prompt (1 = one prompt per product).
+AI_MATCHER_WORKERS = int(os.environ.get("AI_MATCHER_WORKERS", "4"))
+AI_MATCHER_RPM = int(os.environ.get("AI_MATCHER_RPM", "40"))
+AI_MATCHER_MAX_RETRIES = int(os.environ.get("AI_MATCHER_MAX_RETRIES", "4"))
+AI_MATCHER_RETRY_BASE_DELAY = float(os.environ.get("AI_MATCHER_RETRY_BASE_DELAY", "2"))
+AI_MATCHER_BATCH_SIZE = int(os.environ.get("AI_MATCHER_BATCH_SIZE", "1"))
+AI_MATCHER_TIMEOUT = float(os.environ.get("AI_MATCHER_TIMEOUT", "300"))
+AI_MATCHER_MAX_TOKENS = int(os.environ.get("AI_MATCHER_MAX_TOKENS", "8192"))
+AI_MATCHER_THINKING = os.environ.get("AI_MATCHER_THINKING", "true").lower() in ("1", "true", "yes")
+
 DATABASE_URL = os.environ.get("DATABASE_URL", "sqlite:///data/market_intel.db")
 
 # ─── Prompt Engineering ─────────────────────────────────────────────
@@ -96,6 +117,27 @@ Responde con un JSON:
     "reasoning": "<explica por qué coinciden marcas, btu, tecnología o códigos de modelo>"
 }}"""
 
+BATCH_MATCH_PROMPT_TEMPLATE = """Analiza los siguientes productos del COMPETIDOR y busca, para CADA uno, la mejor coincidencia en nuestro CATÁLOGO.
+Evalúa cada producto de forma independiente aplicando todas las reglas.
+
+**Productos del Competidor:**
+{competitors_text}
+
+**Candidatos del Catálogo Visuar:**
+{candidates_text}
+
+Responde con un JSON que incluya una entrada por cada producto del competidor:
+{{
+    "matches": [
+        {{
+            "competitor_product_id": <ID del producto del competidor>,
+            "best_match_id": <id o null>,
+            "confidence": <0-100>,
+            "reasoning": "<explica por qué coinciden marcas, btu, tecnología o códigos de modelo>"
+        }}
+    ]
+}}"""
+
 
 def _build_candidates_text(candidates: List[Product]) -> str:
     """Format canonical products as a numbered list for the prompt."""
@@ -107,32 +149,97 @@ def _build_candidates_text(candidates: List[Product]) -> str:
     return "\n".join(lines) if lines else "  (No hay candidatos)"
 
 
-def _call_deepseek(prompt: str) -> Optional[dict]:
+def _build_competitor_text(cp: CompetitorProduct) -> str:
+    """Format one competitor product as an entry of the batch prompt."""
+    return (
+        f"  - ID: {cp.id} | Nombre: {cp.name} | Marca (detectada): {cp.raw_brand or 'N/A'} "
+        f"| SKU/Ref: {cp.sku or 'N/A'} | BTU: {cp.capacity_btu or 'No detectado'} "
+        f"| Inverter: {'Sí' if cp.is_inverter else 'No'} | Descripción: {cp.description or 'No disponible'}"
+    )
+
+
+class RateLimiter:
+    """Thread-safe limiter that spaces request starts to stay under a per-minute budget."""
+
+    def __init__(self, requests_per_minute: int):
+        self.interval = 60.0 / requests_per_minute if requests_per_minute > 0 else 0.0
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+
+    def acquire(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def _build_client() -> OpenAI:
+    """One HTTP client per matching run; retries are handled by _create_completion."""
+    return OpenAI(base_url=NVIDIA_BASE_URL, api_key=NVIDIA_API_KEY, max_retries=0, timeout=AI_MATCHER_TIMEOUT)
+
+
+def _retry_delay(error: Exception, attempt: int) -> float:
+    """Honour Retry-After when the server sends one, otherwise back off exponentially."""
+    response = getattr(error, "response", None)
+    if response is not None:
+        retry_after = response.headers.get("retry-after")
+        if retry_after:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+    return AI_MATCHER_RETRY_BASE_DELAY * (2 ** attempt)
+
+
+def _is_retryable(error: Exception) -> bool:
+    if isinstance(error, (openai.RateLimitError, openai.APIConnectionError, openai.APITimeoutError)):
+        return True
+    return isinstance(error, openai.APIStatusError) and error.status_code >= 500
+
+
+def _create_completion(client: OpenAI, prompt: str, rate_limiter: Optional[RateLimiter] = None):
+    """Start a streamed completion, retrying on 429/5xx and transport errors."""
+    for attempt in range(AI_MATCHER_MAX_RETRIES + 1):
+        if rate_limiter:
+            rate_limiter.acquire()
+        try:
+            # Deep thinking mode via streaming for maximum accuracy
+            return client.chat.completions.create(
+                model=NVIDIA_MODEL,
+                messages=[
+                    {"role": "system", "content": SYSTEM_PROMPT},
+                    {"role": "user", "content": prompt},
+                ],
+                temperature=0.1,
+                top_p=0.95,
+                max_tokens=AI_MATCHER_MAX_TOKENS,
+                extra_body={"chat_template_kwargs": {"thinking": AI_MATCHER_THINKING}},
+                stream=True
+            )
+        except Exception as e:
+            if not _is_retryable(e) or attempt == AI_MATCHER_MAX_RETRIES:
+                raise
+            delay = _retry_delay(e, attempt)
+            logger.warning(f"[AI_MATCHER] Attempt {attempt + 1}/{AI_MATCHER_MAX_RETRIES + 1} failed: {e}. Retrying in {delay}s...")
+            time.sleep(delay)
+
+
+def _call_deepseek(prompt: str, client: Optional[OpenAI] = None, rate_limiter: Optional[RateLimiter] = None) -> Optional[dict]:
     """Send a prompt to the NVIDIA DeepSeek API and parse the JSON response."""
+    raw_response = ""
     try:
-        client = OpenAI(base_url=NVIDIA_BASE_URL, api_key=NVIDIA_API_KEY)
-
-        # Deep thinking mode via streaming for maximum accuracy
-        completion = client.chat.completions.create(
-            model=NVIDIA_MODEL,
-            messages=[
-                {"role": "system", "content": SYSTEM_PROMPT},
-                {"role": "user", "content": prompt},
-            ],
-            temperature=0.1,
-            top_p=0.95,
-            max_tokens=8192,
-            extra_body={"chat_template_kwargs": {"thinking": True}},
-            stream=True
-        )
+        completion = _create_completion(client or _build_client(), prompt, rate_limiter)
 
         # Collect streamed response
-        raw_response = ""
         for chunk in completion:
             if not getattr(chunk, "choices", None):
                 continue
             reasoning = getattr(chunk.choices[0].delta, "reasoning_content", None)
-            if reasoning:
+            if isinstance(reasoning, str) and reasoning:
                 logger.debug(f"[AI_MATCHER] Thinking: {reasoning[:100]}...")
             if chunk.choices and chunk.choices[0].delta.content is not None:
                 raw_response += chunk.choices[0].delta.content
@@ -157,23 +264,8 @@ def _call_deepseek(prompt: str) -> Optional[dict]:
         return None
 
 
-def match_single_product(session: Session, cp: CompetitorProduct) -> Optional[dict]:
-    """
-    Use AI to find the best canonical match for a single competitor product.
-    Returns the parsed AI response dict or None.
-    """
-    # Get candidate products with same BTU (narrow the search space)
-    if cp.capacity_btu:
-        candidates = session.query(Product).filter_by(capacity_btu=cp.capacity_btu).all()
-    else:
-        # If no BTU detected, get all products (last resort)
-        candidates = session.query(Product).all()
-
-    if not candidates:
-        logger.info(f"[AI_MATCHER] No candidates for '{cp.name}' — skipping")
-        return None
-
-    prompt = MATCH_PROMPT_TEMPLATE.format(
+def _build_match_prompt(cp: CompetitorProduct, candidates: List[Product]) -> str:
+    return MATCH_PROMPT_TEMPLATE.format(
         competitor_name=cp.name,
         competitor_brand=cp.raw_brand or "N/A",
         competitor_sku=cp.sku or "N/A",
@@ -183,28 +275,193 @@ def match_single_product(session: Session, cp: CompetitorProduct) -> Optional[di
         candidates_text=_build_candidates_text(candidates),
     )
 
-    result = _call_deepseek(prompt)
+
+def _build_batch_prompt(cps: List[CompetitorProduct], candidates: List[Product]) -> str:
+    return BATCH_MATCH_PROMPT_TEMPLATE.format(
+        competitors_text="\n".join(_build_competitor_text(cp) for cp in cps),
+        candidates_text=_build_candidates_text(candidates),
+    )
+
+
+def _log_result(cp: CompetitorProduct, result: dict):
+    logger.info(
+        f"[AI_MATCHER] '{cp.name}' → Match ID: {result.get('best_match_id')} "
+        f"| Confidence: {result.get('confidence')}% "
+        f"| Reason: {result.get('reasoning', 'N/A')}"
+    )
+
+
+def match_single_product(session: Session, cp: CompetitorProduct, client: Optional[OpenAI] = None,
+                         index: Optional[CandidateIndex] = None) -> Optional[dict]:
+    """
+    Use AI to find the best canonical match for a single competitor product.
+    Returns the parsed AI response dict or None.
+    """
+    # Top-K pre-ranked candidates (pass a prebuilt index when matching many products)
+    candidates = (index or CandidateIndex.build(session)).candidates(cp)
+
+    if not candidates:
+        logger.info(f"[AI_MATCHER] No candidates for '{cp.name}' — skipping")
+        return None
+
+    result = _call_deepseek(_build_match_prompt(cp, candidates), client)
 
     if result:
-        logger.info(
-            f"[AI_MATCHER] '{cp.name}' → Match ID: {result.get('best_match_id')} "
-            f"| Confidence: {result.get('confidence')}% "
-            f"| Reason: {result.get('reasoning', 'N/A')}"
-        )
+        _log_result(cp, result)
 
     return result
 
 
-def run_ai_matching(session: Session, min_confidence: int = 60, progress_callback=None):
+def _split_batch_result(cps: List[CompetitorProduct], result: Optional[dict]) -> Dict[int, Optional[dict]]:
+    """Map a batch response back to its competitor products; products the model skipped map to None."""
+    by_id = {cp.id: None for cp in cps}
+    if not result:
+        return by_id
+    for entry in result.get("matches") or []:
+        try:
+            cp_id = int(str(entry.get("competitor_product_id")).strip("# "))
+        except (TypeError, ValueError):
+            continue
+        if cp_id in by_id:
+            by_id[cp_id] = entry
+    return by_id
+
+
+def _plan_jobs(index: CandidateIndex, unmatched: List[CompetitorProduct], batch_size: int,
+               cache: Optional[MatchResultCache] = None):
+    """
+    Build the prompts for a run on the calling thread (all DB access stays here).
+
+    Returns (jobs, cached, fingerprints): jobs is a list of
+    (competitor_products, prompt, is_batch); candidates come from the
+    CandidateIndex built once for the run, products sharing the same top-K
+    candidate set are grouped into batch prompts of up to `batch_size` items, and
+    batch_size=1 yields one single-product prompt each. Products whose
+    fingerprint is already in `cache` are returned in `cached` as
+    (competitor_product, result) and get no prompt.
+    """
+    planned = []
+    for cp in unmatched:
+        candidates = index.candidates(cp)
+        if not candidates:
+            logger.info(f"[AI_MATCHER] No candidates for '{cp.name}' — skipping")
+            continue
+        planned.append((cp, candidates))
+
+    fingerprints = {cp.id: fingerprint(cp, candidates, NVIDIA_MODEL) for cp, candidates in planned}
+    hits = cache.get_many(list(fingerprints.values())) if cache else {}
+
+    cached = []
+    groups = {}
+    for cp, candidates in planned:
+        result = hits.get(fingerprints[cp.id])
+        if result is not None:
+            cached.append((cp, result))
+            continue
+        groups.setdefault(tuple(c.id for c in candidates), (candidates, []))[1].append(cp)
+
+    jobs = []
+    for candidates, cps in groups.values():
+        if batch_size <= 1:
+            jobs.extend(([cp], _build_match_prompt(cp, candidates), False) for cp in cps)
+            continue
+        for i in range(0, len(cps), batch_size):
+            chunk = cps[i:i + batch_size]
+            jobs.append((chunk, _build_batch_prompt(chunk, candidates), True))
+    return jobs, cached, fingerprints
+
+
+def _fuzzy_fallback(suggestion: Optional[tuple]) -> Optional[dict]:
+    """
+    Deterministic verdict from the fuzzy pre-matcher, used when the API gave none.
+    Capped below the auto-apply threshold so it always goes to human review.
+    """
+    if not suggestion:
+        return None
+    product, score = suggestion
+    return {
+        "best_match_id": str(product.id),
+        "confidence": min(score, 89),
+        "reasoning": f"Fuzzy fallback (token_set_ratio {score}); AI unavailable",
+    }
+
+
+def _apply_match(session: Session, cp: CompetitorProduct, result: Optional[dict], min_confidence: int) -> str:
+    """Turn one AI verdict into a PendingMapping / auto-applied match. Returns 'matched', 'skipped' or 'failed'."""
+    if not result:
+        return "failed"
+
+    best_match_id = result.get("best_match_id")
+    if isinstance(best_match_id, str):
+        best_match_id = best_match_id.strip("# ")
+        if best_match_id.lower() == "none" or not best_match_id:
+            best_match_id = None
+
+    confidence = result.get("confidence", 0)
+
+    if not (best_match_id and confidence >= min_confidence):
+        logger.debug(
+            f"[AI_MATCHER] Low confidence ({confidence}%) for '{cp.name}' — skipping"
+        )
+        return "skipped"
+
+    # Verify the product ID actually exists
+    try:
+        best_match_id = uuid.UUID(str(best_match_id))
+    except ValueError:
+        best_match_id = None
+    canonical = session.get(Product, best_match_id) if best_match_id else None
+    if not canonical:
+        logger.warning(f"[AI_MATCHER] AI returned non-existent product ID {result.get('best_match_id')}")
+        return "failed"
+
+    # Check brand matching before auto-approve
+    competitor_brand = cp.raw_brand or ""
+    visuar_brand = canonical.brand or ""
+    brand_match = competitor_brand.lower().strip() == visuar_brand.lower().strip()
+
+    # Only auto-apply if confidence is very high (>= 90) AND brands match
+    if confidence >= 90 and brand_match:
+        cp.product_id = best_match_id
+        logger.info(f"[AI_MATCHER] AUTO-APPLIED match for '{cp.name}' (Confidence: {confidence}%, Brand match: {brand_match})")
+    elif confidence >= 90 and not brand_match:
+        logger.info(f"[AI_MATCHER] SKIPPED auto-apply for '{cp.name}' - brands don't match: '{competitor_brand}' vs '{visuar_brand}'")
+
+    # Replace existing pending mapping
+    session.query(PendingMapping).filter_by(competitor_product_id=cp.id).delete()
+    session.add(PendingMapping(
+        competitor_product_id=cp.id,
+        suggested_product_id=best_match_id,
+        match_score=confidence,
+    ))
+    return "matched"
+
+
+def run_ai_matching(session: Session, min_confidence: int = 60, progress_callback=None,
+                    workers: int = None, batch_size: int = None):
     """
     Main entry point: find all unmatched competitor products and attempt
     AI-powered matching against the canonical catalog.
 
+    A vectorized fuzzy stage auto-accepts unambiguous pairs first; only the
+    rest reach the LLM, and the fuzzy suggestion stands in for any answer
+    the API fails to give.
+
+    Prompts are built up front on the calling thread, sent through a bounded
+    thread pool sharing one HTTP client and rate limiter, and the answers
+    are applied back on the calling thread, so the session is never touched
+    concurrently.
+
     Args:
         session: SQLAlchemy session
         min_confidence: Minimum AI confidence (0-100) required to create a PendingMapping
         progress_callback: Optional callable(source, phase, current, total)
+        workers: Concurrent API requests (default: AI_MATCHER_WORKERS)
+        batch_size: Competitor products per prompt (default: AI_MATCHER_BATCH_SIZE)
     """
+    workers = workers or AI_MATCHER_WORKERS
+    batch_size = batch_size or AI_MATCHER_BATCH_SIZE
+
     # Get competitor products without a canonical match
     unmatched = (
         session.query(CompetitorProduct)
@@ -217,70 +474,71 @@ def run_ai_matching(session: Session, min_confidence: int = 60, progress_callbac
         return
 
     total = len(unmatched)
-    logger.info(f"[AI_MATCHER] Processing {total} unmatched product(s)...")
+    logger.info(f"[AI_MATCHER] Processing {total} unmatched product(s) with {workers} worker(s), batch size {batch_size}...")
     if progress_callback:
         progress_callback(source="AI Matcher", phase="Matching AI", current=0, total=total)
 
-    matched_count = 0
-    skipped_count = 0
-    failed_count = 0
-
-    for idx, cp in enumerate(unmatched):
-        if progress_callback:
-            progress_callback(current=idx + 1, total=total)
-        result = match_single_product(session, cp)
-
-        if not result:
-            failed_count += 1
-            continue
-
-        best_match_id = result.get("best_match_id")
-        if isinstance(best_match_id, str):
-            best_match_id = best_match_id.strip("# ")
-            if best_match_id.lower() == "none" or not best_match_id:
-                best_match_id = None
-
-        confidence = result.get("confidence", 0)
-
-        if best_match_id and confidence >= min_confidence:
-            # Verify the product ID actually exists
-            canonical = session.query(Product).get(best_match_id)
-            if not canonical:
-                logger.warning(f"[AI_MATCHER] AI returned non-existent product ID {best_match_id}")
-                failed_count += 1
-                continue
-            
-            # Check brand matching before auto-approve
-            competitor_brand = cp.raw_brand or ""
-            visuar_brand = canonical.brand or ""
-            brand_match = competitor_brand.lower().strip() == visuar_brand.lower().strip()
-            
-            # Only auto-apply if confidence is very high (>= 90) AND brands match
-            if confidence >= 90 and brand_match:
-                cp.product_id = best_match_id
-                logger.info(f"[AI_MATCHER] AUTO-APPLIED match for '{cp.name}' (Confidence: {confidence}%, Brand match: {brand_match})")
-            elif confidence >= 90 and not brand_match:
-                logger.info(f"[AI_MATCHER] SKIPPED auto-apply for '{cp.name}' - brands don't match: '{competitor_brand}' vs '{visuar_brand}'")
-
-            # Replace existing pending mapping
-            session.query(PendingMapping).filter_by(competitor_product_id=cp.id).delete()
-            session.add(PendingMapping(
-                competitor_product_id=cp.id,
-                suggested_product_id=best_match_id,
-                match_score=confidence,
-            ))
-            matched_count += 1
-        else:
-            skipped_count += 1
-            logger.debug(
-                f"[AI_MATCHER] Low confidence ({confidence}%) for '{cp.name}' — skipping"
-            )
+    counts = {"matched": 0, "skipped": 0, "failed": total}
+    products = session.query(Product).all()
+
+    # Local fuzzy stage: unambiguous pairs never reach the LLM
+    ambiguous, suggestions = run_fuzzy_prematching(session, unmatched, products)
+    fuzzy_accepted = total - len(ambiguous)
+    counts["failed"] -= fuzzy_accepted
+    fallbacks = 0
+    done = fuzzy_accepted
+
+    cache = MatchResultCache(session) if AI_CACHE_ENABLED else None
+    if cache:
+        cache.evict()
+    jobs, cached, fingerprints = _plan_jobs(CandidateIndex(products), ambiguous, batch_size, cache)
+
+    # Verdicts reused from previous runs: no API call
+    for cp, result in cached:
+        outcome = _apply_match(session, cp, result, min_confidence)
+        counts["failed"] -= 1
+        counts[outcome] += 1
+    done += len(cached)
+    if progress_callback and cached:
+        progress_callback(current=done, total=total)
+
+    client = _build_client()
+    rate_limiter = RateLimiter(AI_MATCHER_RPM)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(_call_deepseek, prompt, client, rate_limiter): (cps, is_batch) for cps, prompt, is_batch in jobs}
+        for future in as_completed(futures):
+            cps, is_batch = futures[future]
+            results = _split_batch_result(cps, future.result()) if is_batch else {cps[0].id: future.result()}
+            for cp in cps:
+                result = results.get(cp.id)
+                if result:
+                    _log_result(cp, result)
+                    if cache:
+                        cache.put(fingerprints[cp.id], cp.id, result)
+                else:
+                    result = _fuzzy_fallback(suggestions.get(cp.id))
+                    fallbacks += result is not None
+                outcome = _apply_match(session, cp, result, min_confidence)
+                counts["failed"] -= 1
+                counts[outcome] += 1
+            done += len(cps)
+            if progress_callback:
+                progress_callback(current=done, total=total)
 
     session.commit()
     logger.info(
         f"[AI_MATCHER] Complete. "
-        f"Matched: {matched_count} | Skipped (low confidence): {skipped_count} | Failed: {failed_count}"
+        f"Fuzzy auto-accepted: {fuzzy_accepted} | "
+        f"Matched: {counts['matched']} | Skipped (low confidence): {counts['skipped']} | Failed: {counts['failed']} "
+        f"| Fuzzy fallbacks: {fallbacks} | LLM calls: {len(jobs)}"
     )
+    if cache:
+        logger.info(
+            f"[AI_CACHE] Hits: {cache.stats['hits']} | Misses: {cache.stats['misses']} "
+            f"| Stored: {cache.stats['stores']} | Evicted: {cache.stats['evicted']} "
+            f"| Hit rate: {cache.hit_rate():.0%}"
+        )
 
 
 # ─── Standalone Execution ───────────────────────────────────────────
@@ -12,13 +12,14 @@ Handles:
 import json
 import logging
 import os
+from collections import defaultdict
 from datetime import datetime, timedelta, timezone
 
-from sqlalchemy import and_
+from sqlalchemy import and_, select
 from sqlalchemy.orm import Session
 
 from models import (
-    AlertRule, NotificationLog, PriceLog,
+    AlertRule, NotificationLog, PriceLog, LatestPrice,
     CompetitorProduct, Product, Competitor
 )
 from sqlalchemy import func
@@ -30,7 +31,7 @@ def _build_rule_snapshot(rule: AlertRule) -> dict:
     """Capture the current state of a rule as an immutable JSON snapshot."""
     return {
         "rule_id": rule.id,
-        "product_id": rule.product_id,
+        "product_id": str(rule.product_id) if rule.product_id else None,
         "competitor_id": rule.competitor_id,
         "target_price": float(rule.target_price) if rule.target_price else None,
         "notify_on_stock_change": rule.notify_on_stock_change,
@@ -40,50 +41,96 @@ def _build_rule_snapshot(rule: AlertRule) -> dict:
     }
 
 
-def _is_in_cooldown(session: Session, rule: AlertRule) -> bool:
-    """Check if a notification was already sent within the cooldown window."""
-    if not rule.cooldown_hours:
+def _is_in_cooldown(rule: AlertRule, last_sent_at, now: datetime) -> bool:
+    """Check if the rule's last notification falls within its cooldown window."""
+    if not rule.cooldown_hours or last_sent_at is None:
         return False
 
-    cooldown_since = datetime.now(timezone.utc) - timedelta(hours=rule.cooldown_hours)
-    recent = (
-        session.query(NotificationLog)
-        .filter(
-            NotificationLog.alert_rule_id == rule.id,
-            NotificationLog.sent_at >= cooldown_since,
-        )
-        .first()
-    )
-    return recent is not None
+    if last_sent_at.tzinfo is None:
+        last_sent_at = last_sent_at.replace(tzinfo=timezone.utc)
+    return last_sent_at >= now - timedelta(hours=rule.cooldown_hours)
 
 
-def _get_latest_prices_for_product(session: Session, product_id: int, competitor_id: int = None):
+def _get_latest_prices(session: Session, product_ids) -> dict:
     """
-    Get the most recent PriceLog entries for a product (across all competitors
-    or filtered to a specific one).
-    Returns list of (PriceLog, CompetitorProduct, Competitor) tuples.
+    Get the most recent PriceLog entries for a set of products from the
+    latest_prices table (one row per competitor product, no history scan).
+    Returns {product_id: [(PriceLog, CompetitorProduct, Competitor), ...]},
+    newest first; callers keep the first entry per competitor.
     """
-    query = (
+    if not product_ids:
+        return {}
+
+    rows = (
         session.query(PriceLog, CompetitorProduct, Competitor)
+        .join(LatestPrice, LatestPrice.price_log_id == PriceLog.id)
+        .join(CompetitorProduct, LatestPrice.competitor_product_id == CompetitorProduct.id)
+        .join(Competitor, CompetitorProduct.competitor_id == Competitor.id)
+        .filter(CompetitorProduct.product_id.in_(product_ids))
+        .order_by(PriceLog.scraped_at.desc(), PriceLog.id.desc())
+        .all()
+    )
+
+    latest = defaultdict(list)
+    for row in rows:
+        latest[row.CompetitorProduct.product_id].append(row)
+    return latest
+
+
+def _get_price_transitions(session: Session, competitor_product_ids) -> dict:
+    """
+    Get the latest and previous PriceLog entry for each changed competitor
+    product in a single windowed query.
+    Returns {product_id: [((PriceLog, CompetitorProduct, Competitor), previous PriceLog or None), ...]},
+    newest first. A missing previous entry means a first sighting.
+    """
+    if not competitor_product_ids:
+        return {}
+
+    ranked = (
+        select(
+            PriceLog.id.label("price_log_id"),
+            func.row_number().over(
+                partition_by=PriceLog.competitor_product_id,
+                order_by=(PriceLog.scraped_at.desc(), PriceLog.id.desc()),
+            ).label("rn"),
+        )
+        .where(PriceLog.competitor_product_id.in_(competitor_product_ids))
+        .subquery()
+    )
+    rows = (
+        session.query(PriceLog, CompetitorProduct, Competitor, ranked.c.rn)
+        .join(ranked, and_(PriceLog.id == ranked.c.price_log_id, ranked.c.rn <= 2))
         .join(CompetitorProduct, PriceLog.competitor_product_id == CompetitorProduct.id)
         .join(Competitor, CompetitorProduct.competitor_id == Competitor.id)
-        .filter(CompetitorProduct.product_id == product_id)
-        .order_by(PriceLog.scraped_at.desc())
+        .filter(CompetitorProduct.product_id.isnot(None))
+        .order_by(PriceLog.scraped_at.desc(), PriceLog.id.desc())
+        .all()
     )
 
-    if competitor_id:
-        query = query.filter(CompetitorProduct.competitor_id == competitor_id)
+    latest, previous = {}, {}
+    for price_log, cp, comp, rn in rows:
+        if rn == 1:
+            latest[cp.id] = (price_log, cp, comp)
+        else:
+            previous[cp.id] = price_log
 
-    # Get the latest entry per competitor
-    seen_competitors = set()
-    results = []
-    for row in query.all():
-        comp_id = row.Competitor.id
-        if comp_id not in seen_competitors:
-            seen_competitors.add(comp_id)
-            results.append(row)
+    transitions = defaultdict(list)
+    for cp_id, row in latest.items():
+        transitions[row[1].product_id].append((row, previous.get(cp_id)))
+    for entries in transitions.values():
+        entries.sort(key=lambda entry: (entry[0][0].scraped_at, entry[0][0].id), reverse=True)
+    return transitions
 
-    return results
+
+def _crossed_target(price_log: PriceLog, previous: PriceLog, target: float) -> bool:
+    """Price is at/below target now and was above it (or unseen) before."""
+    return price_log.price <= target and (previous is None or previous.price > target)
+
+
+def _came_back_in_stock(price_log: PriceLog, previous: PriceLog) -> bool:
+    """Stock flipped false -> true (a first sighting counts as coming into stock)."""
+    return bool(price_log.is_in_stock) and (previous is None or not previous.is_in_stock)
 
 
 def _send_notification(channel: str, contact: str, message: str) -> bool:
@@ -123,11 +170,27 @@ def _format_stock_alert_message(product: Product, hits: list) -> str:
     return "\n".join(lines)
 
 
-def evaluate_alerts(session: Session):
+def evaluate_alerts(session: Session, changed_competitor_product_ids=None):
     """
     Main entry point: evaluate all active alert rules against the latest price data.
     Called by scraper.py after a successful scraping cycle.
+
+    Set-based: one query loads the rules with their product and last
+    notification time, one query loads the latest prices from latest_prices;
+    the query count does not grow with rules or history.
+
+    Incremental mode: pass the competitor_product ids that got a PriceLog in
+    this run. Only rules on their products are evaluated, and an alert fires
+    only on a transition against the previous log entry (price crossing
+    target_price, stock flipping false -> true), not on the current state alone.
     """
+    incremental = changed_competitor_product_ids is not None
+    if incremental:
+        changed_competitor_product_ids = set(changed_competitor_product_ids)
+        if not changed_competitor_product_ids:
+            logger.info("[ALERT_ENGINE] No price changes in this run. Skipping.")
+            return
+
     # We need to decrypt contact_info using the secret key
     enc_key = os.environ.get('ENCRYPTION_KEY')
     
@@ -141,15 +204,32 @@ def evaluate_alerts(session: Session):
         logger.warning("[ALERT_ENGINE] Using fallback 'dev_key' for development only!")
         enc_key = 'dev_key'
     
-    # Query rules and decrypt contact_info at the database level
-    active_rules_data = (
+    # Query rules with their product and last notification time, decrypting
+    # contact_info at the database level
+    last_sent = (
+        select(
+            NotificationLog.alert_rule_id,
+            func.max(NotificationLog.sent_at).label("last_sent_at"),
+        )
+        .group_by(NotificationLog.alert_rule_id)
+        .subquery()
+    )
+    rules_query = (
         session.query(
             AlertRule,
-            func.pgp_sym_decrypt(AlertRule.contact_info, enc_key).label('decrypted_contact')
+            func.pgp_sym_decrypt(AlertRule.contact_info, enc_key).label('decrypted_contact'),
+            Product,
+            last_sent.c.last_sent_at,
         )
+        .outerjoin(Product, AlertRule.product_id == Product.id)
+        .outerjoin(last_sent, last_sent.c.alert_rule_id == AlertRule.id)
         .filter(AlertRule.is_active == True)
-        .all()
     )
+    if incremental:
+        rules_query = rules_query.filter(AlertRule.product_id.in_(
+            select(CompetitorProduct.product_id).where(CompetitorProduct.id.in_(changed_competitor_product_ids))
+        ))
+    active_rules_data = rules_query.all()
 
     if not active_rules_data:
         logger.info("[ALERT_ENGINE] No active alert rules configured. Skipping.")
@@ -158,38 +238,58 @@ def evaluate_alerts(session: Session):
     logger.info(f"[ALERT_ENGINE] Evaluating {len(active_rules_data)} active rule(s)...")
     alerts_fired = 0
     alerts_skipped_cooldown = 0
+    now = datetime.now(timezone.utc)
 
-    for rule, decrypted_contact in active_rules_data:
+    if incremental:
+        # Latest + previous log for each changed listing
+        entries_by_product = _get_price_transitions(session, changed_competitor_product_ids)
+    else:
+        # Latest price per (product, competitor) for every product with a live rule;
+        # with no previous entry the transition checks reduce to the current state
+        latest_by_product = _get_latest_prices(
+            session, {product.id for _, _, product, _ in active_rules_data if product is not None}
+        )
+        entries_by_product = {
+            product_id: [(row, None) for row in rows] for product_id, rows in latest_by_product.items()
+        }
+
+    for rule, decrypted_contact, product, last_sent_at in active_rules_data:
         # ── Cooldown check ──
-        if _is_in_cooldown(session, rule):
+        if _is_in_cooldown(rule, last_sent_at, now):
             alerts_skipped_cooldown += 1
             logger.debug(f"[COOLDOWN] Rule #{rule.id} still in cooldown. Skipping.")
             continue
 
-        product = session.query(Product).get(rule.product_id)
         if not product:
             logger.warning(f"[ALERT_ENGINE] Rule #{rule.id} references non-existent product #{rule.product_id}")
             continue
 
-        latest_prices = _get_latest_prices_for_product(
-            session, rule.product_id, rule.competitor_id
-        )
-
-        if not latest_prices:
+        entries, seen_competitors = [], set()
+        for row, previous in entries_by_product.get(product.id, []):
+            comp_id = row[2].id  # (PriceLog, CompetitorProduct, Competitor)
+            if rule.competitor_id and comp_id != rule.competitor_id:
+                continue
+            # Newest listing per competitor wins
+            if comp_id not in seen_competitors:
+                seen_competitors.add(comp_id)
+                entries.append((row, previous))
+
+        if not entries:
             continue
 
         # ── Price threshold check ──
         price_hits = []
         if rule.target_price:
-            for price_log, cp, comp in latest_prices:
-                if price_log.price <= float(rule.target_price):
+            target = float(rule.target_price)
+            for (price_log, cp, comp), previous in entries:
+                if _crossed_target(price_log, previous, target):
                     price_hits.append((price_log, cp, comp))
 
         # ── Stock change check ──
         stock_hits = []
         if rule.notify_on_stock_change:
-            for price_log, cp, comp in latest_prices:
-                if price_log.is_in_stock:
+            for (price_log, cp, comp), previous in entries:
+                if _came_back_in_stock(price_log, previous):
                     stock_hits.append((price_log, cp, comp))
 
         # ── Fire consolidated alert ──
@@ -1,12 +1,28 @@
 import os
+import csv
+import hashlib
+import io
 import json
 import threading
 import logging
-from flask import Flask, jsonify, request, Response
+import uuid
+from decimal import Decimal
+from types import SimpleNamespace
+from datetime import datetime, timedelta, timezone
+from flask import Flask, jsonify, request, Response, stream_with_context
 from flask_cors import CORS
-from sqlalchemy import create_engine, text
+from sqlalchemy import Boolean, DateTime, bindparam, create_engine, text
+from sqlalchemy.dialects.postgresql import UUID
 import math
 
+from live_data_query import (
+    LIVE_DATA_SORTS, build_count_query, build_page_query, decode_cursor, encode_cursor,
+    parse_fields, parse_filters,
+)
+import price_archive
+from price_history import HISTORY_MODES, build_series, change_points, parse_points
+from response_cache import live_data_cache
+
 # ============================================================
 # VISUAR MARKET INTELLIGENCE - API SERVER
 # Lightweight Flask API for on-demand scraping triggers
@@ -24,10 +40,11 @@ logging.basicConfig(
 JSON_OUTPUT_DIR = os.environ.get("JSON_OUTPUT_DIR", "/app/output")
 DATABASE_URL = os.environ.get("DATABASE_URL", "sqlite:///data/market_intel.db")
 
-# TODO (Tech Debt): Implement Flask-Caching here (e.g., Cache(app, config={'CACHE_TYPE': 'simple'})) 
-# and use @cache.cached(timeout=300) on /api/live_data when traffic increases to prevent DB spam.
 engine = create_engine(DATABASE_URL)
 
+# Rows fetched per round trip by the streaming export (server-side cursor)
+EXPORT_CHUNK_SIZE = int(os.environ.get("EXPORT_CHUNK_SIZE", "5000"))
+
 # ── Scrape State ────────────────────────────────────────────
 _scrape_state = {
     "running": False,
@@ -83,95 +100,147 @@ def _run_scrape_thread():
 
 # ── Endpoints ───────────────────────────────────────────────
 
+def _serialize_live_row(r) -> dict:
+    return {
+        "id": str(r.product_id),
+        "name": r.name,
+        "brand": r.brand,
+        "btu": r.capacity_btu,
+        "internal_cost": float(r.internal_cost) if r.internal_cost is not None else None,
+        "visuar_price": float(r.visuar_price) if r.visuar_price is not None else None,
+        "gg_price": float(r.gg_price) if r.gg_price is not None else None,
+        "gg_name": r.gg_name,
+        "lowest_comp": float(r.bristol_price) if r.bristol_price is not None else None,
+        "real_margin_percent": float(r.real_margin_percent) if r.real_margin_percent is not None else None,
+        "diff_percent": float(r.diff_percent) if r.diff_percent is not None else None,
+        "status": r.status,
+        "last_updated": r.last_updated.isoformat() if hasattr(r.last_updated, "isoformat") else r.last_updated
+    }
+
+
+def _fetch_live_page(sort: str, limit: int, filters: dict, cursor_key=None, offset: int = 0) -> dict:
+    """One page of opportunity_margin_vw plus the cursor for the next one."""
+    sql, params = build_page_query(sort, limit, filters, cursor_key, offset)
+    with engine.connect() as conn:
+        result = conn.execute(text(sql), params).fetchall()
+
+    next_cursor = None
+    if len(result) > limit:
+        result = result[:limit]
+        last = result[-1]._mapping
+        next_cursor = encode_cursor(sort, [last[f"sort_k{i}"] for i in range(len(LIVE_DATA_SORTS[sort]))])
+    return {"rows": [_serialize_live_row(r) for r in result], "next_cursor": next_cursor}
+
+
+def _fetch_live_count(filters: dict) -> int:
+    sql, params = build_count_query(filters)
+    with engine.connect() as conn:
+        return conn.execute(text(sql), params).scalar() or 0
+
+
+def _fetch_live_stats() -> dict:
+    """Page-independent KPI block for the dashboard."""
+    with engine.connect() as conn:
+        # Get total count
+        count_query = text('SELECT COUNT(*) FROM opportunity_margin_vw')
+        total = conn.execute(count_query).scalar()
+        
+        # Additional KPI metrics from DB
+        metrics_query = text('''
+            SELECT 
+                SUM(CASE WHEN status = 'WIN' THEN 1 ELSE 0 END) as wins,
+                SUM(CASE WHEN status = 'LOSS' THEN 1 ELSE 0 END) as losses,
+                AVG(CASE WHEN status = 'LOSS' THEN diff_percent ELSE NULL END) as avg_diff
+            FROM opportunity_margin_vw
+        ''')
+        metrics = conn.execute(metrics_query).fetchone()
+        
+        match_query = text('''
+            SELECT count(DISTINCT product_id) 
+            FROM competitor_products 
+            WHERE competitor_id != (SELECT id FROM competitors WHERE name = 'Visuar')
+              AND product_id IS NOT NULL
+        ''')
+        exact_match = conn.execute(match_query).scalar() or 0
+        
+        ai_query = text("SELECT count(DISTINCT suggested_product_id) FROM pending_mappings WHERE match_score >= 80")
+        ai_matched = conn.execute(ai_query).scalar() or 0
+        
+        total_products_query = text("SELECT count(*) FROM products")
+        total_products = conn.execute(total_products_query).scalar() or 0
+        
+        return {
+            "view_total": total or 0,
+            "total": total_products,
+            "wins": int(metrics.wins) if metrics and metrics.wins else 0,
+            "losses": int(metrics.losses) if metrics and metrics.losses else 0,
+            "avgDiff": float(metrics.avg_diff) if metrics and metrics.avg_diff else 0.0,
+            "exact_match": exact_match,
+            "partial_match": 0,
+            "no_match": total_products - exact_match,
+            "ai_matched": ai_matched
+        }
+
+
 @app.route('/api/live_data', methods=['GET'])
 def get_live_data():
-    """Fetches real-time market margins with pagination."""
+    """
+    Fetches real-time market margins.
+
+    Pagination is keyset based: pass the returned `next_cursor` as ?cursor=
+    (?page= still works as an offset for the first pages). Filters: ?brand=,
+    ?btu=, ?status=, ?competitor= (comma-separated); ?fields= trims each row.
+    Pages and the stats block are cached separately until the next pipeline
+    run invalidates them.
+    """
     try:
         page = int(request.args.get('page', 1))
         limit = int(request.args.get('limit', 50))
+        sort = request.args.get('sort', 'loss_first')
+        cursor = request.args.get('cursor')
         offset = (page - 1) * limit
-        
-        with engine.connect() as conn:
-            # Query the view opportunity_margin_vw
-            query = text('''
-                SELECT 
-                    product_id, name, brand, capacity_btu, internal_cost,
-                    visuar_price, bristol_price, gg_price, gg_name, real_margin_percent,
-                    diff_percent, status, last_updated
-                FROM opportunity_margin_vw
-                ORDER BY 
-                    -- Sort by LOSS first, then margin
-                    CASE WHEN status = 'LOSS' THEN 0 ELSE 1 END ASC,
-                    ABS(diff_percent) DESC NULLS LAST
-                LIMIT :limit OFFSET :offset
-            ''')
-            
-            result = conn.execute(query, {"limit": limit, "offset": offset})
-            
-            rows = []
-            for r in result:
-                rows.append({
-                    "id": str(r.product_id),
-                    "name": r.name,
-                    "brand": r.brand,
-                    "btu": r.capacity_btu,
-                    "internal_cost": float(r.internal_cost) if r.internal_cost is not None else None,
-                    "visuar_price": float(r.visuar_price) if r.visuar_price is not None else None,
-                    "gg_price": float(r.gg_price) if r.gg_price is not None else None,
-                    "gg_name": r.gg_name,
-                    "lowest_comp": float(r.bristol_price) if r.bristol_price is not None else None,
-                    "real_margin_percent": float(r.real_margin_percent) if r.real_margin_percent is not None else None,
-                    "diff_percent": float(r.diff_percent) if r.diff_percent is not None else None,
-                    "status": r.status,
-                    "last_updated": r.last_updated.isoformat() if r.last_updated else None
-                })
-            
-            # Get total count
-            count_query = text('SELECT COUNT(*) FROM opportunity_margin_vw')
-            total = conn.execute(count_query).scalar()
-            
-            # Additional KPI metrics from DB
-            metrics_query = text('''
-                SELECT 
-                    SUM(CASE WHEN status = 'WIN' THEN 1 ELSE 0 END) as wins,
-                    SUM(CASE WHEN status = 'LOSS' THEN 1 ELSE 0 END) as losses,
-                    AVG(CASE WHEN status = 'LOSS' THEN diff_percent ELSE NULL END) as avg_diff
-                FROM opportunity_margin_vw
-            ''')
-            metrics = conn.execute(metrics_query).fetchone()
-            
-            match_query = text('''
-                SELECT count(DISTINCT product_id) 
-                FROM competitor_products 
-                WHERE competitor_id != (SELECT id FROM competitors WHERE name = 'Visuar')
-                  AND product_id IS NOT NULL
-            ''')
-            exact_match = conn.execute(match_query).scalar() or 0
-            
-            ai_query = text("SELECT count(DISTINCT suggested_product_id) FROM pending_mappings WHERE match_score >= 80")
-            ai_matched = conn.execute(ai_query).scalar() or 0
-            
-            total_products_query = text("SELECT count(*) FROM products")
-            total_products = conn.execute(total_products_query).scalar() or 0
-            
-            stats = {
-                "total": total_products,
-                "page": page,
-                "limit": limit,
-                "total_pages": math.ceil(total / limit) if limit > 0 else 0,
-                "wins": int(metrics.wins) if metrics and metrics.wins else 0,
-                "losses": int(metrics.losses) if metrics and metrics.losses else 0,
-                "avgDiff": float(metrics.avg_diff) if metrics and metrics.avg_diff else 0.0,
-                "exact_match": exact_match,
-                "partial_match": 0,
-                "no_match": total_products - exact_match,
-                "ai_matched": ai_matched
-            }
-            
-            return jsonify({
-                "rows": rows,
-                "stats": stats
-            }), 200
+
+        if sort not in LIVE_DATA_SORTS:
+            return jsonify({"error": f"Unknown sort '{sort}'", "allowed": sorted(LIVE_DATA_SORTS)}), 400
+        if limit < 1 or page < 1:
+            return jsonify({"error": "page and limit must be positive"}), 400
+        try:
+            filters = parse_filters(request.args)
+            fields = parse_fields(request.args.get('fields'))
+            cursor_key = decode_cursor(cursor, sort) if cursor else None
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        filter_key = tuple(sorted(filters.items()))
+        position = f"cursor:{cursor}" if cursor else f"offset:{offset}"
+        result, page_hit = live_data_cache.get_or_compute(
+            ("page", sort, limit, position, filter_key),
+            lambda: _fetch_live_page(sort, limit, filters, cursor_key, offset),
+        )
+        core, stats_hit = live_data_cache.get_or_compute(("stats",), _fetch_live_stats)
+        matching, count_hit = core["view_total"], True
+        if filters:
+            matching, count_hit = live_data_cache.get_or_compute(("count", filter_key), lambda: _fetch_live_count(filters))
+
+        stats = {key: value for key, value in core.items() if key != "view_total"}
+        stats.update({
+            "page": page,
+            "limit": limit,
+            "matching": matching,
+            "total_pages": math.ceil(matching / limit),
+        })
+
+        rows = result["rows"]
+        if fields:
+            rows = [{field: row[field] for field in fields} for row in rows]
+
+        response = jsonify({
+            "rows": rows,
+            "next_cursor": result["next_cursor"],
+            "stats": stats
+        })
+        response.headers["X-Cache"] = "HIT" if page_hit and stats_hit and count_hit else "MISS"
+        return response, 200
 
     except Exception as e:
         logger.error(f"[API] Error fetching live data: {e}", exc_info=True)
@@ -256,7 +325,7 @@ def metrics():
             )).fetchone()
             
             if last_scrape:
-                add_metric("last_scrape_status", 1 if last_scrape.status == 'success' else 0, 
+                add_metric("last_scrape_status", 1 if last_scrape.status in ('success', 'unchanged') else 0, 
                           {"status": last_scrape.status or "unknown"})
                 add_metric("last_scrape_products", last_scrape.products_scraped or 0)
             
@@ -324,6 +393,328 @@ def scrape_status():
         })
 
 
+# ── Export API ──────────────────────────────────────────────
+
+EXPORT_COLUMNS = [
+    "price_log_id", "scraped_at", "competitor_id", "competitor", "competitor_product_id",
+    "product_name", "sku", "url", "product_id", "price", "is_in_stock",
+]
+
+
+def _parse_window(args) -> dict:
+    """since / until query params as datetimes. Raises ValueError on bad input."""
+    window = {}
+    for arg in ("since", "until"):
+        if args.get(arg):
+            try:
+                value = datetime.fromisoformat(args[arg])
+            except ValueError:
+                raise ValueError(f"{arg} must be an ISO 8601 date/datetime")
+            # scraped_at is stored naive UTC
+            window[arg] = value.astimezone(timezone.utc).replace(tzinfo=None) if value.tzinfo else value
+    return window
+
+
+def _competitor_clauses(args, params: dict) -> list:
+    """WHERE clause for ?competitor= (comma-separated ids or names); binds into `params`."""
+    competitors = [c.strip() for c in args.get("competitor", "").split(",") if c.strip()]
+    if not competitors:
+        return []
+    terms = []
+    for i, competitor in enumerate(competitors):
+        params[f"comp_{i}"] = int(competitor) if competitor.isdigit() else competitor.lower()
+        terms.append(f"c.id = :comp_{i}" if competitor.isdigit() else f"LOWER(c.name) = :comp_{i}")
+    return ["(" + " OR ".join(terms) + ")"]
+
+
+def _window_clauses(window: dict) -> list:
+    return [f"pl.scraped_at {op} :{arg}" for arg, op in (("since", ">="), ("until", "<")) if arg in window]
+
+
+def _archive_days() -> list:
+    """Closed days in the Parquet archive (price_archive.py); [] without pyarrow or an archive."""
+    if price_archive.pa is None:
+        return []
+    return price_archive.archived_days(price_archive.ARCHIVE_DIR)
+
+
+def _archived_logs(competitor_product_ids=None, start=None, end=None) -> list:
+    """Archived price logs (of the given listings) as dicts, ordered by scraped_at."""
+    columns = ["price_log_id", "competitor_product_id", "price", "is_in_stock", "scraped_at"]
+    data = price_archive.read_price_history(
+        price_archive.ARCHIVE_DIR, competitor_product_id=competitor_product_ids, start=start, end=end, columns=columns,
+    )
+    values = [data[name].tolist() for name in columns]
+    return [dict(zip(columns, row)) for row in zip(*values)]
+
+
+def _archived_export_rows(params: dict, listing_clauses: list):
+    """
+    Yield, day by day, the archived rows of the export window that are no
+    longer in price_logs (pruned with ARCHIVE_PRUNE=true), as EXPORT_COLUMNS dicts.
+    """
+    days = _archive_days()
+    if not days:
+        return
+    sql = '''
+        SELECT cp.id AS competitor_product_id, c.id AS competitor_id, c.name AS competitor,
+               cp.name AS product_name, cp.sku, cp.url, cp.product_id
+        FROM competitor_products cp
+        JOIN competitors c ON cp.competitor_id = c.id
+    '''
+    if listing_clauses:
+        sql += " WHERE " + " AND ".join(listing_clauses)
+    with engine.connect() as conn:
+        listings = {row.competitor_product_id: dict(row._mapping) for row in conn.execute(text(sql), params)}
+
+    for day in days:
+        day_start = datetime.combine(day, datetime.min.time())
+        start = max(day_start, params.get("since") or datetime.min)
+        end = min(day_start + timedelta(days=1), params.get("until") or datetime.max)
+        if start >= end:
+            continue
+        with engine.connect() as conn:
+            live = set(conn.execute(
+                text("SELECT id FROM price_logs WHERE scraped_at >= :start AND scraped_at < :end"),
+                {"start": start, "end": end},
+            ).scalars())
+        logs = _archived_logs(list(listings) if listing_clauses else None, start, end)
+        rows = sorted(
+            (log for log in logs if log["price_log_id"] not in live and log["competitor_product_id"] in listings),
+            key=lambda log: log["price_log_id"],
+        )
+        for log in rows:
+            yield {**listings[log["competitor_product_id"]], **log}
+
+
+def _export_value(value):
+    """One export cell: the same JSON/CSV type whether the row is live (Decimal price) or archived."""
+    if isinstance(value, Decimal):
+        return float(value)
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return value
+
+
+def _stream_price_history(clauses: list, params: dict, fmt: str, listing_clauses: list = ()):
+    """
+    Yield the export chunk by chunk. stream_results keeps a server-side cursor
+    open (psycopg2 named cursor), so memory is bounded by EXPORT_CHUNK_SIZE
+    rather than by the size of the history.
+
+    Rows are price_logs as stored: with INGEST_MODE=cdc (the default) a
+    listing is only logged when its price or stock changes, so consumers
+    must treat each row as a change point holding until the listing's next
+    row, not as a sample of that day. Archived days pruned from price_logs
+    are read back from the Parquet archive and streamed first; the live
+    rows follow in id order. `listing_clauses` (competitor filter) restrict
+    the archived rows the way `clauses` restrict the live ones.
+    """
+    sql = '''
+        SELECT pl.id AS price_log_id, pl.scraped_at, c.id AS competitor_id, c.name AS competitor,
+               cp.id AS competitor_product_id, cp.name AS product_name, cp.sku, cp.url,
+               cp.product_id, pl.price, pl.is_in_stock
+        FROM price_logs pl
+        JOIN competitor_products cp ON pl.competitor_product_id = cp.id
+        JOIN competitors c ON cp.competitor_id = c.id
+    '''
+    if clauses:
+        sql += " WHERE " + " AND ".join(clauses)
+    sql += " ORDER BY pl.id"
+
+    def encode(chunk: list) -> str:
+        rows = [[_export_value(row[c]) for c in EXPORT_COLUMNS] for row in chunk]
+        if fmt == "csv":
+            buffer = io.StringIO()
+            csv.writer(buffer).writerows(rows)
+            return buffer.getvalue()
+        return "".join(
+            json.dumps(dict(zip(EXPORT_COLUMNS, row)), default=str, ensure_ascii=False) + "\n" for row in rows
+        )
+
+    if fmt == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(EXPORT_COLUMNS)
+        yield buffer.getvalue()
+
+    exported = archived = 0
+    chunk = []
+    for row in _archived_export_rows(params, list(listing_clauses)):
+        chunk.append(row)
+        if len(chunk) == EXPORT_CHUNK_SIZE:
+            yield encode(chunk)
+            archived += len(chunk)
+            chunk = []
+    if chunk:
+        yield encode(chunk)
+        archived += len(chunk)
+
+    with engine.connect() as conn:
+        # Typed so SQLite gives datetimes/booleans like PostgreSQL does (and like the archive)
+        query = text(sql).columns(scraped_at=DateTime, is_in_stock=Boolean)
+        result = conn.execution_options(stream_results=True).execute(query, params)
+        for chunk in result.partitions(EXPORT_CHUNK_SIZE):
+            yield encode([row._mapping for row in chunk])
+            exported += len(chunk)
+    logger.info(f"[EXPORT] Streamed {exported} price log rows + {archived} archived ({fmt})")
+
+
+@app.route('/api/export/price_history', methods=['GET'])
+def export_price_history():
+    """
+    Stream price history joined with competitor products/competitors.
+
+    Query params: format=ndjson|csv, since / until (ISO 8601, until is
+    exclusive), competitor (comma-separated ids or names).
+    """
+    fmt = request.args.get('format', 'ndjson').lower()
+    if fmt not in ("ndjson", "csv"):
+        return jsonify({"error": "format must be 'ndjson' or 'csv'"}), 400
+    try:
+        params = _parse_window(request.args)
+        listing_clauses = _competitor_clauses(request.args, params)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    clauses = _window_clauses(params) + listing_clauses
+    mimetype = "text/csv" if fmt == "csv" else "application/x-ndjson"
+    response = Response(stream_with_context(_stream_price_history(clauses, params, fmt, listing_clauses)),
+                        mimetype=mimetype)
+    response.headers["Content-Disposition"] = f"attachment; filename=price_history.{fmt}"
+    return response
+
+
+# ── Product History API ─────────────────────────────────────
+
+_PRODUCT_ID = bindparam("product_id", type_=UUID(as_uuid=True))
+
+
+def _history_version(product_id: uuid.UUID):
+    """
+    Cheap fingerprint of a product's history: any new price log for one of its
+    listings moves latest_prices.price_log_id, a listing seen again without
+    a change moves last_seen_at (the end of its series), and a newly archived
+    day may have been pruned from price_logs. None if the product does not exist.
+    """
+    with engine.connect() as conn:
+        row = conn.execute(text('''
+            SELECT COUNT(lp.price_log_id) AS listings, MAX(lp.price_log_id) AS last_log,
+                   MAX(lp.last_seen_at) AS last_seen
+            FROM products p
+            LEFT JOIN competitor_products cp ON cp.product_id = p.id
+            LEFT JOIN latest_prices lp ON lp.competitor_product_id = cp.id
+            WHERE p.id = :product_id
+            GROUP BY p.id
+        ''').bindparams(_PRODUCT_ID), {"product_id": product_id}).fetchone()
+    if row is None:
+        return None
+    days = _archive_days()
+    return f"{row.listings}.{row.last_log or 0}.{row.last_seen or ''}.{len(days)}.{days[-1] if days else ''}"
+
+
+def _fetch_product_history(product_id: uuid.UUID, window: dict, competitor_clauses: list, params: dict,
+                           mode: str, points: int) -> list:
+    """
+    Read the product's change points in the window, plus each listing's last
+    log before `since` and its latest_prices.last_seen_at, and build the series.
+    Days pruned from price_logs are merged back in from the Parquet archive.
+    """
+    listing_sql = '''
+        SELECT cp.id AS competitor_product_id, c.id AS competitor_id, c.name AS competitor, lp.last_seen_at
+        FROM competitor_products cp
+        JOIN competitors c ON cp.competitor_id = c.id
+        LEFT JOIN latest_prices lp ON lp.competitor_product_id = cp.id
+        WHERE cp.product_id = :product_id
+    '''
+    sql = '''
+        SELECT c.id AS competitor_id, c.name AS competitor, cp.id AS competitor_product_id,
+               pl.id AS price_log_id, pl.price, pl.is_in_stock, pl.scraped_at
+        FROM competitor_products cp
+        JOIN price_logs pl ON pl.competitor_product_id = cp.id
+        JOIN competitors c ON cp.competitor_id = c.id
+        WHERE cp.product_id = :product_id
+    '''
+    clauses = list(competitor_clauses)
+    if competitor_clauses:
+        listing_sql += " AND " + " AND ".join(competitor_clauses)
+    if "until" in window:
+        clauses.append("pl.scraped_at < :until")
+    if "since" in window:
+        clauses.append('''(pl.scraped_at >= :since OR pl.id IN (
+            SELECT MAX(prev.id) FROM price_logs prev
+            JOIN competitor_products prev_cp ON prev.competitor_product_id = prev_cp.id
+            WHERE prev_cp.product_id = :product_id AND prev.scraped_at < :since
+            GROUP BY prev.competitor_product_id))''')
+    if clauses:
+        sql += " AND " + " AND ".join(clauses)
+    bind = {"product_id": product_id, **window, **params}
+    with engine.connect() as conn:
+        listing_rows = conn.execute(text(listing_sql).bindparams(_PRODUCT_ID), bind)
+        listings = {row.competitor_product_id: row for row in listing_rows}
+        rows = conn.execute(text(sql).bindparams(_PRODUCT_ID), bind).fetchall()
+
+    if listings and _archive_days():
+        live = {row.price_log_id for row in rows}
+        for log in _archived_logs(list(listings), end=window.get("until")):
+            if log["price_log_id"] not in live:
+                listing = listings[log["competitor_product_id"]]
+                rows.append(SimpleNamespace(competitor_id=listing.competitor_id, competitor=listing.competitor, **log))
+
+    last_seen = {listing_id: listing.last_seen_at for listing_id, listing in listings.items()}
+    return build_series(change_points(rows, window.get("since"), window.get("until"), last_seen), mode, points)
+
+
+@app.route('/api/products/<product_id>/history', methods=['GET'])
+def get_product_history(product_id):
+    """
+    Per-competitor price series for one product.
+
+    Query params: mode=daily|lttb|raw (default daily), points (LTTB target,
+    default 500), since / until (ISO 8601, until is exclusive), competitor
+    (comma-separated ids or names). Price logs are change points, so each
+    listing's price in force at `since` opens its series and its last price is
+    carried to when it was last seen. Responses carry an ETag derived from the
+    product's latest price logs; If-None-Match gets a 304 without reading the
+    history.
+    """
+    try:
+        pid = uuid.UUID(product_id)
+    except ValueError:
+        return jsonify({"error": "product id must be a UUID"}), 400
+
+    mode = request.args.get('mode', 'daily').lower()
+    if mode not in HISTORY_MODES:
+        return jsonify({"error": f"Unknown mode '{mode}'", "allowed": list(HISTORY_MODES)}), 400
+    try:
+        points = parse_points(request.args.get('points'))
+        window = _parse_window(request.args)
+        params = {}
+        competitor_clauses = _competitor_clauses(request.args, params)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        version = _history_version(pid)
+        if version is None:
+            return jsonify({"error": "Product not found"}), 404
+
+        query = "&".join(f"{k}={v}" for k, v in sorted(request.args.items(multi=True)))
+        etag = hashlib.sha1(f"{pid}|{version}|{query}".encode()).hexdigest()
+        if etag in request.if_none_match:
+            response = Response(status=304)
+        else:
+            series = _fetch_product_history(pid, window, competitor_clauses, params, mode, points)
+            response = jsonify({"product_id": str(pid), "mode": mode, "series": series})
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = "no-cache"
+        return response
+
+    except Exception as e:
+        logger.error(f"[HISTORY] Error fetching history for {product_id}: {e}", exc_info=True)
+        return jsonify({"error": str(e)}), 500
+
+
 # ── Brands Management API ───────────────────────────────────────
 
 @app.route('/api/brands', methods=['GET'])
@@ -0,0 +1,257 @@
+"""
+Asset Cache - On-disk HTTP cache for static assets of scraping contexts.
+
+Every browser context starts with an empty HTTP cache, so each run
+downloaded the same stylesheets, JS bundles and fonts from every site
+again. AssetCache routes a context's GET requests for ASSET_CACHE_TYPES
+and serves them from disk while fresh:
+
+    ASSET_CACHE_DIR/blobs/<sha256 of body>      content-addressed bodies (shared by URLs)
+    ASSET_CACHE_DIR/entries/<sha256 of url>.json status, headers, blob, expiry
+
+Freshness follows the response's Cache-Control (no-store, no-cache,
+max-age, Age) or Expires; responses with only validators (ETag /
+Last-Modified) stay fresh for ASSET_CACHE_HEURISTIC_TTL. Expired entries
+are revalidated with If-None-Match / If-Modified-Since, and a 304 is
+served from disk, as is an expired copy when the site cannot be reached.
+Blobs beyond ASSET_CACHE_MAX_MB are pruned, least recently served first.
+
+Types in SCRAPE_BLOCK_TYPES (images, media and fonts by default) are
+aborted by the request blocker before they reach the cache, so the default
+ASSET_CACHE_TYPES only lists stylesheets and scripts.
+
+Hits, misses and bytes served from disk are counted per key (competitor)
+for the ScrapeLog. Responses served from the cache carry an x-asset-cache
+header so transfer counters can leave them out.
+"""
+import hashlib
+import json
+import logging
+import os
+import time
+from email.utils import parsedate_to_datetime
+from typing import Dict, Iterable, Optional
+
+logger = logging.getLogger("asset_cache")
+
+ASSET_CACHE = os.environ.get("ASSET_CACHE", "true").lower() == "true"
+ASSET_CACHE_DIR = os.environ.get("ASSET_CACHE_DIR", "/app/data/asset_cache")
+ASSET_CACHE_TYPES = frozenset(
+    t.strip() for t in os.environ.get("ASSET_CACHE_TYPES", "stylesheet,script").split(",") if t.strip()
+)
+# Freshness (seconds) of responses with validators but no max-age/Expires
+ASSET_CACHE_HEURISTIC_TTL = int(os.environ.get("ASSET_CACHE_HEURISTIC_TTL", "3600"))
+ASSET_CACHE_MAX_MB = int(os.environ.get("ASSET_CACHE_MAX_MB", "200"))
+
+CACHE_HEADER = "x-asset-cache"
+
+# Hop-by-hop and encoding headers: the stored body is already decoded
+_DROP_HEADERS = {"content-encoding", "content-length", "transfer-encoding", "connection", "keep-alive", "set-cookie"}
+
+
+def _cache_control(headers: Dict[str, str]) -> Dict[str, Optional[str]]:
+    directives = {}
+    for part in headers.get("cache-control", "").split(","):
+        name, _, value = part.strip().partition("=")
+        if name:
+            directives[name.lower()] = value.strip('"') or None
+    return directives
+
+
+def _http_date(value: Optional[str]) -> Optional[float]:
+    try:
+        return parsedate_to_datetime(value).timestamp() if value else None
+    except (TypeError, ValueError):
+        return None
+
+
+def freshness(headers: Dict[str, str], now: float) -> Optional[float]:
+    """
+    Seconds a response stays fresh, 0 if it must be revalidated before
+    every use, or None if it must not be stored. `headers` are lower-cased.
+    """
+    cc = _cache_control(headers)
+    if "no-store" in cc or headers.get("vary", "").strip() == "*":
+        return None
+    revalidatable = bool(headers.get("etag") or headers.get("last-modified"))
+    if "no-cache" in cc:
+        return 0 if revalidatable else None
+    age = 0
+    try:
+        age = max(0, int(headers.get("age", "0")))
+    except ValueError:
+        pass
+    if (cc.get("max-age") or "").isdigit():
+        return max(0, int(cc["max-age"]) - age)
+    expires = _http_date(headers.get("expires"))
+    if expires is not None:
+        return max(0, expires - (_http_date(headers.get("date")) or now))
+    return ASSET_CACHE_HEURISTIC_TTL if revalidatable else None
+
+
+def _new_stats() -> dict:
+    return {"lookups": 0, "hits": 0, "revalidated": 0, "stale": 0, "misses": 0, "bytes_saved": 0, "bytes_stored": 0}
+
+
+class AssetCache:
+    """Disk-backed static asset cache shared by the contexts of a BrowserPool."""
+
+    def __init__(self, directory: str = ASSET_CACHE_DIR, types: Iterable[str] = ASSET_CACHE_TYPES,
+                 max_bytes: int = ASSET_CACHE_MAX_MB * 1024 * 1024):
+        self.directory = directory
+        self.types = frozenset(types)
+        self.max_bytes = max_bytes
+        self.stats: Dict[str, dict] = {}
+
+    # ── Storage ──
+
+    def _entry_path(self, url: str) -> str:
+        return os.path.join(self.directory, "entries", hashlib.sha256(url.encode("utf-8")).hexdigest() + ".json")
+
+    def _blob_path(self, digest: str) -> str:
+        return os.path.join(self.directory, "blobs", digest)
+
+    def _write(self, path: str, data: bytes):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def lookup(self, url: str) -> Optional[dict]:
+        """The stored entry for `url` with its body, or None if absent or unreadable."""
+        try:
+            with open(self._entry_path(url), encoding="utf-8") as f:
+                entry = json.load(f)
+            with open(self._blob_path(entry["blob"]), "rb") as f:
+                entry["body"] = f.read()
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+        return entry
+
+    def store(self, url: str, status: int, headers: Dict[str, str], body: bytes, now: Optional[float] = None) -> bool:
+        """Store a response if its headers allow it; True if stored."""
+        now = time.time() if now is None else now
+        fresh_for = freshness(headers, now)
+        if status != 200 or fresh_for is None:
+            return False
+        digest = hashlib.sha256(body).hexdigest()
+        try:
+            if os.path.exists(self._blob_path(digest)):
+                os.utime(self._blob_path(digest))
+            else:
+                self._write(self._blob_path(digest), body)
+            entry = {
+                "url": url, "status": status, "blob": digest, "size": len(body),
+                "headers": {k: v for k, v in headers.items() if k not in _DROP_HEADERS},
+                "stored_at": now, "expires_at": now + fresh_for,
+            }
+            self._write(self._entry_path(url), json.dumps(entry).encode("utf-8"))
+        except OSError as e:
+            logger.warning(f"[ASSET_CACHE] Could not store {url}: {e}")
+            return False
+        return True
+
+    def _refresh(self, entry: dict, headers: Dict[str, str], now: float):
+        """Extend an entry's expiry after a 304, with the 304's updated headers."""
+        entry = {k: v for k, v in entry.items() if k != "body"}
+        entry["headers"].update({k: v for k, v in headers.items() if k not in _DROP_HEADERS})
+        entry["expires_at"] = now + (freshness(entry["headers"], now) or 0)
+        try:
+            self._write(self._entry_path(entry["url"]), json.dumps(entry).encode("utf-8"))
+        except OSError as e:
+            logger.warning(f"[ASSET_CACHE] Could not refresh {entry['url']}: {e}")
+
+    def prune(self):
+        """Delete the least recently served blobs until the cache fits in max_bytes."""
+        blob_dir = os.path.join(self.directory, "blobs")
+        try:
+            blobs = [os.path.join(blob_dir, name) for name in os.listdir(blob_dir)]
+            blobs = sorted((os.stat(path).st_mtime, os.stat(path).st_size, path) for path in blobs)
+        except OSError:
+            return
+        total = sum(size for _, size, _ in blobs)
+        for _, size, path in blobs:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)  # Entries pointing at it become misses
+                total -= size
+            except OSError:
+                pass
+
+    # ── Routing ──
+
+    async def attach(self, context, key: str = "default"):
+        """Route `context`'s cacheable requests through the cache, counting them under `key`."""
+        stats = self.stats.setdefault(key, _new_stats())
+        await context.route("**/*", lambda route: self._handle(route, stats))
+        return self
+
+    async def _handle(self, route, stats: dict):
+        request = route.request
+        if request.method != "GET" or request.resource_type not in self.types:
+            await route.fallback()
+            return
+        stats["lookups"] += 1
+        now = time.time()
+        entry = self.lookup(request.url)
+        if entry and entry["expires_at"] > now:
+            await self._serve(route, entry, "hit")
+            stats["hits"] += 1
+            stats["bytes_saved"] += entry["size"]
+            return
+
+        headers = dict(request.headers)
+        if entry:
+            if entry["headers"].get("etag"):
+                headers["if-none-match"] = entry["headers"]["etag"]
+            if entry["headers"].get("last-modified"):
+                headers["if-modified-since"] = entry["headers"]["last-modified"]
+        try:
+            response = await route.fetch(headers=headers)
+        except Exception as e:
+            if entry:
+                # Site unreachable: an expired copy beats a failed request
+                await self._serve(route, entry, "stale")
+                stats["stale"] += 1
+                stats["bytes_saved"] += entry["size"]
+            else:
+                logger.debug(f"[ASSET_CACHE] Fetch failed for {request.url}: {e}")
+                await route.fallback()
+            return
+
+        if response.status == 304 and entry:
+            self._refresh(entry, response.headers, now)
+            await self._serve(route, entry, "revalidated")
+            stats["revalidated"] += 1
+            stats["bytes_saved"] += entry["size"]
+            return
+
+        body = await response.body()
+        stats["misses"] += 1
+        if self.store(request.url, response.status, response.headers, body, now):
+            stats["bytes_stored"] += len(body)
+        await route.fulfill(status=response.status, body=body,
+                            headers={k: v for k, v in response.headers.items() if k not in _DROP_HEADERS})
+
+    async def _serve(self, route, entry: dict, outcome: str):
+        try:
+            os.utime(self._blob_path(entry["blob"]))  # Recently served blobs survive pruning
+        except OSError:
+            pass
+        await route.fulfill(status=entry["status"], headers={**entry["headers"], CACHE_HEADER: outcome},
+                            body=entry["body"])
+
+    # ── Reporting ──
+
+    def metrics(self, key: str) -> dict:
+        stats = dict(self.stats.get(key) or _new_stats())
+        served = stats["hits"] + stats["revalidated"] + stats["stale"]
+        stats["hit_rate"] = round(served / stats["lookups"], 3) if stats["lookups"] else 0.0
+        return stats
+
+    def summary(self, key: str) -> str:
+        m = self.metrics(key)
+        return (f"{m['hits'] + m['revalidated'] + m['stale']}/{m['lookups']} assets from disk ({m['hit_rate']:.0%}), "
+                f"{m['bytes_saved'] // 1024} KB saved, {m['bytes_stored'] // 1024} KB stored")
@@ -0,0 +1,266 @@
+"""
+Browser Pool - One Chromium shared by every scraping phase.
+
+Launching Chromium costs seconds and a few hundred MB, and the pipeline used
+to do it once per phase (listings, deep scrape) and once per pipeline.py
+scraper. A BrowserPool launches the browser once and hands out pages from a
+context per key (usually the competitor name):
+
+    async with BrowserPool() as pool:
+        async with pool.page("Visuar", user_agent=UA) as page:
+            ...
+
+Contexts are recycled after BROWSER_POOL_MAX_PAGES pages: the context is
+retired, new pages get a fresh one, and the old one is closed once its last
+page is. This keeps cookies, caches and leaked renderer memory bounded. The
+browser is relaunched if it disconnects (e.g. a crash).
+
+Each key also gets a RequestBlocker (see resource_blocking) that is attached
+to every context created for it, so its metrics cover the key's whole run.
+With a StateStore (see browser_state), a key's contexts start from its saved
+cookies/localStorage and save them back when closed. With an AssetCache
+(see asset_cache), every context serves static assets from disk.
+"""
+import asyncio
+import logging
+import os
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+
+import resource_blocking
+from asset_cache import AssetCache
+from browser_state import StateStore
+from resource_blocking import RequestBlocker
+
+logger = logging.getLogger("browser_pool")
+
+# Pages served by one context before it is retired and replaced
+BROWSER_POOL_MAX_PAGES = int(os.environ.get("BROWSER_POOL_MAX_PAGES", "50"))
+BROWSER_HEADLESS = os.environ.get("BROWSER_HEADLESS", "true").lower() == "true"
+
+
+class _PooledContext:
+    def __init__(self, key: str, context):
+        self.key = key
+        self.context = context
+        self.pages_opened = 0
+        self.open_pages = 0
+        self.retired = False
+
+
+def process_tree_rss() -> Optional[int]:
+    """Resident memory (bytes) of this process plus all descendants (Chromium); None off Linux."""
+    try:
+        page_size = os.sysconf("SC_PAGE_SIZE")
+        children: Dict[int, list] = {}
+        for entry in os.listdir("/proc"):
+            if not entry.isdigit():
+                continue
+            try:
+                with open(f"/proc/{entry}/stat") as f:
+                    # The command name may contain spaces; fields resume after ')'
+                    ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+            except (OSError, IndexError, ValueError):
+                continue
+            children.setdefault(ppid, []).append(int(entry))
+
+        total, stack = 0, [os.getpid()]
+        while stack:
+            pid = stack.pop()
+            try:
+                with open(f"/proc/{pid}/statm") as f:
+                    total += int(f.read().split()[1]) * page_size
+            except (OSError, IndexError, ValueError):
+                pass
+            stack.extend(children.get(pid, ()))
+        return total
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+class BrowserPool:
+    """Shared browser with per-key, page-count-recycled contexts."""
+
+    def __init__(self, max_pages_per_context: int = BROWSER_POOL_MAX_PAGES, launcher=None,
+                 state_store: Optional[StateStore] = None, asset_cache: Optional[AssetCache] = None):
+        """
+        Args:
+            max_pages_per_context: Pages a context serves before it is recycled
+            launcher: Async callable returning a browser (defaults to headless Chromium)
+            state_store: Where contexts load/save their storage state (none by default)
+            asset_cache: On-disk static asset cache routed into every context (none by default)
+        """
+        self.max_pages_per_context = max(1, max_pages_per_context)
+        self._launcher = launcher
+        self.state_store = state_store
+        self.asset_cache = asset_cache
+        self._playwright = None
+        self._browser = None
+        self._contexts: Dict[str, _PooledContext] = {}
+        self._retired = set()
+        self._lock = asyncio.Lock()
+        self.blockers: Dict[str, RequestBlocker] = {}
+        if asset_cache and resource_blocking.SCRAPE_BLOCKING:
+            blocked = asset_cache.types & resource_blocking.SCRAPE_BLOCK_TYPES
+            if blocked:
+                logger.warning(
+                    f"[BROWSER_POOL] ASSET_CACHE_TYPES {sorted(blocked)} are blocked before the cache; "
+                    f"caching {sorted(asset_cache.types - blocked)}"
+                )
+        self.launches = 0
+        self.contexts_created = 0
+        self.contexts_recycled = 0
+        self.pages_opened = 0
+
+    async def __aenter__(self):
+        # The browser is launched by the first page(); HTTP-only runs never start it
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def _ensure_browser(self):
+        if self._browser is not None and self._browser.is_connected():
+            return
+        if self._browser is not None:
+            logger.warning("[BROWSER_POOL] Browser disconnected, relaunching")
+            self._contexts.clear()
+            self._retired.clear()
+        if self._launcher:
+            self._browser = await self._launcher()
+        else:
+            if self._playwright is None:
+                from playwright.async_api import async_playwright
+                self._playwright = await async_playwright().start()
+            self._browser = await self._playwright.chromium.launch(headless=BROWSER_HEADLESS)
+        self.launches += 1
+
+    async def _new_context(self, key: str, options: dict) -> _PooledContext:
+        state = self.state_store.load(key) if self.state_store else None
+        if state is not None:
+            try:
+                context = await self._browser.new_context(**options, storage_state=state)
+            except Exception as e:
+                logger.warning(f"[BROWSER_POOL] Saved state for {key} rejected ({e}), starting cold")
+                self.state_store.discard(key)
+                state = None
+        if state is None:
+            context = await self._browser.new_context(**options)
+        # Routes run last-registered first: the blocker decides, then falls back to the cache
+        if self.asset_cache:
+            await self.asset_cache.attach(context, key)
+        if resource_blocking.SCRAPE_BLOCKING:
+            blocker = self.blockers.setdefault(key, RequestBlocker(key))
+            await blocker.attach(context)
+        self.contexts_created += 1
+        return _PooledContext(key, context)
+
+    async def _close_context(self, pooled: _PooledContext):
+        if self.state_store:
+            await self.state_store.save(pooled.key, pooled.context)
+        await pooled.context.close()
+
+    async def _retire(self, pooled: _PooledContext):
+        pooled.retired = True
+        self.contexts_recycled += 1
+        if pooled.open_pages == 0:
+            await self._close_context(pooled)
+        else:
+            self._retired.add(pooled)
+
+    @asynccontextmanager
+    async def page(self, key: str = "default", **context_options):
+        """
+        Yield a new page in `key`'s context, closing the page afterwards.
+
+        `context_options` (user_agent, viewport, ...) are used when the key's
+        context is created; pages of a key share cookies and cache.
+        """
+        async with self._lock:
+            await self._ensure_browser()
+            pooled = self._contexts.get(key)
+            if pooled is not None and pooled.pages_opened >= self.max_pages_per_context:
+                del self._contexts[key]
+                await self._retire(pooled)
+                pooled = None
+            if pooled is None:
+                pooled = self._contexts[key] = await self._new_context(key, context_options)
+            pooled.pages_opened += 1
+            pooled.open_pages += 1
+            self.pages_opened += 1
+
+        try:
+            page = await pooled.context.new_page()
+        except Exception:
+            pooled.open_pages -= 1
+            raise
+        try:
+            yield page
+        finally:
+            pooled.open_pages -= 1
+            try:
+                await page.close()
+                if pooled.retired and pooled.open_pages == 0:
+                    self._retired.discard(pooled)
+                    await self._close_context(pooled)
+            except Exception as e:
+                logger.warning(f"[BROWSER_POOL] Failed to close {key} page/context: {e}")
+
+    def restored(self, key: str) -> bool:
+        """Whether `key`'s context started from saved storage state."""
+        return bool(self.state_store) and key in self.state_store.restored
+
+    def discard_state(self, key: str):
+        """Drop `key`'s saved state (e.g. after a failed scrape) so its next run starts cold."""
+        if self.state_store:
+            self.state_store.discard(key)
+
+    def blocker(self, key: str) -> Optional[RequestBlocker]:
+        """Request blocker shared by `key`'s contexts, if blocking is enabled."""
+        return self.blockers.get(key)
+
+    def stats(self) -> dict:
+        return {
+            "launches": self.launches,
+            "contexts_created": self.contexts_created,
+            "contexts_recycled": self.contexts_recycled,
+            "live_contexts": len(self._contexts) + len(self._retired),
+            "pages_opened": self.pages_opened,
+            "rss_bytes": process_tree_rss(),
+        }
+
+    async def close(self):
+        stats = self.stats()
+        rss = f"{stats['rss_bytes'] // (1024 * 1024)} MB" if stats["rss_bytes"] is not None else "n/a"
+        logger.info(
+            f"[BROWSER_POOL] Closing: {stats['launches']} launch(es), {stats['contexts_created']} context(s) "
+            f"({stats['contexts_recycled']} recycled), {stats['pages_opened']} page(s), RSS {rss}"
+        )
+        for pooled in list(self._contexts.values()) + list(self._retired):
+            try:
+                await self._close_context(pooled)
+            except Exception:
+                pass
+        self._contexts.clear()
+        self._retired.clear()
+        if self.asset_cache:
+            self.asset_cache.prune()
+        if self._browser is not None:
+            try:
+                await self._browser.close()
+            except Exception:
+                pass
+            self._browser = None
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+
+
+@asynccontextmanager
+async def borrow_pool(pool: Optional[BrowserPool] = None):
+    """Use `pool` if given, otherwise a private pool for the duration of the block."""
+    if pool is not None:
+        yield pool
+    else:
+        async with BrowserPool() as own:
+            yield own
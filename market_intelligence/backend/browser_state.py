@@ -0,0 +1,163 @@
+"""
+Browser State - Per-competitor storage state and popup memory across runs.
+
+Every run used to start from a blank browser context, so consent banners,
+newsletter and geo popups showed up again and the scraper waited for and
+dismissed them each time. A StateStore keeps, per key (competitor name):
+
+    BROWSER_STATE_DIR/<key>.state.json    Playwright storage_state (cookies, localStorage)
+    BROWSER_STATE_DIR/<key>.popups.json   which popup selectors fired on recent runs
+
+BrowserPool loads the state into each new context of the key and saves it
+back when the context is closed. Stale state is never fatal: files older
+than BROWSER_STATE_MAX_AGE_HOURS, unreadable files and states whose cookies
+have all expired are dropped and the context starts cold, and
+discard() forgets a key's state after a failed scrape.
+
+PopupMemory decides whether popup dismissal is needed: always on a cold
+context, and on a warm one until BROWSER_STATE_POPUP_QUIET_RUNS warm runs in
+a row saw no popup. Callers still do a quick check when skipping, and a
+popup showing up anyway is recorded so the next run dismisses again.
+"""
+import json
+import logging
+import os
+import re
+import time
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Set
+
+logger = logging.getLogger("browser_state")
+
+BROWSER_STATE = os.environ.get("BROWSER_STATE", "true").lower() == "true"
+BROWSER_STATE_DIR = os.environ.get("BROWSER_STATE_DIR", "/app/data/browser_state")
+# Saved state older than this is ignored (sessions and consent cookies go stale)
+BROWSER_STATE_MAX_AGE_HOURS = float(os.environ.get("BROWSER_STATE_MAX_AGE_HOURS", "72"))
+# Warm runs without any popup before dismissal is skipped
+BROWSER_STATE_POPUP_QUIET_RUNS = int(os.environ.get("BROWSER_STATE_POPUP_QUIET_RUNS", "2"))
+# Runs kept in a key's popup history
+POPUP_HISTORY = 10
+
+
+def _slug(key: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "_", key.lower()).strip("_") or "default"
+
+
+def _write_json(path: str, data) -> None:
+    """Write atomically so a crash mid-write never leaves a truncated file."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+def _remove(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class PopupMemory:
+    """Which popup selectors fired on a key's recent runs."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.runs: List[dict] = []
+        try:
+            with open(path, encoding="utf-8") as f:
+                runs = json.load(f).get("runs", [])
+            self.runs = [r for r in runs if isinstance(r, dict) and isinstance(r.get("fired"), list)]
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, AttributeError) as e:
+            logger.warning(f"[BROWSER_STATE] Ignoring unreadable popup memory {path}: {e}")
+
+    def needed(self, warm: bool) -> bool:
+        """Whether to wait for and dismiss popups on a context that is (not) `warm`."""
+        if not warm:
+            return True
+        warm_runs = [r for r in self.runs if r.get("warm")][-BROWSER_STATE_POPUP_QUIET_RUNS:]
+        return len(warm_runs) < BROWSER_STATE_POPUP_QUIET_RUNS or any(r["fired"] for r in warm_runs)
+
+    def ordered(self, selectors: Iterable[str]) -> List[str]:
+        """`selectors`, the ones that fired most often first."""
+        fired: Dict[str, int] = {}
+        for run in self.runs:
+            for selector in run["fired"]:
+                fired[selector] = fired.get(selector, 0) + 1
+        selectors = list(selectors)
+        return sorted(selectors, key=lambda s: (-fired.get(s, 0), selectors.index(s)))
+
+    def record(self, fired: List[str], warm: bool) -> None:
+        self.runs = (self.runs + [{
+            "at": datetime.now(timezone.utc).isoformat(), "warm": warm, "fired": list(fired),
+        }])[-POPUP_HISTORY:]
+        try:
+            _write_json(self.path, {"runs": self.runs})
+        except OSError as e:
+            logger.warning(f"[BROWSER_STATE] Could not save popup memory {self.path}: {e}")
+
+
+class StateStore:
+    """On-disk storage state and popup memory, one pair of files per key."""
+
+    def __init__(self, directory: str = BROWSER_STATE_DIR, max_age_hours: float = BROWSER_STATE_MAX_AGE_HOURS):
+        self.directory = directory
+        self.max_age_seconds = max_age_hours * 3600
+        self.restored: Set[str] = set()
+        self._discarded: Set[str] = set()
+        self._popups: Dict[str, PopupMemory] = {}
+
+    def _path(self, key: str, kind: str) -> str:
+        return os.path.join(self.directory, f"{_slug(key)}.{kind}.json")
+
+    def load(self, key: str) -> Optional[dict]:
+        """The saved storage state of `key`, or None if missing or stale."""
+        path = self._path(key, "state")
+        self.restored.discard(key)
+        try:
+            age = time.time() - os.path.getmtime(path)
+            if age > self.max_age_seconds:
+                raise ValueError(f"{age / 3600:.0f}h old")
+            with open(path, encoding="utf-8") as f:
+                state = json.load(f)
+            now = time.time()
+            cookies = [
+                c for c in state["cookies"]
+                if c.get("expires", -1) in (-1, None) or c["expires"] > now
+            ]
+            origins = list(state.get("origins", []))
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+            logger.info(f"[BROWSER_STATE] Dropping stale state for {key}: {e}")
+            _remove(path)
+            return None
+        if not cookies and not origins:
+            logger.info(f"[BROWSER_STATE] Dropping stale state for {key}: every cookie expired")
+            _remove(path)
+            return None
+        self.restored.add(key)
+        return {"cookies": cookies, "origins": origins}
+
+    async def save(self, key: str, context) -> None:
+        """Persist `context`'s storage state as `key`'s, unless the key was discarded."""
+        if key in self._discarded:
+            return
+        try:
+            _write_json(self._path(key, "state"), await context.storage_state())
+        except Exception as e:
+            logger.warning(f"[BROWSER_STATE] Could not save state for {key}: {e}")
+
+    def discard(self, key: str) -> None:
+        """Forget `key`'s state and don't save it again this run; its next context starts cold."""
+        self._discarded.add(key)
+        self.restored.discard(key)
+        _remove(self._path(key, "state"))
+
+    def popups(self, key: str) -> PopupMemory:
+        if key not in self._popups:
+            self._popups[key] = PopupMemory(self._path(key, "popups"))
+        return self._popups[key]
@@ -0,0 +1,146 @@
+"""
+Candidate Index - In-memory blocking + lexical pre-ranking of canonical
+products for the AI matcher.
+
+Built once per matching run from the products table, so matching N
+competitor products costs one query instead of N, and the prompt only
+carries the top-K plausible candidates instead of a whole BTU bucket (or
+the whole catalog when no BTU was detected).
+
+Blocking keys: BTU, brand, inverter flag and product type (split,
+cassette, piso/techo, portátil, ventana). Model codes such as "AR12BSHQ"
+or "MSAFC-12CRN8" get their own postings so an exact code hit is always
+considered, even across a wrongly parsed BTU.
+"""
+import os
+import re
+import unicodedata
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set
+
+from sqlalchemy.orm import Session
+
+from models import Product
+
+AI_MATCHER_TOP_K = int(os.environ.get("AI_MATCHER_TOP_K", "15"))
+
+PRODUCT_TYPES = [
+    ("cassette", ("cassette", "casette")),
+    ("piso_techo", ("piso techo", "piso/techo", "pisotecho", "piso-techo", "p/techo")),
+    ("portatil", ("portatil",)),
+    ("ventana", ("ventana",)),
+    ("split", ("split", "pared", "wall")),
+]
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:-[a-z0-9]+)*")
+_STOPWORDS = {"de", "con", "y", "el", "la", "aire", "acondicionado", "acondicionador", "acond", "btu", "frio", "calor"}
+
+
+def _fold(text: str) -> str:
+    """Lowercase and strip accents."""
+    text = unicodedata.normalize("NFKD", (text or "").lower())
+    return "".join(ch for ch in text if not unicodedata.combining(ch))
+
+
+def tokenize(text: str) -> Set[str]:
+    return {t for t in _TOKEN_RE.findall(_fold(text)) if len(t) > 1 and t not in _STOPWORDS}
+
+
+def model_codes(text: str) -> Set[str]:
+    """Alphanumeric tokens mixing letters and digits (4+ chars), hyphens removed."""
+    codes = set()
+    for token in _TOKEN_RE.findall(_fold(text)):
+        code = token.replace("-", "")
+        if len(code) >= 4 and re.search(r"\d", code) and re.search(r"[a-z]", code) and not re.fullmatch(r"\d+k?(btu)?", code):
+            codes.add(code)
+    return codes
+
+
+def detect_product_type(text: str) -> Optional[str]:
+    folded = _fold(text)
+    for product_type, needles in PRODUCT_TYPES:
+        if any(n in folded for n in needles):
+            return product_type
+    return None
+
+
+def _norm_brand(brand: Optional[str]) -> Optional[str]:
+    brand = _fold(brand).strip()
+    return brand if brand and brand not in ("unknown", "identified", "n/a") else None
+
+
+class CandidateIndex:
+    """Canonical products grouped by blocking keys, with model-code postings."""
+
+    def __init__(self, products: Iterable[Product]):
+        self.products: Dict[object, Product] = {}
+        self.by_btu = defaultdict(set)
+        self.by_brand = defaultdict(set)
+        self.by_code = defaultdict(set)
+        self._brand: Dict[object, Optional[str]] = {}
+        self._type: Dict[object, Optional[str]] = {}
+        self._tokens: Dict[object, Set[str]] = {}
+        self._codes: Dict[object, Set[str]] = {}
+
+        for p in products:
+            self.products[p.id] = p
+            brand = _norm_brand(p.brand)
+            self._brand[p.id] = brand
+            self._type[p.id] = detect_product_type(p.name)
+            self._tokens[p.id] = tokenize(p.name)
+            self._codes[p.id] = model_codes(p.name)
+            if p.capacity_btu:
+                self.by_btu[p.capacity_btu].add(p.id)
+            if brand:
+                self.by_brand[brand].add(p.id)
+            for code in self._codes[p.id]:
+                self.by_code[code].add(p.id)
+
+    @classmethod
+    def build(cls, session: Session) -> "CandidateIndex":
+        return cls(session.query(Product).all())
+
+    def __len__(self):
+        return len(self.products)
+
+    def _detect_brand(self, cp) -> Optional[str]:
+        brand = _norm_brand(cp.raw_brand)
+        if brand in self.by_brand:
+            return brand
+        tokens = tokenize(cp.name)
+        for known in self.by_brand:
+            if known in tokens:
+                return known
+        return brand
+
+    def candidates(self, cp, k: int = None) -> List[Product]:
+        """Top-k canonical products for a competitor product, best first."""
+        k = k or AI_MATCHER_TOP_K
+        brand = self._detect_brand(cp)
+        cp_type = detect_product_type(cp.name)
+        cp_tokens = tokenize(cp.name)
+        cp_codes = model_codes(f"{cp.name} {cp.sku or ''}")
+
+        # Blocking: BTU bucket when known, else the brand bucket, else everything
+        if cp.capacity_btu:
+            pool = set(self.by_btu.get(cp.capacity_btu, ()))
+        elif brand and brand in self.by_brand:
+            pool = set(self.by_brand[brand])
+        else:
+            pool = set(self.products)
+        for code in cp_codes:
+            pool |= self.by_code.get(code, set())
+
+        def score(pid):
+            tokens = self._tokens[pid]
+            union = cp_tokens | tokens
+            return (
+                4 * len(cp_codes & self._codes[pid])
+                + 3 * (brand is not None and brand == self._brand[pid])
+                + 2 * (cp_type is not None and cp_type == self._type[pid])
+                + 1 * (bool(cp.is_inverter) == bool(self.products[pid].is_inverter))
+                + (len(cp_tokens & tokens) / len(union) if union else 0.0)
+            )
+
+        ranked = sorted(pool, key=lambda pid: (-score(pid), self.products[pid].name or "", str(pid)))
+        return [self.products[pid] for pid in ranked[:k]]
@@ -0,0 +1,138 @@
+"""
+Extraction - Declarative, single round-trip DOM extraction for listing pages.
+
+Each site describes its product cards as a spec:
+
+    {"containers": [css, fallback css, ...],
+     "fields": {name: {"selectors": [css, fallback css, ...], "attr": None | attribute}}}
+
+extract() runs the whole spec inside the page with one page.evaluate call and
+returns plain dicts ({field: text or attribute value or None}), instead of
+5-8 awaited query_selector / inner_text / get_attribute calls per product.
+The first container selector with matches wins; for each field the first
+selector giving a non-empty value inside the card wins (attr None = innerText).
+extract_html() runs a spec against an HTML fragment (e.g. an infinite-scroll
+XHR answer) parsed in the page instead of against the live document.
+
+Turning those raw strings into prices/URLs is shared below.
+"""
+from typing import Dict, List, Optional
+
+_EXTRACT_JS = """({containers, fields, html}) => {
+    const root = html ? new DOMParser().parseFromString(html, "text/html") : document;
+    let cards = [];
+    for (const selector of containers) {
+        cards = Array.from(root.querySelectorAll(selector));
+        if (cards.length) break;
+    }
+    return cards.map(card => {
+        const item = {};
+        for (const [name, field] of Object.entries(fields)) {
+            item[name] = null;
+            for (const selector of field.selectors) {
+                const el = card.querySelector(selector);
+                const value = el && (field.attr ? el.getAttribute(field.attr) : el.innerText);
+                if (value) {
+                    item[name] = value;
+                    break;
+                }
+            }
+        }
+        return item;
+    });
+}"""
+
+
+def field(*selectors: str, attr: Optional[str] = None) -> dict:
+    """Spec entry: text (or `attr`) of the first selector with a non-empty value."""
+    return {"selectors": list(selectors), "attr": attr}
+
+
+async def extract(page, spec: dict) -> List[Dict[str, Optional[str]]]:
+    """Run a listing spec in the page; one round trip for every card."""
+    return await page.evaluate(_EXTRACT_JS, spec)
+
+
+async def extract_html(page, html: str, spec: dict) -> List[Dict[str, Optional[str]]]:
+    """Run a listing spec over an HTML fragment, parsed (not rendered) in the page."""
+    return await page.evaluate(_EXTRACT_JS, {**spec, "html": html})
+
+
+# ── Shared parsing ──────────────────────────────────────────
+
+def clean_text(value: Optional[str]) -> Optional[str]:
+    """Stripped text, or None for missing/blank values."""
+    value = (value or "").strip()
+    return value or None
+
+
+def parse_price(value: Optional[str], after: Optional[str] = None) -> float:
+    """
+    Guaraní price from display text ("Gs. 5.989.000" -> 5989000.0); 0.0 when
+    there is none. With `after`, only the text after its last occurrence is
+    used ("18 x Gs. 615.000" with after="Gs." keeps the cash amount).
+    """
+    if not value:
+        return 0.0
+    if after and after in value:
+        value = value.split(after)[-1]
+    digits = "".join(filter(str.isdigit, value))
+    return float(digits) if digits else 0.0
+
+
+def parse_number(value: Optional[str]) -> float:
+    """Machine-readable price (e.g. a `content` attribute); 0.0 if invalid."""
+    try:
+        return float(value) if value else 0.0
+    except ValueError:
+        return 0.0
+
+
+def absolute_url(url: Optional[str], base: str) -> Optional[str]:
+    """Prefix site-relative links with the site origin."""
+    if url and url.startswith('/'):
+        return base.rstrip('/') + url
+    return url
+
+
+# ── Site specs ──────────────────────────────────────────────
+
+VISUAR_LISTING = {
+    "containers": [".js-product-miniature"],
+    "fields": {
+        "link": field(".product-title a", "a.product-thumbnail", attr="href"),
+        "title": field(".product-title"),
+        "price_content": field(".product-price", attr="content"),
+        "price_text": field(".product-price"),
+        "sku": field(".product-reference"),
+        "brand": field(".product-brand"),
+    },
+}
+
+BRISTOL_LISTING = {
+    "containers": ["#catalogoProductos .it"],
+    "fields": {
+        "title": field(".info .tit h2"),
+        "url": field(".info .tit h2", attr="href"),
+        "price_text": field(".precios .venta .monto"),
+    },
+}
+
+GG_LISTING = {
+    "containers": [".product.item-catalogo", ".product"],
+    "fields": {
+        "title": field(".product-title a", "h3 a"),
+        "url": field(".product-title a", "h3 a", attr="href"),
+        # Contado (cash) price first, generic price block as fallback
+        "price_text": field(".btn-cart-contado span", ".product-price span"),
+    },
+}
+
+# Product detail page (deep scrape): the page itself is the only "card"
+DETAIL_PAGE = {
+    "containers": ["html"],
+    "fields": {
+        "description": field(".product-description-short", "#product-desc-tab", ".caracteristicas", ".description"),
+        "sku": field(".product-reference"),
+    },
+}
@@ -0,0 +1,123 @@
+"""
+Fuzzy Pre-Matcher - Fast local matching stage in front of the AI matcher.
+
+Scores every unmatched competitor product against the canonical catalog in
+bulk with rapidfuzz's cdist (token_set_ratio, vectorized in C), blocked by
+BTU so each block is a small dense matrix instead of an O(N×M) Python loop.
+
+  - Very high-confidence pairs (same BTU, same brand, same inverter flag,
+    score >= FUZZY_AUTO_ACCEPT, ahead of the runner-up by at least
+    FUZZY_AUTO_ACCEPT_MARGIN) are applied directly and never reach the LLM.
+    token_set_ratio scores 100 whenever one title's tokens are a subset of
+    the other's, so a generic listing can tie several catalog models; ties
+    go to the LLM instead of to whichever model comes first.
+  - Everything else is handed to run_ai_matching, together with its best
+    fuzzy suggestion, which is used as a deterministic fallback when the
+    API call fails.
+"""
+import logging
+import os
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+import numpy as np
+from rapidfuzz import fuzz, process, utils
+from sqlalchemy.orm import Session
+
+from models import CompetitorProduct, PendingMapping, Product
+
+logger = logging.getLogger("fuzzy_prematcher")
+
+FUZZY_AUTO_ACCEPT = int(os.environ.get("FUZZY_AUTO_ACCEPT", "95"))
+# Points the best score must beat the second-best candidate by to be auto-accepted
+FUZZY_AUTO_ACCEPT_MARGIN = int(os.environ.get("FUZZY_AUTO_ACCEPT_MARGIN", "5"))
+
+_ANY_BTU = None
+
+
+def _same_brand(cp: CompetitorProduct, product: Product) -> bool:
+    return (cp.raw_brand or "").lower().strip() == (product.brand or "").lower().strip()
+
+
+def _ranked_matches(cps: List[CompetitorProduct], products: List[Product]) -> Dict[int, Tuple[Product, int, int]]:
+    """(best product, its score, runner-up score) per competitor product; see best_fuzzy_matches."""
+    if not cps or not products:
+        return {}
+
+    by_btu = defaultdict(list)
+    for p in products:
+        by_btu[p.capacity_btu].append(p)
+
+    blocks = defaultdict(list)
+    for cp in cps:
+        blocks[cp.capacity_btu if cp.capacity_btu else _ANY_BTU].append(cp)
+
+    ranked = {}
+    for btu, block_cps in blocks.items():
+        block_products = products if btu is _ANY_BTU else by_btu.get(btu, [])
+        if not block_products:
+            continue
+        scores = process.cdist(
+            [cp.name for cp in block_cps],
+            [p.name for p in block_products],
+            scorer=fuzz.token_set_ratio,
+            processor=utils.default_process,
+            workers=-1,
+        )
+        top = scores.argmax(axis=1)
+        # Second-best score per row (0 when the block has a single candidate)
+        second = np.partition(scores, -2, axis=1)[:, -2] if len(block_products) > 1 else np.zeros(len(block_cps))
+        for row, cp in enumerate(block_cps):
+            col = int(top[row])
+            ranked[cp.id] = (block_products[col], int(np.rint(scores[row, col])), int(np.rint(second[row])))
+    return ranked
+
+
+def best_fuzzy_matches(cps: List[CompetitorProduct], products: List[Product]) -> Dict[int, Tuple[Product, int]]:
+    """
+    Best canonical product and token_set_ratio score (0-100) for each competitor product.
+
+    Products with a detected BTU are only scored against canonical products
+    with the same BTU; products without one are scored against the whole
+    catalog (they can be suggested, never auto-accepted).
+    """
+    return {cp_id: (product, score) for cp_id, (product, score, _) in _ranked_matches(cps, products).items()}
+
+
+def run_fuzzy_prematching(session: Session, unmatched: List[CompetitorProduct], products: List[Product] = None,
+                          auto_accept: int = None) -> Tuple[List[CompetitorProduct], Dict[int, Tuple[Product, int]]]:
+    """
+    Auto-accept unambiguous pairs (a clear best match) and return what is left for the AI matcher.
+
+    Returns (ambiguous, suggestions): the competitor products that still need
+    the LLM, and the best fuzzy (product, score) per competitor product.
+    """
+    auto_accept = auto_accept if auto_accept is not None else FUZZY_AUTO_ACCEPT
+    if products is None:
+        products = session.query(Product).all()
+    ranked = _ranked_matches(unmatched, products)
+    suggestions = {cp_id: (product, score) for cp_id, (product, score, _) in ranked.items()}
+
+    ambiguous = []
+    accepted = 0
+    for cp in unmatched:
+        match = ranked.get(cp.id)
+        if match:
+            product, score, runner_up = match
+            if (score >= auto_accept and score - runner_up >= FUZZY_AUTO_ACCEPT_MARGIN
+                    and cp.capacity_btu and product.capacity_btu == cp.capacity_btu
+                    and bool(cp.is_inverter) == bool(product.is_inverter) and _same_brand(cp, product)):
+                cp.product_id = product.id
+                session.query(PendingMapping).filter_by(competitor_product_id=cp.id).delete()
+                session.add(PendingMapping(
+                    competitor_product_id=cp.id,
+                    suggested_product_id=product.id,
+                    match_score=score,
+                ))
+                accepted += 1
+                logger.info(f"[FUZZY] AUTO-APPLIED '{cp.name}' → '{product.name}' (Score: {score})")
+                continue
+        ambiguous.append(cp)
+
+    logger.info(f"[FUZZY] Auto-accepted: {accepted} | Sent to AI: {len(ambiguous)}")
+    return ambiguous, suggestions
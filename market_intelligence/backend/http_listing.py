@@ -0,0 +1,116 @@
+"""
+HTTP Listing - Browser-free listing fetch for PrestaShop catalogues (Visuar).
+
+PrestaShop answers a category URL with the listing as JSON when it is asked
+the way its own theme JS asks (XHR headers + `from-xhr`), including every
+product's name, URL, reference, manufacturer and numeric price. One request
+over a pooled httpx client replaces a Chromium page, its scroll waits and
+its renderer memory.
+
+The answer is validated before it is trusted (validate_listing). HTTP
+errors, non-JSON answers and failed validation all raise ListingFetchError,
+so callers can fall back to the Playwright path.
+"""
+import os
+import time
+from typing import List, Tuple
+
+import httpx
+
+from extraction import absolute_url, clean_text, parse_number, parse_price
+
+HTTP_LISTING_FETCH = os.environ.get("HTTP_LISTING_FETCH", "true").lower() == "true"
+HTTP_LISTING_TIMEOUT = float(os.environ.get("HTTP_LISTING_TIMEOUT", "20"))
+# The AC category has ~70 products; far fewer means a partial or blocked answer
+HTTP_LISTING_MIN_ITEMS = int(os.environ.get("HTTP_LISTING_MIN_ITEMS", "10"))
+
+VISUAR_BASE_URL = "https://www.visuar.com.py"
+VISUAR_LISTING_URL = VISUAR_BASE_URL + "/hogar/aires-acondicionados/"
+
+_XHR_HEADERS = {
+    "Accept": "application/json, text/javascript, */*; q=0.01",
+    "X-Requested-With": "XMLHttpRequest",
+}
+
+
+class ListingFetchError(Exception):
+    """The HTTP listing could not be fetched or did not pass validation."""
+
+
+def http_client(user_agent: str) -> httpx.AsyncClient:
+    """Keep-alive client to share across the fetches of a run."""
+    return httpx.AsyncClient(
+        headers={"User-Agent": user_agent},
+        timeout=HTTP_LISTING_TIMEOUT,
+        follow_redirects=True,
+        limits=httpx.Limits(max_connections=10, max_keepalive_connections=5),
+    )
+
+
+def parse_prestashop_products(products: list, base_url: str) -> List[dict]:
+    """Listing items ({name, price, regular_price, url, sku, brand}) from PrestaShop product dicts."""
+    items = []
+    for product in products:
+        if not isinstance(product, dict):
+            continue
+        name = clean_text(product.get("name"))
+        price = parse_number(product.get("price_amount")) or parse_price(product.get("price"))
+        if not name or price <= 0:
+            continue
+        regular_price = None
+        if product.get("has_discount"):
+            regular_price = parse_number(product.get("regular_price_amount")) or None
+        items.append({
+            "name": name,
+            "price": price,
+            "regular_price": regular_price,
+            "url": absolute_url(product.get("url") or product.get("link"), base_url),
+            "sku": clean_text(product.get("reference")),
+            "brand": clean_text(product.get("manufacturer_name")),
+        })
+    return items
+
+
+def validate_listing(payload: dict, items: List[dict], min_items: int = HTTP_LISTING_MIN_ITEMS):
+    """
+    Raise ListingFetchError unless the answer looks like the complete listing:
+    at least `min_items` usable products, every product the pagination
+    reports, and nearly all of them with a name and price.
+    """
+    products = payload["products"]
+    if len(items) < min_items:
+        raise ListingFetchError(f"only {len(items)} usable products (minimum {min_items})")
+    total = (payload.get("pagination") or {}).get("total_items")
+    if total is not None and int(total) > len(products):
+        raise ListingFetchError(f"partial listing: {len(products)} of {total} products")
+    if len(items) < 0.8 * len(products):
+        raise ListingFetchError(f"{len(products) - len(items)} of {len(products)} products without name/price")
+
+
+async def fetch_prestashop_listing(client: httpx.AsyncClient, url: str, base_url: str,
+                                   min_items: int = HTTP_LISTING_MIN_ITEMS) -> Tuple[List[dict], dict]:
+    """
+    Fetch every product of a PrestaShop category in one JSON request.
+
+    Returns (items, metrics); raises ListingFetchError when the browser
+    path should be used instead.
+    """
+    started = time.perf_counter()
+    try:
+        response = await client.get(url, params={"resultsPerPage": 9999999, "from-xhr": ""}, headers=_XHR_HEADERS)
+        response.raise_for_status()
+        payload = response.json()
+    except httpx.HTTPError as e:
+        raise ListingFetchError(f"request failed: {e}") from e
+    except ValueError as e:
+        raise ListingFetchError("answer is not JSON") from e
+    if not isinstance(payload, dict) or not isinstance(payload.get("products"), list):
+        raise ListingFetchError("no product list in answer")
+
+    items = parse_prestashop_products(payload["products"], base_url)
+    validate_listing(payload, items, min_items)
+    return items, {
+        "fetch": "http",
+        "bytes_transferred": len(response.content),
+        "elapsed_ms": round((time.perf_counter() - started) * 1000),
+    }
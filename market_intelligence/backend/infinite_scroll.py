@@ -0,0 +1,146 @@
+"""
+Infinite Scroll - Read lazily loaded listings from their XHR answers.
+
+Scrolling a page until every product has been revealed costs a fixed sleep
+per scroll. The products themselves arrive as same-site XHR/fetch answers
+(HTML fragments, or JSON carrying HTML), so instead:
+
+  1. ListingResponses subscribes to the page's responses and hands back the
+     next one whose body contains product cards (`marker`), as soon as it
+     arrives, instead of sleeping a fixed time after each scroll.
+  2. The first such answer reveals the pagination endpoint. When its URL
+     carries a page/offset query parameter, following_pages() requests the
+     next pages directly (page.request shares the context's cookies) until
+     one has no cards.
+
+Callers keep their DOM scroll loop as the fallback when no listing answer
+is seen at all.
+"""
+import asyncio
+import json
+import os
+from typing import List, NamedTuple, Optional
+from urllib.parse import parse_qsl, urlencode, urlparse, urlunparse
+
+# Seconds to wait for a listing answer after triggering a load
+INFINITE_SCROLL_TIMEOUT = float(os.environ.get("INFINITE_SCROLL_TIMEOUT", "10"))
+INFINITE_SCROLL_MAX_PAGES = int(os.environ.get("INFINITE_SCROLL_MAX_PAGES", "40"))
+
+# Query parameters holding a page number / an item offset
+PAGE_PARAMS = ("page", "pagina", "pag", "p", "nropagina", "numpagina")
+OFFSET_PARAMS = ("offset", "start", "desde", "inicio", "from", "skip")
+
+XHR_HEADERS = {"X-Requested-With": "XMLHttpRequest"}
+
+
+class ListingResponse(NamedTuple):
+    url: str
+    method: str
+    fragments: List[str]
+
+
+class PageParam(NamedTuple):
+    name: str
+    value: int
+    is_offset: bool
+
+
+def html_fragments(body: str, marker: str) -> List[str]:
+    """HTML in `body` containing `marker`: the body itself, or strings inside a JSON body."""
+    try:
+        data = json.loads(body)
+    except ValueError:
+        return [body] if marker in body else []
+
+    found, stack = [], [data]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, str):
+            if marker in node:
+                found.append(node)
+        elif isinstance(node, dict):
+            stack.extend(reversed(list(node.values())))
+        elif isinstance(node, list):
+            stack.extend(reversed(node))
+    return found
+
+
+def page_param(url: str) -> Optional[PageParam]:
+    """The numeric page or offset query parameter of a pagination URL, if any."""
+    for name, value in parse_qsl(urlparse(url).query, keep_blank_values=True):
+        if value.isdigit():
+            if name.lower() in PAGE_PARAMS:
+                return PageParam(name, int(value), False)
+            if name.lower() in OFFSET_PARAMS:
+                return PageParam(name, int(value), True)
+    return None
+
+
+def with_param(url: str, name: str, value: int) -> str:
+    parts = urlparse(url)
+    query = [(k, str(value) if k == name else v) for k, v in parse_qsl(parts.query, keep_blank_values=True)]
+    return urlunparse(parts._replace(query=urlencode(query)))
+
+
+class ListingResponses:
+    """Same-site XHR/fetch responses of a page, queued as they arrive."""
+
+    def __init__(self, page, host: str, marker: str):
+        self.page = page
+        self.host = host
+        self.marker = marker
+        self._queue: asyncio.Queue = asyncio.Queue()
+        page.on("response", self._on_response)
+
+    def _on_response(self, response):
+        if response.request.resource_type not in ("xhr", "fetch"):
+            return
+        hostname = urlparse(response.url).hostname or ""
+        if hostname == self.host or hostname.endswith("." + self.host):
+            self._queue.put_nowait(response)
+
+    async def next_listing(self, timeout: Optional[float] = None) -> Optional[ListingResponse]:
+        """The next queued/arriving response with product cards, or None after `timeout` seconds."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + (INFINITE_SCROLL_TIMEOUT if timeout is None else timeout)
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return None
+            try:
+                response = await asyncio.wait_for(self._queue.get(), remaining)
+                body = await response.text()
+            except asyncio.TimeoutError:
+                return None
+            except Exception:
+                continue  # Redirects and aborted requests have no body
+            fragments = html_fragments(body, self.marker)
+            if fragments:
+                return ListingResponse(response.url, response.request.method, fragments)
+
+    def close(self):
+        self.page.remove_listener("response", self._on_response)
+
+
+async def following_pages(page, first: ListingResponse, per_page: int, marker: str,
+                          max_pages: int = INFINITE_SCROLL_MAX_PAGES):
+    """
+    Yield the card fragments of the pages after `first`, requested directly
+    by stepping its page/offset parameter. Stops at the first page without
+    cards; yields nothing if the endpoint is not a paginated GET.
+    """
+    param = page_param(first.url)
+    if param is None or first.method != "GET":
+        return
+    step = max(per_page, 1) if param.is_offset else 1
+    for n in range(1, max_pages + 1):
+        response = await page.request.get(
+            with_param(first.url, param.name, param.value + step * n),
+            headers={**XHR_HEADERS, "Referer": page.url},
+        )
+        if not response.ok:
+            return
+        fragments = html_fragments(await response.text(), marker)
+        if not fragments:
+            return
+        yield fragments
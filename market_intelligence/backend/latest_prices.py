@@ -0,0 +1,124 @@
+"""
+Latest Prices - Keeps the latest_prices table in step with price_logs.
+
+latest_prices holds one row per competitor product pointing at its most
+recent PriceLog. It is upserted in the same transaction as the PriceLog
+inserts (see scraper._sync_to_database), so the dashboard view, the API
+and the alert engine read O(catalog) rows instead of the full history.
+
+It also drives change-data-capture ingest: the scraper loads the last known
+price/stock per listing once per run (last_known_prices), writes a PriceLog
+only when they differ, and bumps last_seen_at for the rest (touch_latest_prices).
+"""
+import logging
+from typing import Dict, Iterable, Tuple
+
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from models import CompetitorProduct, LatestPrice, PriceLog
+
+logger = logging.getLogger("latest_prices")
+
+BATCH_SIZE = 500
+
+_COLUMNS = ["competitor_product_id", "price_log_id", "price", "is_in_stock", "scraped_at", "last_seen_at"]
+
+
+def _source(price_log_ids: list):
+    """Newest of the given PriceLogs per competitor product, as latest_prices rows."""
+    newest = (
+        select(func.max(PriceLog.id))
+        .where(PriceLog.id.in_(price_log_ids))
+        .group_by(PriceLog.competitor_product_id)
+    )
+    return select(
+        PriceLog.competitor_product_id, PriceLog.id, PriceLog.price, PriceLog.is_in_stock, PriceLog.scraped_at,
+        PriceLog.scraped_at.label("last_seen_at"),
+    ).where(PriceLog.id.in_(newest))
+
+
+def refresh_latest_prices(session: Session, price_log_ids: Iterable[int]) -> int:
+    """
+    Upsert latest_prices from freshly written PriceLog ids.
+
+    A row is only replaced by a newer PriceLog (higher id), so batches can be
+    applied in any order. Does not commit. Returns the number of ids applied.
+    """
+    price_log_ids = sorted(set(price_log_ids))
+    dialect = session.get_bind().dialect.name
+
+    for start in range(0, len(price_log_ids), BATCH_SIZE):
+        source = _source(price_log_ids[start:start + BATCH_SIZE])
+        if dialect in ("postgresql", "sqlite"):
+            dialect_insert = pg_insert if dialect == "postgresql" else sqlite_insert
+            stmt = dialect_insert(LatestPrice).from_select(_COLUMNS, source)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[LatestPrice.competitor_product_id],
+                set_={col: stmt.excluded[col] for col in _COLUMNS[1:]},
+                where=LatestPrice.price_log_id < stmt.excluded.price_log_id,
+            )
+            session.execute(stmt)
+        else:
+            rows = source.subquery()
+            session.execute(
+                delete(LatestPrice)
+                .where(LatestPrice.competitor_product_id.in_(select(rows.c.competitor_product_id)))
+                .execution_options(synchronize_session=False)
+            )
+            session.execute(insert(LatestPrice).from_select(_COLUMNS, select(rows)))
+
+    if price_log_ids:
+        logger.info(f"[LATEST_PRICES] Refreshed from {len(price_log_ids)} price log(s)")
+    return len(price_log_ids)
+
+
+def last_known_prices(session: Session, competitor_ids: Iterable[int]) -> Dict[int, Tuple[float, bool]]:
+    """{competitor_product_id: (price, is_in_stock)} for every listing of the given competitors, in one query."""
+    rows = session.execute(
+        select(LatestPrice.competitor_product_id, LatestPrice.price, LatestPrice.is_in_stock)
+        .join(CompetitorProduct, LatestPrice.competitor_product_id == CompetitorProduct.id)
+        .where(CompetitorProduct.competitor_id.in_(list(competitor_ids)))
+    )
+    return {r.competitor_product_id: (float(r.price), bool(r.is_in_stock)) for r in rows}
+
+
+def is_price_change(last, price: float, is_in_stock: bool) -> bool:
+    """True when a scraped (price, stock) differs from the last known one (None = never seen)."""
+    if last is None:
+        return True
+    return round(float(price), 2) != round(last[0], 2) or bool(is_in_stock) != last[1]
+
+
+def touch_latest_prices(session: Session, competitor_product_ids: Iterable[int]) -> int:
+    """Heartbeat: mark unchanged listings as seen now. Does not commit."""
+    competitor_product_ids = sorted(set(competitor_product_ids))
+    for start in range(0, len(competitor_product_ids), BATCH_SIZE):
+        session.execute(
+            update(LatestPrice)
+            .where(LatestPrice.competitor_product_id.in_(competitor_product_ids[start:start + BATCH_SIZE]))
+            .values(last_seen_at=func.now())
+            .execution_options(synchronize_session=False)
+        )
+    return len(competitor_product_ids)
+
+
+def touch_competitor_listings(session: Session, competitor_id: int, seen_since) -> int:
+    """
+    Heartbeat for a source whose listing page did not change: every listing of
+    the competitor seen since `seen_since` (the last synced run) is seen again now.
+    """
+    result = session.execute(
+        update(LatestPrice)
+        .where(
+            LatestPrice.competitor_product_id.in_(
+                select(CompetitorProduct.id).where(CompetitorProduct.competitor_id == competitor_id)
+            ),
+            LatestPrice.last_seen_at >= seen_since,
+        )
+        .values(last_seen_at=func.now())
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount
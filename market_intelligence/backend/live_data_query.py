@@ -0,0 +1,172 @@
+"""
+Live Data Query - SQL builder for /api/live_data over opportunity_margin_vw.
+
+  - Keyset (cursor) pagination: every sort ends in product_id, so the key is
+    unique and the next page is "rows after the last key" instead of an
+    OFFSET that has to skip (and sort) every earlier row.
+  - Server-side filters: brand, btu, status, competitor.
+  - Field projection: ?fields= trims each row to what the client shows.
+
+Everything that reaches the SQL text comes from the whitelists below; user
+values are always bound parameters. Invalid input raises ValueError.
+"""
+import base64
+import json
+from typing import Dict, List, Optional, Tuple
+
+# sort name -> [(sql expression, direction)], last key must be unique
+LIVE_DATA_SORTS = {
+    "loss_first": [
+        ("CASE WHEN status = 'LOSS' THEN 0 ELSE 1 END", "ASC"),
+        ("COALESCE(ABS(diff_percent), -1)", "DESC"),  # = ABS(diff_percent) DESC NULLS LAST
+        ("product_id", "ASC"),
+    ],
+    "diff": [
+        ("COALESCE(ABS(diff_percent), -1)", "DESC"),
+        ("product_id", "ASC"),
+    ],
+    "name": [
+        ("name", "ASC"),
+        ("product_id", "ASC"),
+    ],
+}
+
+LIVE_DATA_FIELDS = (
+    "id", "name", "brand", "btu", "internal_cost", "visuar_price", "gg_price", "gg_name",
+    "lowest_comp", "real_margin_percent", "diff_percent", "status", "last_updated",
+)
+
+# ?competitor= value -> view column that must have a price
+COMPETITOR_COLUMNS = {
+    "bristol": "bristol_price",
+    "gg": "gg_price",
+}
+
+STATUSES = ("WIN", "LOSS", "EQUAL", "NO_COMPETITOR_DATA")
+
+VIEW_COLUMNS = """
+    product_id, name, brand, capacity_btu, internal_cost,
+    visuar_price, bristol_price, gg_price, gg_name, real_margin_percent,
+    diff_percent, status, last_updated
+"""
+
+
+def _csv(value: Optional[str]) -> List[str]:
+    return [part.strip() for part in (value or "").split(",") if part.strip()]
+
+
+def parse_filters(args) -> Dict[str, tuple]:
+    """Validated filters from the query string, as sorted tuples (hashable, cache-key friendly)."""
+    filters = {}
+    brands = _csv(args.get("brand"))
+    if brands:
+        filters["brand"] = tuple(sorted({b.upper() for b in brands}))
+    btus = _csv(args.get("btu"))
+    if btus:
+        try:
+            filters["btu"] = tuple(sorted({int(b) for b in btus}))
+        except ValueError:
+            raise ValueError("btu must be a comma-separated list of integers")
+    statuses = _csv(args.get("status"))
+    if statuses:
+        unknown = {s.upper() for s in statuses} - set(STATUSES)
+        if unknown:
+            raise ValueError(f"Unknown status {sorted(unknown)}; allowed: {list(STATUSES)}")
+        filters["status"] = tuple(sorted({s.upper() for s in statuses}))
+    competitors = _csv(args.get("competitor"))
+    if competitors:
+        unknown = {c.lower() for c in competitors} - set(COMPETITOR_COLUMNS)
+        if unknown:
+            raise ValueError(f"Unknown competitor {sorted(unknown)}; allowed: {sorted(COMPETITOR_COLUMNS)}")
+        filters["competitor"] = tuple(sorted({c.lower() for c in competitors}))
+    return filters
+
+
+def parse_fields(value: Optional[str]) -> Optional[Tuple[str, ...]]:
+    """Validated ?fields= projection ("id" is always kept), or None for every field."""
+    fields = _csv(value)
+    if not fields:
+        return None
+    unknown = set(fields) - set(LIVE_DATA_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown fields {sorted(unknown)}; allowed: {list(LIVE_DATA_FIELDS)}")
+    return tuple(f for f in LIVE_DATA_FIELDS if f in fields or f == "id")
+
+
+def encode_cursor(sort: str, key: list) -> str:
+    payload = json.dumps([sort, key], default=str, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: str) -> list:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        cursor_sort, key = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except Exception:
+        raise ValueError("Malformed cursor")
+    if cursor_sort != sort or len(key) != len(LIVE_DATA_SORTS[sort]):
+        raise ValueError("Cursor does not belong to this sort order")
+    return key
+
+
+def _where(filters: Dict[str, tuple], params: dict) -> List[str]:
+    clauses = []
+    if "brand" in filters:
+        names = [f"brand_{i}" for i in range(len(filters["brand"]))]
+        params.update(zip(names, filters["brand"]))
+        clauses.append("UPPER(brand) IN (" + ", ".join(f":{n}" for n in names) + ")")
+    if "btu" in filters:
+        names = [f"btu_{i}" for i in range(len(filters["btu"]))]
+        params.update(zip(names, filters["btu"]))
+        clauses.append("capacity_btu IN (" + ", ".join(f":{n}" for n in names) + ")")
+    if "status" in filters:
+        names = [f"status_{i}" for i in range(len(filters["status"]))]
+        params.update(zip(names, filters["status"]))
+        clauses.append("status IN (" + ", ".join(f":{n}" for n in names) + ")")
+    if "competitor" in filters:
+        clauses.append("(" + " OR ".join(f"{COMPETITOR_COLUMNS[c]} IS NOT NULL" for c in filters["competitor"]) + ")")
+    return clauses
+
+
+def _after(keys: list, values: list, params: dict) -> str:
+    """Row-value "after this key" predicate for mixed ASC/DESC keys."""
+    params.update({f"k_{i}": value for i, value in enumerate(values)})
+    alternatives = []
+    for i, (expr, direction) in enumerate(keys):
+        terms = [f"{keys[j][0]} = :k_{j}" for j in range(i)]
+        terms.append(f"{expr} {'>' if direction == 'ASC' else '<'} :k_{i}")
+        alternatives.append("(" + " AND ".join(terms) + ")")
+    return "(" + " OR ".join(alternatives) + ")"
+
+
+def build_page_query(sort: str, limit: int, filters: Dict[str, tuple],
+                     cursor_key: Optional[list] = None, offset: int = 0) -> Tuple[str, dict]:
+    """
+    SELECT for one page. Fetches limit + 1 rows so the caller knows whether a
+    next page exists; the sort keys come back as sort_k0..sort_kN.
+    """
+    keys = LIVE_DATA_SORTS[sort]
+    params = {"limit": limit + 1}
+    clauses = _where(filters, params)
+    if cursor_key is not None:
+        clauses.append(_after(keys, cursor_key, params))
+
+    sql = f"SELECT {VIEW_COLUMNS}, " + ", ".join(f"{expr} AS sort_k{i}" for i, (expr, _) in enumerate(keys))
+    sql += " FROM opportunity_margin_vw"
+    if clauses:
+        sql += " WHERE " + " AND ".join(clauses)
+    sql += " ORDER BY " + ", ".join(f"{expr} {direction}" for expr, direction in keys)
+    sql += " LIMIT :limit"
+    if cursor_key is None and offset:
+        sql += " OFFSET :offset"
+        params["offset"] = offset
+    return sql, params
+
+
+def build_count_query(filters: Dict[str, tuple]) -> Tuple[str, dict]:
+    params = {}
+    clauses = _where(filters, params)
+    sql = "SELECT COUNT(*) FROM opportunity_margin_vw"
+    if clauses:
+        sql += " WHERE " + " AND ".join(clauses)
+    return sql, params
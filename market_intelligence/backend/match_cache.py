@@ -0,0 +1,114 @@
+"""
+Match Cache - Persistent store for AI matching verdicts.
+
+Every pipeline run asks the matcher about each competitor product that is
+still unmapped. Most of them were already judged on a previous run against
+exactly the same candidates, so their verdict is stored here keyed by a
+fingerprint of:
+  - the competitor product fields that go into the prompt
+  - the candidate set sent with it (ids + attributes)
+  - the model and prompt version
+
+An unchanged product is answered from the cache; it is only re-queried when
+its own data changes or the candidate catalog for its BTU bucket does.
+Entries expire after AI_CACHE_TTL_HOURS and the table is capped at
+AI_CACHE_MAX_ENTRIES (oldest first).
+"""
+import hashlib
+import json
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.orm import Session
+
+from models import CompetitorProduct, MatchCacheEntry, Product
+
+logger = logging.getLogger("match_cache")
+
+AI_CACHE_ENABLED = os.environ.get("AI_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+AI_CACHE_TTL_HOURS = int(os.environ.get("AI_CACHE_TTL_HOURS", "168"))
+AI_CACHE_MAX_ENTRIES = int(os.environ.get("AI_CACHE_MAX_ENTRIES", "50000"))
+
+# Bump when the prompt templates change in a way that invalidates old verdicts
+PROMPT_VERSION = "1"
+
+
+def fingerprint(cp: CompetitorProduct, candidates: List[Product], model: str = "") -> str:
+    """Stable hash of everything that determines the AI verdict for `cp`."""
+    payload = {
+        "v": PROMPT_VERSION,
+        "model": model,
+        "cp": [cp.name, cp.raw_brand, cp.sku, cp.capacity_btu, bool(cp.is_inverter), cp.description],
+        "candidates": sorted(
+            [str(c.id), c.name, c.brand, c.capacity_btu, bool(c.is_inverter), c.description]
+            for c in candidates
+        ),
+    }
+    encoded = json.dumps(payload, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+class MatchResultCache:
+    """Read-through cache over the ai_match_cache table, with hit/miss counters."""
+
+    def __init__(self, session: Session, ttl_hours: int = None, max_entries: int = None):
+        self.session = session
+        self.ttl = timedelta(hours=ttl_hours if ttl_hours is not None else AI_CACHE_TTL_HOURS)
+        self.max_entries = max_entries if max_entries is not None else AI_CACHE_MAX_ENTRIES
+        self.stats = {"hits": 0, "misses": 0, "stores": 0, "evicted": 0}
+
+    def get_many(self, fingerprints: List[str]) -> Dict[str, dict]:
+        """Return cached results for the given fingerprints in one query, counting hits and misses."""
+        if not fingerprints:
+            return {}
+        now = datetime.now(timezone.utc)
+        rows = self.session.execute(
+            select(MatchCacheEntry.fingerprint, MatchCacheEntry.result)
+            .where(MatchCacheEntry.fingerprint.in_(fingerprints), MatchCacheEntry.expires_at > now)
+        ).all()
+        found = {r.fingerprint: r.result for r in rows}
+        if found:
+            self.session.execute(
+                update(MatchCacheEntry)
+                .where(MatchCacheEntry.fingerprint.in_(list(found)))
+                .values(hits=MatchCacheEntry.hits + 1)
+            )
+        self.stats["hits"] += len(found)
+        self.stats["misses"] += len(set(fingerprints)) - len(found)
+        return found
+
+    def put(self, key: str, competitor_product_id: int, result: dict):
+        """Store (or refresh) a verdict."""
+        self.session.merge(MatchCacheEntry(
+            fingerprint=key,
+            competitor_product_id=competitor_product_id,
+            result=result,
+            hits=0,
+            expires_at=datetime.now(timezone.utc) + self.ttl,
+        ))
+        self.stats["stores"] += 1
+
+    def evict(self):
+        """Drop expired entries, then the oldest ones beyond max_entries."""
+        now = datetime.now(timezone.utc)
+        evicted = self.session.execute(
+            delete(MatchCacheEntry).where(MatchCacheEntry.expires_at <= now)
+        ).rowcount or 0
+
+        overflow = self.session.query(MatchCacheEntry).count() - self.max_entries
+        if overflow > 0:
+            oldest = select(MatchCacheEntry.fingerprint).order_by(MatchCacheEntry.expires_at).limit(overflow)
+            evicted += self.session.execute(
+                delete(MatchCacheEntry).where(MatchCacheEntry.fingerprint.in_(oldest))
+            ).rowcount or 0
+
+        self.stats["evicted"] += evicted
+        if evicted:
+            logger.info(f"[AI_CACHE] Evicted {evicted} entr(y/ies)")
+
+    def hit_rate(self) -> float:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return self.stats["hits"] / lookups if lookups else 0.0
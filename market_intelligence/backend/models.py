@@ -1,5 +1,5 @@
 import datetime
-from sqlalchemy import Column, Integer, String, Boolean, Numeric, DateTime, Float, ForeignKey, Text, JSON, func, LargeBinary
+from sqlalchemy import Column, Integer, String, Boolean, Numeric, DateTime, Float, ForeignKey, Text, JSON, func, LargeBinary, UniqueConstraint, Index, inspect
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import declarative_base, relationship
 
@@ -37,6 +37,10 @@ class Competitor(Base):
 class CompetitorProduct(Base):
     """A raw product scraped from a competitor, before or after mapping to canonical."""
     __tablename__ = 'competitor_products'
+    __table_args__ = (
+        # Natural key used by the bulk sync upsert (ON CONFLICT target on PostgreSQL)
+        UniqueConstraint('competitor_id', 'name', name='uq_competitor_products_competitor_name'),
+    )
 
     id = Column(Integer, primary_key=True)
     competitor_id = Column(Integer, ForeignKey('competitors.id'), nullable=False)
@@ -59,6 +63,10 @@ class CompetitorProduct(Base):
 class PriceLog(Base):
     """Historical append-only price log for a competitor product."""
     __tablename__ = 'price_logs'
+    __table_args__ = (
+        # Per-listing time series (product history endpoint)
+        Index('idx_price_logs_listing_time', 'competitor_product_id', 'scraped_at'),
+    )
 
     id = Column(Integer, primary_key=True)
     competitor_product_id = Column(Integer, ForeignKey('competitor_products.id'), nullable=False)
@@ -93,9 +101,13 @@ class ScrapeLog(Base):
     competitor_id = Column(Integer, ForeignKey('competitors.id'), nullable=True)
     started_at = Column(DateTime)
     finished_at = Column(DateTime)
-    status = Column(String(20))       # 'success', 'partial', 'failed'
+    status = Column(String(20))       # 'success', 'unchanged', 'partial', 'failed', 'skipped'
     products_scraped = Column(Integer)
     error_message = Column(Text)
+    # sha256 of the listing's product cards; equal to the last run's means 'unchanged'
+    fingerprint = Column(String(64))
+    # Browser stats for the run: requests, blocked by type, bytes transferred/saved
+    metrics = Column(JSON)
 
     competitor = relationship("Competitor")
 
@@ -136,6 +148,35 @@ class NotificationLog(Base):
     price_log = relationship("PriceLog")
 
 
+class LatestPrice(Base):
+    """Most recent PriceLog per competitor product, maintained on ingest so reads don't scan history."""
+    __tablename__ = 'latest_prices'
+
+    competitor_product_id = Column(Integer, ForeignKey('competitor_products.id', ondelete='CASCADE'), primary_key=True)
+    price_log_id = Column(Integer, ForeignKey('price_logs.id'), nullable=False)
+    price = Column(Float, nullable=False)
+    is_in_stock = Column(Boolean, default=True)
+    scraped_at = Column(DateTime)
+    # Last run that saw this listing; price_logs only gets a row when price/stock change
+    last_seen_at = Column(DateTime)
+
+    competitor_product = relationship("CompetitorProduct")
+    price_log = relationship("PriceLog")
+
+
+class MatchCacheEntry(Base):
+    """Cached AI verdict for a competitor product against one specific candidate set."""
+    __tablename__ = 'ai_match_cache'
+
+    # sha256 of the competitor product fields + the candidate set sent in the prompt
+    fingerprint = Column(String(64), primary_key=True)
+    competitor_product_id = Column(Integer, ForeignKey('competitor_products.id', ondelete='CASCADE'), nullable=False)
+    result = Column(JSON, nullable=False)
+    hits = Column(Integer, default=0)
+    created_at = Column(DateTime, server_default=func.now())
+    expires_at = Column(DateTime, nullable=False)
+
+
 class Brand(Base):
     """Known brands for product matching and extraction."""
     __tablename__ = 'brands'
@@ -147,3 +188,106 @@ class Brand(Base):
     is_known = Column(Boolean, default=True)
     created_at = Column(DateTime, server_default=func.now())
 
+
+# Nullable columns added to existing tables after they first shipped.
+# create_all() never alters a table, so PostgreSQL gets them from
+# database/migrations/ and SQLite from upgrade_sqlite_schema() at startup.
+SQLITE_ADDED_COLUMNS = {
+    "scrape_logs": {"fingerprint": "VARCHAR(64)", "metrics": "JSON"},
+    "latest_prices": {"last_seen_at": "DATETIME"},
+}
+
+
+def _has_unique_key(inspector, table: str, columns: set) -> bool:
+    keys = inspector.get_unique_constraints(table) + [i for i in inspector.get_indexes(table) if i["unique"]]
+    return any(set(key["column_names"]) == columns for key in keys)
+
+
+def _add_competitor_products_key(conn) -> int:
+    """
+    SQLite version of add_competitor_products_unique_key.sql: merge rows sharing
+    (competitor_id, name) into the oldest one, then add the unique index the
+    bulk sync upsert targets. Returns the number of rows merged.
+    """
+    conn.exec_driver_sql("DROP TABLE IF EXISTS temp.cp_duplicates")
+    conn.exec_driver_sql('''
+        CREATE TEMP TABLE cp_duplicates AS
+        SELECT id, keep_id FROM (
+            SELECT id, MIN(id) OVER (PARTITION BY competitor_id, name) AS keep_id
+            FROM competitor_products
+        ) WHERE id <> keep_id
+    ''')
+    merged = conn.exec_driver_sql("SELECT COUNT(*) FROM cp_duplicates").scalar()
+    if merged:
+        tables = set(inspect(conn).get_table_names())
+        for table in ("price_logs", "pending_mappings"):
+            conn.exec_driver_sql(f'''
+                UPDATE {table}
+                SET competitor_product_id = (
+                    SELECT keep_id FROM cp_duplicates d WHERE d.id = {table}.competitor_product_id
+                )
+                WHERE competitor_product_id IN (SELECT id FROM cp_duplicates)
+            ''')
+        # Derived rows of the merged listings are rebuilt (latest_prices) or re-learned (match cache)
+        if "latest_prices" in tables:
+            conn.exec_driver_sql('''
+                DELETE FROM latest_prices WHERE competitor_product_id IN (SELECT id FROM cp_duplicates)
+                    OR competitor_product_id IN (SELECT keep_id FROM cp_duplicates)
+            ''')
+            _backfill_latest_prices(conn, "SELECT keep_id FROM cp_duplicates")
+        if "ai_match_cache" in tables:
+            conn.exec_driver_sql(
+                "DELETE FROM ai_match_cache WHERE competitor_product_id IN (SELECT id FROM cp_duplicates)"
+            )
+        conn.exec_driver_sql("DELETE FROM competitor_products WHERE id IN (SELECT id FROM cp_duplicates)")
+    conn.exec_driver_sql("DROP TABLE temp.cp_duplicates")
+    conn.exec_driver_sql(
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_competitor_products_competitor_name "
+        "ON competitor_products (competitor_id, name)"
+    )
+    return merged
+
+
+def _backfill_latest_prices(conn, listings: str = "SELECT competitor_product_id FROM price_logs") -> int:
+    """
+    Insert the newest price log of each listing id selected by `listings` into
+    latest_prices, as add_latest_prices.sql does on PostgreSQL.
+    """
+    return conn.exec_driver_sql(f'''
+        INSERT INTO latest_prices (competitor_product_id, price_log_id, price, is_in_stock, scraped_at, last_seen_at)
+        SELECT competitor_product_id, id, price, is_in_stock, scraped_at, scraped_at
+        FROM price_logs
+        WHERE id IN (SELECT MAX(id) FROM price_logs GROUP BY competitor_product_id)
+            AND competitor_product_id IN ({listings})
+    ''').rowcount
+
+
+def upgrade_sqlite_schema(engine) -> list:
+    """
+    Bring an existing SQLite database up to the models (idempotent): add the
+    SQLITE_ADDED_COLUMNS it lacks and the competitor_products natural key,
+    and fill an empty latest_prices (created by create_all() on a database
+    that already has price history). Returns a description of each change made; no-op on other dialects.
+    """
+    if engine.dialect.name != "sqlite":
+        return []
+    changes = []
+    with engine.begin() as conn:
+        inspector = inspect(conn)
+        for table, columns in SQLITE_ADDED_COLUMNS.items():
+            if not inspector.has_table(table):
+                continue
+            present = {column["name"] for column in inspector.get_columns(table)}
+            for name, ddl in columns.items():
+                if name not in present:
+                    conn.exec_driver_sql(f"ALTER TABLE {table} ADD COLUMN {name} {ddl}")
+                    changes.append(f"added column {table}.{name}")
+        if not _has_unique_key(inspector, "competitor_products", {"competitor_id", "name"}):
+            merged = _add_competitor_products_key(conn)
+            changes.append(f"added uq_competitor_products_competitor_name ({merged} duplicate listings merged)")
+        if (inspector.has_table("latest_prices")
+                and conn.exec_driver_sql("SELECT 1 FROM latest_prices LIMIT 1").first() is None):
+            filled = _backfill_latest_prices(conn)
+            if filled:
+                changes.append(f"backfilled latest_prices for {filled} listings")
+    return changes
@@ -4,7 +4,14 @@ import os
 import re
 import logging
 from datetime import datetime
-from playwright.async_api import async_playwright
+
+from asset_cache import ASSET_CACHE, AssetCache
+from browser_pool import BrowserPool, borrow_pool
+from browser_state import BROWSER_STATE, StateStore
+from http_listing import (
+    HTTP_LISTING_FETCH, VISUAR_BASE_URL, VISUAR_LISTING_URL, ListingFetchError, fetch_prestashop_listing, http_client,
+)
+from waits import PageWaits
 
 # ============================================================
 # VISUAR MARKET INTELLIGENCE - UNIFIED PIPELINE
@@ -12,6 +19,7 @@ from playwright.async_api import async_playwright
 # ============================================================
 
 JSON_OUTPUT_DIR = os.environ.get("JSON_OUTPUT_DIR", "/app/output")
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
 
 logging.basicConfig(
     level=logging.INFO,
@@ -61,31 +69,74 @@ def extract_brand(title: str, brand_hint: str = None) -> str:
 
 # ── Scrapers ────────────────────────────────────────────────
 
-async def scrape_visuar() -> list:
-    """Scrape Visuar AC products with pagination support."""
-    logger.info("[VISUAR] Starting scrape...")
+async def fetch_visuar_http() -> tuple:
+    """(products, metrics) from Visuar's PrestaShop JSON listing, without a browser.
+
+    Raises ListingFetchError when the answer fails validation.
+    """
+    async with http_client(USER_AGENT) as client:
+        items, metrics = await fetch_prestashop_listing(client, VISUAR_LISTING_URL, VISUAR_BASE_URL)
+    logger.info(f"[VISUAR] HTTP listing: {len(items)} items, {metrics['bytes_transferred'] // 1024} KB "
+                f"in {metrics['elapsed_ms']} ms")
+
     products = []
     seen_titles = set()
+    for item in items:
+        title = item["name"]
+        if title in seen_titles:
+            continue
+        seen_titles.add(title)
+        products.append({
+            "name": title,
+            "price": item["price"],
+            "regular_price": item["regular_price"],
+            "btu": normalize_btu(title),
+            "is_inverter": 'inverter' in title.lower(),
+            "brand": extract_brand(title, item["brand"])
+        })
+    return products, metrics
+
+
+async def scrape_visuar(browser_metrics: dict = None, pool: BrowserPool = None) -> list:
+    """Scrape Visuar AC products with pagination support.
+
+    Tries the browser-free HTTP listing first (HTTP_LISTING_FETCH) and only
+    opens a page from `pool` (else a private one) when that fails.
+    Fetch/request-blocking/wait stats for the run are stored in
+    browser_metrics["visuar"].
+    """
+    logger.info("[VISUAR] Starting scrape...")
+    if HTTP_LISTING_FETCH:
+        try:
+            products, metrics = await fetch_visuar_http()
+            if browser_metrics is not None:
+                browser_metrics["visuar"] = metrics
+            logger.info(f"[VISUAR] Extracted {len(products)} products")
+            return products
+        except ListingFetchError as e:
+            logger.warning(f"[VISUAR] HTTP listing failed ({e}), falling back to the browser")
 
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=True)
-        context = await browser.new_context(
-            user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
-        )
-        page = await context.new_page()
+    products = []
+    seen_titles = set()
+    card_count = 0  # cards on the page at the last query_selector_all
 
+    async with borrow_pool(pool) as pool, pool.page("Visuar", user_agent=USER_AGENT) as page:
+        waits = PageWaits(page)
         try:
             await page.goto(
                 "https://www.visuar.com.py/hogar/aires-acondicionados/",
-                wait_until='networkidle',
+                wait_until='domcontentloaded',
                 timeout=30000
             )
+            await page.wait_for_selector('article.js-product-miniature', timeout=20000)
 
             while True:
                 await page.mouse.wheel(0, 2000)
-                await page.wait_for_timeout(1000)
+                # New cards, or a quiet DOM, instead of a fixed second
+                await waits.count_growth('article.js-product-miniature', card_count, quiet_ms=500, timeout_ms=5000)
 
                 items = await page.query_selector_all('article.js-product-miniature')
+                card_count = len(items)
                 for item in items:
                     title_el = await item.query_selector('.product-title')
                     brand_el = await item.query_selector('.product-brand')
@@ -133,7 +184,8 @@ async def scrape_visuar() -> list:
                     load_more = await page.query_selector('.next.js-search-link, .infinite-scroll-button')
                     if load_more and await load_more.is_visible():
                         await load_more.click()
-                        await page.wait_for_timeout(3000)
+                        # The next page arrives over XHR (or a reload) on the listing URL
+                        await waits.network_idle(r"aires-acondicionados", idle_ms=500, timeout_ms=10000)
                     else:
                         break
                 except Exception:
@@ -141,45 +193,53 @@ async def scrape_visuar() -> list:
 
         except Exception as e:
             logger.error(f"[VISUAR] Scrape error: {e}", exc_info=True)
-        finally:
-            await browser.close()
+
+    blocker = pool.blocker("Visuar")
+    if blocker:
+        logger.info(f"[VISUAR] Browser: {blocker.summary()}")
+    logger.info(f"[VISUAR] Waits: {waits.summary()}")
+    if pool.asset_cache:
+        logger.info(f"[VISUAR] Asset cache: {pool.asset_cache.summary('Visuar')}")
+    if browser_metrics is not None:
+        browser_metrics["visuar"] = {**(blocker.metrics() if blocker else {}), "waits": waits.metrics()}
+        if pool.asset_cache:
+            browser_metrics["visuar"]["asset_cache"] = pool.asset_cache.metrics("Visuar")
 
     logger.info(f"[VISUAR] Extracted {len(products)} products")
     return products
 
 
-async def scrape_gg() -> list:
-    """Scrape Gonzalez Gimenez AC products with infinite scroll."""
+async def scrape_gg(browser_metrics: dict = None, pool: BrowserPool = None) -> list:
+    """Scrape Gonzalez Gimenez AC products with infinite scroll.
+
+    Uses `pool` if given (else a private one). Request-blocking and wait
+    stats for the run are stored in browser_metrics["gg"].
+    """
     logger.info("[GG] Starting scrape...")
     products = []
     seen_titles = set()
 
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=True)
-        context = await browser.new_context(
-            user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
-        )
-        page = await context.new_page()
-
+    async with borrow_pool(pool) as pool, pool.page("Gonzalez Gimenez", user_agent=USER_AGENT) as page:
+        waits = PageWaits(page)
         try:
             await page.goto(
                 "https://www.gonzalezgimenez.com.py/categoria/127/acondicionadores-de-aire",
-                wait_until='networkidle',
+                wait_until='domcontentloaded',
                 timeout=30000
             )
+            await page.wait_for_selector('.product', timeout=30000)
 
             # Infinite scroll to load all products
             prev_count = 0
             retries = 0
             while retries < 4:
                 await page.mouse.wheel(0, 4000)
-                await page.wait_for_timeout(1500)
-                items = await page.query_selector_all('.product')
-                if len(items) == prev_count:
+                count = await waits.count_growth('.product', prev_count, quiet_ms=1500, timeout_ms=8000)
+                if count <= prev_count:
                     retries += 1
                 else:
                     retries = 0
-                    prev_count = len(items)
+                    prev_count = count
 
             items = await page.query_selector_all('.product')
             logger.info(f"[GG] Found {len(items)} DOM elements after scrolling")
@@ -231,8 +291,17 @@ async def scrape_gg() -> list:
 
         except Exception as e:
             logger.error(f"[GG] Scrape error: {e}", exc_info=True)
-        finally:
-            await browser.close()
+
+    blocker = pool.blocker("Gonzalez Gimenez")
+    if blocker:
+        logger.info(f"[GG] Browser: {blocker.summary()}")
+    logger.info(f"[GG] Waits: {waits.summary()}")
+    if pool.asset_cache:
+        logger.info(f"[GG] Asset cache: {pool.asset_cache.summary('Gonzalez Gimenez')}")
+    if browser_metrics is not None:
+        browser_metrics["gg"] = {**(blocker.metrics() if blocker else {}), "waits": waits.metrics()}
+        if pool.asset_cache:
+            browser_metrics["gg"]["asset_cache"] = pool.asset_cache.metrics("Gonzalez Gimenez")
 
     logger.info(f"[GG] Extracted {len(products)} products")
     return products
@@ -278,9 +347,13 @@ async def run_pipeline() -> dict:
     logger.info("[PIPELINE] Starting Market Intelligence Pipeline")
     logger.info("=" * 60)
 
-    # Phase 1: Scrape both sources
-    visuar_products = await scrape_visuar()
-    gg_products = await scrape_gg()
+    # Phase 1: Scrape both sources with one browser
+    browser_metrics = {}
+    async with BrowserPool(state_store=StateStore() if BROWSER_STATE else None,
+                           asset_cache=AssetCache() if ASSET_CACHE else None) as pool:
+        visuar_products = await scrape_visuar(browser_metrics, pool)
+        gg_products = await scrape_gg(browser_metrics, pool)
+        browser_metrics["pool"] = pool.stats()
 
     # Phase 2: Save as categorized JSON for the frontend
     visuar_categorized = categorize_by_brand(visuar_products)
@@ -297,7 +370,8 @@ async def run_pipeline() -> dict:
         "visuar_count": len(visuar_products),
         "gg_count": len(gg_products),
         "visuar_brands": sorted(visuar_categorized.keys()),
-        "gg_brands": sorted(gg_categorized.keys())
+        "gg_brands": sorted(gg_categorized.keys()),
+        "browser": browser_metrics
     }
     save_json(metadata, "scrape_metadata.json")
 
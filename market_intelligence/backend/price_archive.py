@@ -0,0 +1,229 @@
+"""
+Price Archive - Columnar (Parquet) snapshots of closed days of price_logs.
+
+price_logs is append-only, so a day is immutable once it is over. The
+compaction job writes every closed day to a Hive-partitioned Parquet
+dataset:
+
+    ARCHIVE_DIR/scraped_date=2024-01-31/competitor_id=2/part-0.parquet
+
+and marks the day with a _SUCCESS file so it is never rewritten. With
+prune=True, archived rows are then deleted from the live table, except the
+ones still referenced by latest_prices or notifications_log. Pruned days
+stay visible: /api/products/<id>/history and /api/export/price_history merge
+the archive back in (the API needs pyarrow and ARCHIVE_DIR too).
+
+The reader returns NumPy columns (or a pandas DataFrame) for a product,
+competitor product, competitor and/or time range, and only opens the
+partitions the filter can match.
+
+Requires pyarrow (pandas only for as_pandas=True).
+"""
+import logging
+import os
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import create_engine, delete, func, select
+from sqlalchemy.orm import Session, sessionmaker
+
+from models import Base, CompetitorProduct, LatestPrice, NotificationLog, PriceLog
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:  # optional dependency: only the archive job needs it
+    pa = ds = pq = None
+
+logger = logging.getLogger("price_archive")
+
+DATABASE_URL = os.environ.get("DATABASE_URL", "sqlite:///data/market_intel.db")
+ARCHIVE_DIR = os.environ.get("ARCHIVE_DIR", "/app/archive")
+ARCHIVE_PRUNE = os.environ.get("ARCHIVE_PRUNE", "false").lower() == "true"
+
+COLUMNS = ["price_log_id", "competitor_product_id", "product_id", "price", "is_in_stock", "scraped_at"]
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise RuntimeError("pyarrow is required for the price archive (pip install pyarrow)")
+
+
+def _schema():
+    return pa.schema([
+        ("price_log_id", pa.int64()),
+        ("competitor_product_id", pa.int32()),
+        ("product_id", pa.string()),
+        ("price", pa.float64()),
+        ("is_in_stock", pa.bool_()),
+        ("scraped_at", pa.timestamp("us")),
+    ])
+
+
+def _partitioning():
+    return ds.partitioning(
+        pa.schema([("scraped_date", pa.string()), ("competitor_id", pa.int32())]), flavor="hive"
+    )
+
+
+def _day_dir(archive_dir: str, day: date) -> str:
+    return os.path.join(archive_dir, f"scraped_date={day.isoformat()}")
+
+
+def archived_days(archive_dir: str = ARCHIVE_DIR) -> List[date]:
+    """Days with a complete snapshot (_SUCCESS marker present)."""
+    if not os.path.isdir(archive_dir):
+        return []
+    days = []
+    for name in os.listdir(archive_dir):
+        if name.startswith("scraped_date=") and os.path.exists(os.path.join(archive_dir, name, "_SUCCESS")):
+            days.append(date.fromisoformat(name.split("=", 1)[1]))
+    return sorted(days)
+
+
+def _closed_days(session: Session, today: date) -> List[date]:
+    """Distinct days with price logs, strictly before `today`."""
+    day_expr = func.date(PriceLog.scraped_at)
+    rows = session.execute(
+        select(day_expr).where(PriceLog.scraped_at < datetime.combine(today, time.min)).distinct()
+    ).scalars()
+    return sorted(d if isinstance(d, date) else date.fromisoformat(d) for d in rows if d is not None)
+
+
+def _write_day(session: Session, archive_dir: str, day: date) -> int:
+    start = datetime.combine(day, time.min)
+    rows = session.execute(
+        select(
+            PriceLog.id, PriceLog.competitor_product_id, CompetitorProduct.competitor_id,
+            CompetitorProduct.product_id, PriceLog.price, PriceLog.is_in_stock, PriceLog.scraped_at,
+        )
+        .join(CompetitorProduct, PriceLog.competitor_product_id == CompetitorProduct.id)
+        .where(PriceLog.scraped_at >= start, PriceLog.scraped_at < start + timedelta(days=1))
+        .order_by(PriceLog.id)
+    ).all()
+
+    by_competitor: Dict[int, Dict[str, list]] = {}
+    for row in rows:
+        cols = by_competitor.setdefault(row.competitor_id, {name: [] for name in COLUMNS})
+        cols["price_log_id"].append(row.id)
+        cols["competitor_product_id"].append(row.competitor_product_id)
+        cols["product_id"].append(str(row.product_id) if row.product_id else None)
+        cols["price"].append(float(row.price))
+        cols["is_in_stock"].append(bool(row.is_in_stock))
+        scraped_at = row.scraped_at
+        if scraped_at.tzinfo is not None:
+            scraped_at = scraped_at.astimezone(timezone.utc).replace(tzinfo=None)
+        cols["scraped_at"].append(scraped_at)
+
+    day_dir = _day_dir(archive_dir, day)
+    for competitor_id, cols in by_competitor.items():
+        part_dir = os.path.join(day_dir, f"competitor_id={competitor_id}")
+        os.makedirs(part_dir, exist_ok=True)
+        pq.write_table(pa.table(cols, schema=_schema()), os.path.join(part_dir, "part-0.parquet"))
+
+    os.makedirs(day_dir, exist_ok=True)
+    open(os.path.join(day_dir, "_SUCCESS"), "w").close()
+    return len(rows)
+
+
+def _prune_day(session: Session, day: date) -> int:
+    """Delete an archived day from price_logs, keeping rows other tables still point at."""
+    start = datetime.combine(day, time.min)
+    result = session.execute(
+        delete(PriceLog)
+        .where(
+            PriceLog.scraped_at >= start,
+            PriceLog.scraped_at < start + timedelta(days=1),
+            PriceLog.id.not_in(select(LatestPrice.price_log_id)),
+            PriceLog.id.not_in(select(NotificationLog.price_log_id).where(NotificationLog.price_log_id.isnot(None))),
+        )
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount
+
+
+def compact_price_logs(session: Session, archive_dir: str = ARCHIVE_DIR, today: Optional[date] = None,
+                       prune: bool = ARCHIVE_PRUNE) -> dict:
+    """
+    Archive every closed day that is not archived yet. Returns counts per stage.
+
+    `today` defaults to the current UTC date; only days before it are touched.
+    """
+    _require_pyarrow()
+    today = today or datetime.now(timezone.utc).date()
+    done = set(archived_days(archive_dir))
+    stats = {"days": 0, "rows": 0, "pruned": 0}
+
+    for day in _closed_days(session, today):
+        if day not in done:
+            stats["rows"] += _write_day(session, archive_dir, day)
+            stats["days"] += 1
+            logger.info(f"[ARCHIVE] Wrote {day.isoformat()}")
+        if prune:
+            stats["pruned"] += _prune_day(session, day)
+            session.commit()
+
+    logger.info(f"[ARCHIVE] Complete. Days: {stats['days']} | Rows: {stats['rows']} | Pruned: {stats['pruned']}")
+    return stats
+
+
+def read_price_history(archive_dir: str = ARCHIVE_DIR, product_id=None, competitor_product_id=None,
+                       competitor_id=None, start: Optional[datetime] = None, end: Optional[datetime] = None,
+                       columns: Optional[Iterable[str]] = None, as_pandas: bool = False):
+    """
+    Read archived price logs as columns.
+
+    Filters are optional and combined with AND; `end` is exclusive and
+    `competitor_product_id` may be a list of ids. Returns
+    {column: numpy array} (or a pandas DataFrame with as_pandas=True), sorted
+    by scraped_at. The date/competitor partitions outside the filter are not read.
+    """
+    _require_pyarrow()
+    columns = list(columns or COLUMNS)
+    if not os.path.isdir(archive_dir):
+        types = {field.name: field.type for field in list(_schema()) + list(_partitioning().schema)}
+        empty = pa.table({name: pa.array([], type=types[name]) for name in columns})
+        return empty.to_pandas() if as_pandas else {name: empty[name].to_numpy() for name in columns}
+
+    dataset = ds.dataset(archive_dir, format="parquet", partitioning=_partitioning(),
+                         exclude_invalid_files=True, ignore_prefixes=["_", "."])
+    expr = None
+
+    def both(a, b):
+        return b if a is None else a & b
+
+    if start is not None:
+        expr = both(expr, ds.field("scraped_date") >= start.date().isoformat())
+        expr = both(expr, ds.field("scraped_at") >= pa.scalar(start.replace(tzinfo=None), pa.timestamp("us")))
+    if end is not None:
+        expr = both(expr, ds.field("scraped_date") <= end.date().isoformat())
+        expr = both(expr, ds.field("scraped_at") < pa.scalar(end.replace(tzinfo=None), pa.timestamp("us")))
+    if competitor_id is not None:
+        expr = both(expr, ds.field("competitor_id") == int(competitor_id))
+    if isinstance(competitor_product_id, (list, tuple, set)):
+        expr = both(expr, ds.field("competitor_product_id").isin([int(i) for i in competitor_product_id]))
+    elif competitor_product_id is not None:
+        expr = both(expr, ds.field("competitor_product_id") == int(competitor_product_id))
+    if product_id is not None:
+        expr = both(expr, ds.field("product_id") == str(product_id))
+
+    table = dataset.to_table(columns=sorted(set(columns) | {"scraped_at"}), filter=expr)
+    table = table.sort_by("scraped_at").select(columns)
+    if as_pandas:
+        return table.to_pandas()
+    return {name: table[name].to_numpy(zero_copy_only=False) for name in columns}
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s | %(levelname)-8s | %(name)s | %(message)s'
+    )
+
+    engine = create_engine(DATABASE_URL)
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+
+    compact_price_logs(session)
+    session.close()
@@ -0,0 +1,207 @@
+"""
+Price History - Per-product price series with server-side downsampling.
+
+A product is priced by several competitor listings, each scraped ~4x/day.
+Charts do not need every raw row, so the series are reduced before they are
+serialized:
+
+  - daily: one bucket per calendar day with min / max / last price.
+  - lttb:  Largest-Triangle-Three-Buckets down to a requested point count;
+           keeps the visual shape (peaks, drops) of the raw series.
+  - raw:   every log, unchanged.
+
+With INGEST_MODE=cdc a listing is only logged when its price or stock
+changes, so price_logs holds change points, not samples. change_points()
+turns a listing's logs into a series that covers the requested window: the
+last log before `since` is carried to the window start, the last price is
+carried to latest_prices.last_seen_at, and daily buckets are forward-filled
+over days without a log.
+
+Series are columnar ({"t": [...], "price": [...]}) so a few hundred points
+stay a few KB of JSON.
+"""
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence
+
+import numpy as np
+
+HISTORY_MODES = ("daily", "lttb", "raw")
+DEFAULT_POINTS = 500
+MAX_POINTS = 5000
+
+
+def lttb_indices(x: Sequence[float], y: Sequence[float], threshold: int) -> np.ndarray:
+    """
+    Indices of the points kept by Largest-Triangle-Three-Buckets.
+
+    The first and last points are always kept; every bucket in between keeps
+    the point forming the largest triangle with the previously kept point and
+    the average of the next bucket.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    every = (n - 2) / (threshold - 2)
+    kept = np.empty(threshold, dtype=np.int64)
+    kept[0], kept[-1] = 0, n - 1
+    a = 0
+
+    for i in range(threshold - 2):
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, n)
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(area.argmax())
+        kept[i + 1] = a
+    return kept
+
+
+def bucket_daily(times: List[datetime], prices: List[float]) -> dict:
+    """
+    Collapse a time-ordered series into one min/max/last bucket per day.
+    Days without a point between two buckets hold the previous day's last price.
+    """
+    buckets: "OrderedDict[str, list]" = OrderedDict()
+    previous = None
+    for t, price in zip(times, prices):
+        day = t.date()
+        if previous is not None:
+            for gap in range(1, (day - previous).days):
+                carried = buckets[previous.isoformat()][2]
+                buckets[(previous + timedelta(days=gap)).isoformat()] = [carried, carried, carried]
+        previous = day
+        bucket = buckets.get(day.isoformat())
+        if bucket is None:
+            buckets[day.isoformat()] = [price, price, price]
+        else:
+            bucket[0] = min(bucket[0], price)
+            bucket[1] = max(bucket[1], price)
+            bucket[2] = price
+    return {
+        "t": list(buckets),
+        "min": [b[0] for b in buckets.values()],
+        "max": [b[1] for b in buckets.values()],
+        "last": [b[2] for b in buckets.values()],
+    }
+
+
+def downsample(times: List[datetime], prices: List[float], in_stock: List[bool], mode: str,
+               points: int = DEFAULT_POINTS) -> dict:
+    """Reduce one time-ordered series according to `mode`."""
+    if mode == "daily":
+        return bucket_daily(times, prices)
+
+    if mode == "lttb" and len(times) > points:
+        x = [t.timestamp() for t in times]
+        keep = lttb_indices(x, prices, points)
+        times = [times[i] for i in keep]
+        prices = [prices[i] for i in keep]
+        in_stock = [in_stock[i] for i in keep]
+    return {"t": [t.isoformat() for t in times], "price": prices, "in_stock": in_stock}
+
+
+class HistoryPoint(NamedTuple):
+    competitor_id: int
+    competitor: str
+    price: float
+    is_in_stock: bool
+    scraped_at: datetime
+
+
+def _as_datetime(value) -> Optional[datetime]:
+    # SQLite hands back DATETIME columns of text() queries as strings
+    return datetime.fromisoformat(value) if isinstance(value, str) else value
+
+
+def change_points(rows: Iterable, since: Optional[datetime] = None, until: Optional[datetime] = None,
+                  last_seen: Optional[Dict[int, datetime]] = None) -> List[HistoryPoint]:
+    """
+    Expand change-point logs into series covering [since, until), ordered by
+    (competitor_id, scraped_at) for build_series.
+
+    Rows need competitor_product_id, competitor_id, competitor, price,
+    is_in_stock and scraped_at, and may include logs from before `since`:
+    per listing the newest of those is kept and moved to `since`. `last_seen`
+    maps a listing to its latest_prices.last_seen_at; a listing still seen
+    after its last log gets a closing point with that price at last_seen_at
+    (capped at the end of the window).
+    """
+    listings: Dict[int, list] = {}
+    for row in rows:
+        listings.setdefault(row.competitor_product_id, []).append(row)
+
+    points = []
+    for listing_id, logs in listings.items():
+        logs.sort(key=lambda r: _as_datetime(r.scraped_at))
+        series = []
+        for row in logs:
+            scraped_at = _as_datetime(row.scraped_at)
+            if until is not None and scraped_at >= until:
+                continue
+            point = HistoryPoint(row.competitor_id, row.competitor, float(row.price), bool(row.is_in_stock), scraped_at)
+            if since is not None and scraped_at < since:
+                series = [point._replace(scraped_at=since)]  # Seed: the price in force at the window start
+            elif series and series[-1].scraped_at == scraped_at:
+                series[-1] = point
+            else:
+                series.append(point)
+        if not series:
+            continue
+        seen_at = _as_datetime((last_seen or {}).get(listing_id))
+        if seen_at is not None and since is not None and seen_at < since:
+            continue  # Delisted before the window: nothing was in force
+        if seen_at is not None and until is not None and seen_at >= until:
+            seen_at = until - timedelta(microseconds=1)
+        if seen_at is not None and seen_at > series[-1].scraped_at:
+            series.append(series[-1]._replace(scraped_at=seen_at))
+        points.extend(series)
+
+    points.sort(key=lambda p: (p.competitor_id, p.scraped_at))
+    return points
+
+
+def build_series(rows, mode: str, points: int = DEFAULT_POINTS) -> List[Dict]:
+    """
+    Group rows ordered by (competitor_id, scraped_at) into one downsampled
+    series per competitor. Rows need competitor_id, competitor, price,
+    is_in_stock and scraped_at.
+    """
+    grouped: "OrderedDict[int, dict]" = OrderedDict()
+    for row in rows:
+        scraped_at = _as_datetime(row.scraped_at)
+        series = grouped.setdefault(row.competitor_id, {
+            "competitor": row.competitor, "t": [], "price": [], "in_stock": [],
+        })
+        series["t"].append(scraped_at)
+        series["price"].append(float(row.price))
+        series["in_stock"].append(bool(row.is_in_stock))
+
+    return [
+        {
+            "competitor_id": competitor_id,
+            "competitor": series["competitor"],
+            "raw_points": len(series["t"]),
+            **downsample(series["t"], series["price"], series["in_stock"], mode, points),
+        }
+        for competitor_id, series in grouped.items()
+    ]
+
+
+def parse_points(value: Optional[str]) -> int:
+    """Validated ?points= for LTTB. Raises ValueError."""
+    if value is None or value == "":
+        return DEFAULT_POINTS
+    try:
+        points = int(value)
+    except ValueError:
+        raise ValueError("points must be an integer")
+    if not 3 <= points <= MAX_POINTS:
+        raise ValueError(f"points must be between 3 and {MAX_POINTS}")
+    return points
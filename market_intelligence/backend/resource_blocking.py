@@ -0,0 +1,122 @@
+"""
+Resource Blocking - Request interception for scraping browser contexts.
+
+The scrapers only read product cards out of the DOM, so images, media,
+fonts, analytics and chat/marketing widgets are pure overhead: bandwidth,
+renderer memory and slower loads. RequestBlocker routes every request of a
+context and aborts:
+
+  - resource types in SCRAPE_BLOCK_TYPES (default image, media, font)
+  - requests to known third-party trackers/widgets, plus per-site hosts
+
+The top-level document is never blocked. Requests it lets through fall
+back to the context's other routes (e.g. the asset cache). Each blocker
+counts what it let through and what it stopped; aborted requests have no
+size, so bytes saved is an estimate from typical sizes per resource type.
+"""
+import os
+from collections import Counter
+from typing import Dict, Iterable, Optional
+from urllib.parse import urlparse
+
+from asset_cache import CACHE_HEADER
+
+SCRAPE_BLOCKING = os.environ.get("SCRAPE_BLOCKING", "true").lower() == "true"
+SCRAPE_BLOCK_TYPES = frozenset(
+    t.strip() for t in os.environ.get("SCRAPE_BLOCK_TYPES", "image,media,font").split(",") if t.strip()
+)
+
+# Analytics, ads, tag managers, chat and marketing widgets (matched as host suffixes)
+TRACKER_HOSTS = (
+    "google-analytics.com", "googletagmanager.com", "googleadservices.com", "doubleclick.net",
+    "googlesyndication.com", "facebook.net", "facebook.com", "connect.facebook.net", "hotjar.com",
+    "clarity.ms", "tiktok.com", "analytics.tiktok.com", "bing.com", "criteo.com", "criteo.net",
+    "tawk.to", "zopim.com", "zendesk.com", "jivosite.com", "onesignal.com", "pushcrew.com",
+    "useinsider.com", "api.useinsider.com", "mercadopago.com", "youtube.com", "ytimg.com",
+)
+
+# Per competitor: extra hosts to block and resource types that must load anyway
+SITE_PROFILES: Dict[str, dict] = {
+    "Visuar": {"block_hosts": (), "allow_types": ()},
+    # Insider drives the GG promo popups the scraper otherwise has to dismiss
+    "Gonzalez Gimenez": {"block_hosts": ("insider.com.tr",), "allow_types": ()},
+}
+
+# Typical transfer size (bytes) per resource type, for the bytes-saved estimate
+TYPICAL_BYTES = {
+    "image": 40_000, "media": 400_000, "font": 35_000, "script": 50_000,
+    "stylesheet": 20_000, "xhr": 5_000, "fetch": 5_000, "other": 5_000,
+}
+
+
+def _host_matches(host: str, suffixes: Iterable[str]) -> bool:
+    return any(host == suffix or host.endswith("." + suffix) for suffix in suffixes)
+
+
+class RequestBlocker:
+    """Per-context request filter with transfer/blocking counters."""
+
+    def __init__(self, site: Optional[str] = None, block_types: Optional[Iterable[str]] = None,
+                 block_hosts: Optional[Iterable[str]] = None):
+        profile = SITE_PROFILES.get(site, {})
+        types = set(SCRAPE_BLOCK_TYPES if block_types is None else block_types)
+        self.site = site
+        self.block_types = frozenset(types - set(profile.get("allow_types", ())))
+        self.block_hosts = tuple(TRACKER_HOSTS if block_hosts is None else block_hosts) + tuple(
+            profile.get("block_hosts", ())
+        )
+        self.requests = 0
+        self.blocked = Counter()
+        self.blocked_hosts = Counter()
+        self.bytes_transferred = 0
+
+    def should_block(self, resource_type: str, url: str) -> bool:
+        if resource_type == "document":
+            return False
+        if resource_type in self.block_types:
+            return True
+        return _host_matches(urlparse(url).hostname or "", self.block_hosts)
+
+    async def attach(self, context):
+        """Route every request of `context` through the blocker."""
+        await context.route("**/*", self._handle)
+        context.on("response", self._on_response)
+        return self
+
+    async def _handle(self, route):
+        request = route.request
+        self.requests += 1
+        if self.should_block(request.resource_type, request.url):
+            self.blocked[request.resource_type] += 1
+            self.blocked_hosts[urlparse(request.url).hostname or ""] += 1
+            await route.abort("blockedbyclient")
+        else:
+            await route.fallback()
+
+    def _on_response(self, response):
+        if response.headers.get(CACHE_HEADER):
+            return  # Served from the asset cache, nothing transferred
+        try:
+            self.bytes_transferred += int(response.headers.get("content-length") or 0)
+        except ValueError:
+            pass
+
+    def metrics(self) -> dict:
+        blocked = sum(self.blocked.values())
+        return {
+            "requests": self.requests,
+            "blocked": blocked,
+            "blocked_by_type": dict(self.blocked),
+            "top_blocked_hosts": dict(self.blocked_hosts.most_common(5)),
+            "bytes_transferred": self.bytes_transferred,
+            "bytes_saved_estimate": sum(
+                TYPICAL_BYTES.get(resource_type, TYPICAL_BYTES["other"]) * count
+                for resource_type, count in self.blocked.items()
+            ),
+        }
+
+    def summary(self) -> str:
+        m = self.metrics()
+        return (f"{m['blocked']}/{m['requests']} requests blocked, "
+                f"~{m['bytes_saved_estimate'] // 1024} KB saved, {m['bytes_transferred'] // 1024} KB transferred")
+
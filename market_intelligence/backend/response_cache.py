@@ -0,0 +1,145 @@
+"""
+Response Cache - Caches API responses between scrape cycles.
+
+The dashboard data only changes when a pipeline run writes new prices, so
+responses are cached under a *generation* and a finished pipeline bumps the
+generation instead of waiting for a TTL to expire:
+
+  - memory (default): in-process LRU. The generation is a local counter plus
+    the mtime of scrape_metadata.json, which every pipeline run rewrites, so
+    runs started by cron in another process invalidate it too.
+  - redis (REDIS_URL set, or RESPONSE_CACHE_BACKEND=redis): shared across API
+    workers. The generation is a Redis counter bumped with INCR.
+
+RESPONSE_CACHE_TTL is only a safety net; invalidation is event driven.
+"""
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Optional
+
+logger = logging.getLogger("response_cache")
+
+JSON_OUTPUT_DIR = os.environ.get("JSON_OUTPUT_DIR", "/app/output")
+REDIS_URL = os.environ.get("REDIS_URL")
+RESPONSE_CACHE_BACKEND = os.environ.get("RESPONSE_CACHE_BACKEND", "redis" if REDIS_URL else "memory")
+RESPONSE_CACHE_MAX_ENTRIES = int(os.environ.get("RESPONSE_CACHE_MAX_ENTRIES", "256"))
+RESPONSE_CACHE_TTL = int(os.environ.get("RESPONSE_CACHE_TTL", "86400"))
+
+GENERATION_FILE = os.path.join(JSON_OUTPUT_DIR, "scrape_metadata.json")
+
+
+class MemoryBackend:
+    """Thread-safe in-process LRU."""
+
+    def __init__(self, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES, generation_file: Optional[str] = GENERATION_FILE):
+        self.max_entries = max_entries
+        self.generation_file = generation_file
+        self._entries = OrderedDict()
+        self._counter = 0
+        self._lock = threading.Lock()
+
+    def generation(self, namespace: str) -> str:
+        try:
+            mtime = os.stat(self.generation_file).st_mtime_ns if self.generation_file else 0
+        except OSError:
+            mtime = 0
+        return f"{self._counter}.{mtime}"
+
+    def bump(self, namespace: str):
+        with self._lock:
+            self._counter += 1
+            self._entries.clear()
+
+    def get(self, key: str):
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def set(self, key: str, value: Any):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class RedisBackend:
+    """Shared cache in Redis; values are stored as JSON."""
+
+    def __init__(self, url: str = REDIS_URL, ttl: int = RESPONSE_CACHE_TTL):
+        import redis
+        self.client = redis.from_url(url)
+        self.ttl = ttl
+
+    def generation(self, namespace: str) -> str:
+        return (self.client.get(f"{namespace}:generation") or b"0").decode()
+
+    def bump(self, namespace: str):
+        self.client.incr(f"{namespace}:generation")
+
+    def get(self, key: str):
+        raw = self.client.get(key)
+        return json.loads(raw) if raw is not None else None
+
+    def set(self, key: str, value: Any):
+        self.client.set(key, json.dumps(value), ex=self.ttl or None)
+
+
+def _make_backend():
+    if RESPONSE_CACHE_BACKEND == "redis" and REDIS_URL:
+        try:
+            return RedisBackend()
+        except Exception as e:
+            logger.warning(f"[RESPONSE_CACHE] Redis unavailable ({e}), falling back to in-process LRU")
+    return MemoryBackend()
+
+
+class ResponseCache:
+    """Generation-keyed cache for one family of responses (e.g. 'live_data')."""
+
+    def __init__(self, namespace: str, backend=None):
+        self.namespace = namespace
+        self.backend = backend if backend is not None else _make_backend()
+        self.stats = {"hits": 0, "misses": 0, "errors": 0}
+
+    def _key(self, generation: str, key: tuple) -> str:
+        return f"{self.namespace}:{generation}:" + ":".join(str(part) for part in key)
+
+    def get_or_compute(self, key: tuple, compute: Callable[[], Any]):
+        """Return (value, hit). A backend failure degrades to computing the value."""
+        try:
+            full_key = self._key(self.backend.generation(self.namespace), key)
+            value = self.backend.get(full_key)
+        except Exception as e:
+            self.stats["errors"] += 1
+            logger.warning(f"[RESPONSE_CACHE] {self.namespace} lookup failed: {e}")
+            return compute(), False
+
+        if value is not None:
+            self.stats["hits"] += 1
+            return value, True
+
+        self.stats["misses"] += 1
+        value = compute()
+        try:
+            self.backend.set(full_key, value)
+        except Exception as e:
+            self.stats["errors"] += 1
+            logger.warning(f"[RESPONSE_CACHE] {self.namespace} store failed: {e}")
+        return value, False
+
+    def invalidate(self):
+        try:
+            self.backend.bump(self.namespace)
+            logger.info(f"[RESPONSE_CACHE] Invalidated '{self.namespace}'")
+        except Exception as e:
+            self.stats["errors"] += 1
+            logger.warning(f"[RESPONSE_CACHE] {self.namespace} invalidation failed: {e}")
+
+
+live_data_cache = ResponseCache("live_data")
@@ -1,25 +1,75 @@
 import asyncio
+import hashlib
 import json
 import logging
 import re
 import time
+import uuid
+from contextlib import asynccontextmanager
 from datetime import datetime, timezone
 from typing import Optional, List, Dict
+from urllib.parse import urlparse
 
 from ai_matcher import run_ai_matching
 
-from sqlalchemy import create_engine, text
+from sqlalchemy import create_engine, text, insert, select, update
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.orm import sessionmaker
 
-from playwright.async_api import async_playwright
-
-from models import Base, Product, Competitor, PriceLog, CompetitorProduct, PendingMapping, ScrapeLog
+from models import Base, Product, Competitor, PriceLog, CompetitorProduct, PendingMapping, ScrapeLog, upgrade_sqlite_schema
 from alert_engine import evaluate_alerts
+from asset_cache import ASSET_CACHE, AssetCache
+from browser_pool import BrowserPool, borrow_pool
+from browser_state import BROWSER_STATE, StateStore
+from extraction import (
+    BRISTOL_LISTING, DETAIL_PAGE, GG_LISTING, VISUAR_LISTING, absolute_url, clean_text, extract, extract_html,
+    parse_number, parse_price,
+)
+from http_listing import (
+    HTTP_LISTING_FETCH, VISUAR_BASE_URL, VISUAR_LISTING_URL, ListingFetchError, fetch_prestashop_listing, http_client,
+)
+from infinite_scroll import INFINITE_SCROLL_MAX_PAGES, ListingResponses, following_pages, page_param
+from latest_prices import (
+    is_price_change, last_known_prices, refresh_latest_prices, touch_competitor_listings, touch_latest_prices,
+)
+from response_cache import live_data_cache
+from waits import PageWaits
 
 import os
 DATABASE_URL = os.environ.get("DATABASE_URL", "sqlite:///data/market_intel.db")
 JSON_OUTPUT_DIR = os.environ.get("JSON_OUTPUT_DIR", "/app/output")
 
+# Listing scrape scheduling: how many competitors run at once, and the hard
+# ceiling (seconds, retries included) for any single competitor.
+SCRAPE_MAX_CONCURRENCY = int(os.environ.get("SCRAPE_MAX_CONCURRENCY", "3"))
+SCRAPE_SOURCE_TIMEOUT = int(os.environ.get("SCRAPE_SOURCE_TIMEOUT", "600"))
+# Database sync: 'bulk' loads existing keys once and writes in batches,
+# 'row' keeps the original per-item query + flush path.
+SYNC_MODE = os.environ.get("SYNC_MODE", "bulk")
+# Price log ingest: 'cdc' writes a PriceLog only when a listing's price/stock
+# differs from its latest_prices row (the rest just get last_seen_at bumped),
+# 'append' logs every scraped item on every run.
+INGEST_MODE = os.environ.get("INGEST_MODE", "cdc")
+# "incremental": alerts only for listings logged in this run, on transitions; "full": every rule, current state
+ALERT_EVAL_MODE = os.environ.get("ALERT_EVAL_MODE", "incremental")
+SYNC_BATCH_SIZE = int(os.environ.get("SYNC_BATCH_SIZE", "500"))
+# Listing fingerprints: when a source's listing page hashes the same as its
+# last successful run, extraction, DB sync, AI matching and alerts are skipped
+# for it and the ScrapeLog is recorded as 'unchanged'.
+SKIP_UNCHANGED_LISTINGS = os.environ.get("SKIP_UNCHANGED_LISTINGS", "true").lower() == "true"
+# Deep scrape worker pool: pages pulling from one queue, per-domain
+# in-flight cap, minimum spacing (seconds) between hits on a domain, and
+# how many results are written back per commit.
+DEEP_SCRAPE_WORKERS = int(os.environ.get("DEEP_SCRAPE_WORKERS", "4"))
+DEEP_SCRAPE_PER_DOMAIN = int(os.environ.get("DEEP_SCRAPE_PER_DOMAIN", "2"))
+DEEP_SCRAPE_DELAY = float(os.environ.get("DEEP_SCRAPE_DELAY", "1.0"))
+DEEP_SCRAPE_COMMIT_BATCH = int(os.environ.get("DEEP_SCRAPE_COMMIT_BATCH", "20"))
+# Any of the detail page description blocks being in the DOM means it is ready to read
+DETAIL_READY_SELECTOR = ", ".join(DETAIL_PAGE["fields"]["description"]["selectors"])
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36"
+
 # SOC Enterprise Logging format
 logging.basicConfig(
     level=logging.INFO,
@@ -56,11 +106,77 @@ async def retry_with_backoff(func, max_retries=3, base_delay=2):
         raise last_exception
     raise Exception("Function failed without exceptions")
 
+
+class DomainThrottle:
+    """
+    Politeness limiter shared by concurrent workers.
+
+    Caps in-flight requests per domain and spaces request starts to the same
+    domain at least `delay` seconds apart. Different domains never block
+    each other.
+    """
+
+    def __init__(self, max_per_domain: int = 2, delay: float = 1.0):
+        self.max_per_domain = max_per_domain
+        self.delay = delay
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._last_start: Dict[str, float] = {}
+
+    @asynccontextmanager
+    async def slot(self, url: str):
+        domain = urlparse(url).netloc
+        semaphore = self._semaphores.setdefault(domain, asyncio.Semaphore(self.max_per_domain))
+        async with semaphore:
+            async with self._locks.setdefault(domain, asyncio.Lock()):
+                wait = self._last_start.get(domain, 0.0) + self.delay - time.monotonic()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                self._last_start[domain] = time.monotonic()
+            yield
+
+
+# GG infinite scroll: class present in every product card of its XHR answers, and the end-of-list text
+GG_CARD_MARKER = "item-catalogo"
+GG_END_OF_LIST = "- Se llegó al final de la lista -"
+GG_POPUP_SELECTORS = [".ins-close-button", ".close-modal", ".modal-close", ".btn-close", ".pop-close"]
+# How long to wait for a (further) GG popup before carrying on, and for the
+# quick check done when the saved browser state has kept popups away
+GG_POPUP_TIMEOUT_MS = 2000
+GG_POPUP_CHECK_MS = 250
+
+# Returned by a visit function instead of items when the listing is unchanged
+LISTING_UNCHANGED = object()
+
+# One round trip: text, links and `content` attributes (prices) of every product card
+_FINGERPRINT_JS = """els => els.map(el => [
+    el.innerText,
+    ...Array.from(el.querySelectorAll('a[href]'), a => a.getAttribute('href')),
+    ...Array.from(el.querySelectorAll('[content]'), c => c.getAttribute('content')),
+].join('\\u001f'))"""
+
+
+def _chunks(rows: list, size: int):
+    """Yield successive slices of at most `size` rows."""
+    for i in range(0, len(rows), size):
+        yield rows[i:i + size]
+
 class MarketIntelligenceEngine:
     def __init__(self):
         self.engine = create_engine(DATABASE_URL)
         Base.metadata.create_all(self.engine)
+        for change in upgrade_sqlite_schema(self.engine):
+            logger.info(f"[DB] SQLite upgrade: {change}")
         self.Session = sessionmaker(bind=self.engine)
+        # Listing fingerprints of this run and of the last successful run, per source name
+        self.fingerprints: Dict[str, str] = {}
+        self.last_fingerprints: Dict[str, tuple] = {}
+        self.scrape_logs: Dict[str, ScrapeLog] = {}
+        # How each source's listing was fetched this run, and its page waits (ScrapeLog.metrics)
+        self.fetch_metrics: Dict[str, dict] = {}
+        self.page_waits: Dict[str, PageWaits] = {}
+        # Cookies/localStorage and popup history per competitor, kept between runs
+        self.state_store = StateStore() if BROWSER_STATE else None
         self.progress = {
             "current_source": "Idle",
             "current_item": 0,
@@ -98,160 +214,143 @@ class MarketIntelligenceEngine:
         return 'inverter' in title.lower()
 
     async def _scraped_results_visuar(self, page) -> list:
-        # Visuar uses .js-product-miniature for products
-        items = await page.query_selector_all('.js-product-miniature')
+        # Visuar uses .js-product-miniature for products; one evaluate for the whole listing
         results = []
-        for item in items:
-            # Try multiple link selectors for Visuar
-            t_el = await item.query_selector('.product-title a') or await item.query_selector('a.product-thumbnail')
-            p_el = await item.query_selector('.product-price')
-            
-            if not t_el: continue
-            
-            # Extract title properly
-            title_el = await item.query_selector('.product-title')
-            title = (await title_el.inner_text()).strip() if title_el else ""
-            url = await t_el.get_attribute('href')
-            
-            # If relative URL, prepend domain
-            if url and url.startswith('/'):
-                url = "https://www.visuar.com.py" + url
-            
-            price = 0.0
-            
-            if p_el:
-                content = await p_el.get_attribute('content')
-                if content:
-                    try: price = float(content)
-                    except ValueError: pass
-                else:
-                    text = await p_el.inner_text()
-                    clean = "".join(filter(str.isdigit, text))
-                    try: price = float(clean)
-                    except ValueError: pass
-            
-            # Basic brand/ref from listing if possible
-            ref_el = await item.query_selector('.product-reference')
-            brand_el = await item.query_selector('.product-brand')
-            
-            sku = await ref_el.inner_text() if ref_el else None
-            brand = await brand_el.inner_text() if brand_el else None
-            
+        for raw in await extract(page, VISUAR_LISTING):
+            # Cards without a title/thumbnail link are placeholders
+            if not raw["link"]:
+                continue
+            title = clean_text(raw["title"]) or ""
+            url = absolute_url(raw["link"], "https://www.visuar.com.py")
+            # Machine-readable `content` attribute first, display text as fallback
+            if raw["price_content"]:
+                price = parse_number(raw["price_content"])
+            else:
+                price = parse_price(raw["price_text"])
+
             if title and price > 0:
                 results.append({
-                    "name": title.strip(), 
+                    "name": title,
                     "price": price,
                     "url": url,
-                    "sku": sku.strip() if sku else None,
-                    "brand": brand.strip() if brand else None
+                    "sku": clean_text(raw["sku"]),
+                    "brand": clean_text(raw["brand"])
                 })
         return results
 
     async def _scraped_results_bristol(self, page) -> list:
-        items = await page.query_selector_all('#catalogoProductos .it')
         results = []
-        for item in items:
-            t_el = await item.query_selector('.info .tit h2')
-            p_el = await item.query_selector('.precios .venta .monto')
-            
-            title = await t_el.inner_text() if t_el else ""
-            url = await t_el.get_attribute('href') if t_el else None
-            price = 0.0
-            if p_el:
-                text = await p_el.inner_text()
-                clean = text.upper().replace('GS', '').replace('.', '').replace(',', '').strip()
-                try: price = float(clean)
-                except ValueError: pass
+        for raw in await extract(page, BRISTOL_LISTING):
+            title = clean_text(raw["title"])
+            price = parse_price(raw["price_text"])
             if title and price > 0:
-                results.append({"name": title.strip(), "price": price, "url": url})
+                results.append({"name": title, "price": price, "url": raw["url"]})
         return results
 
     async def _scraped_results_gg(self, page) -> list:
         # Gonzalez Gimenez uses .product or .item-catalogo
-        items = await page.query_selector_all('.product.item-catalogo')
-        if not items:
-            items = await page.query_selector_all('.product')
-            
+        return self._gg_items(await extract(page, GG_LISTING))
+
+    def _gg_items(self, raws: List[dict]) -> list:
         results = []
-        for item in items:
-            # Title is inside .product-title
-            title_el = await item.query_selector('.product-title a')
-            if not title_el:
-                title_el = await item.query_selector('h3 a')
-            
-            title = await title_el.inner_text() if title_el else None
-            url = await title_el.get_attribute('href') if title_el else None
-            
-            # Price extraction (Contado is the cash price we want)
-            # It usually looks like "Gs. 5.989.000" inside the .btn-cart-contado section
-            p_el = await item.query_selector('.btn-cart-contado span')
-            if not p_el:
-                p_el = await item.query_selector('.product-price span')
-            
-            price = 0.0
-            if p_el:
-                text = await p_el.inner_text()
-                # If text is "18 x Gs. 615.000", we want the part after Gs.
-                if "Gs." in text:
-                    text = text.split("Gs.")[-1]
-                clean = "".join(filter(str.isdigit, text))
-                try: price = float(clean)
-                except ValueError: pass
-            
+        for raw in raws:
+            title = clean_text(raw["title"])
+            # Price is the Contado (cash) one; "18 x Gs. 615.000" keeps the part after Gs.
+            price = parse_price(raw["price_text"], after="Gs.")
             if title and price > 0:
-                # Optimized Brand Extraction for GG
-                # Example: "Acondicionador de Aire TOKYO ..." -> "TOKYO"
-                parts = title.upper().split()
-                brand = "UNKNOWN"
-                
-                # Brands observed: Altech, Goodweather, HITACHI, Mabe, Midas, Samsung, TCL, Tokyo, VCP, etc.
-                known_brands = ["ALTECH", "GOODWEATHER", "HITACHI", "MABE", "MIDAS", "SAMSUNG", "TCL", "TOKYO", "VCP", "CARRIER", "LG", "MIDEA", "OSTER", "FAMA", "HAUSTEC", "WHIRLPOOL", "MITSUBISHI"]
-                
-                # Check for known brands anywhere in the title (case heavy)
-                found_brand = False
-                for b in known_brands:
-                    if b in parts:
-                        brand = b
-                        found_brand = True
-                        break
-                
-                if not found_brand and len(parts) > 0:
-                    # Specific pattern for GG: "Acondicionador de Aire [BRAND] ..."
-                    try:
-                        if "AIRE" in parts:
-                            idx = parts.index("AIRE")
-                            if len(parts) > idx + 1:
-                                potential = parts[idx + 1]
-                                if potential not in ["SPLIT", "INVERTER", "PORTATIL", "PARED", "PISO", "VENTANA", "DE", "CON"]:
-                                    brand = potential
-                                    found_brand = True
-                        
-                        if not found_brand and "ACONDICIONADOR" in parts:
-                            idx = parts.index("ACONDICIONADOR")
-                            if len(parts) > idx + 1:
-                                potential = parts[idx + 1]
-                                if potential not in ["DE", "SPLIT", "AIRE"]:
-                                    brand = potential
-                                    found_brand = True
-                    except: pass
-                    
-                    if not found_brand:
-                        # Fallback to first non-generic word
-                        generic_words = ["ACONDICIONADOR", "AIRE", "SPLIT", "INVERTER", "DE", "CON", "FRÍO", "CALOR"]
-                        for word in parts:
-                            if word not in generic_words and len(word) > 2:
-                                brand = word
-                                break
-
                 results.append({
-                    "name": title.strip(), 
+                    "name": title,
                     "price": price,
-                    "url": url,
+                    "url": raw["url"],
                     "sku": None,
-                    "brand": brand
+                    "brand": self._gg_brand(title)
                 })
         return results
 
+    def _gg_brand(self, title: str) -> str:
+        # Optimized Brand Extraction for GG
+        # Example: "Acondicionador de Aire TOKYO ..." -> "TOKYO"
+        parts = title.upper().split()
+        brand = "UNKNOWN"
+        
+        # Brands observed: Altech, Goodweather, HITACHI, Mabe, Midas, Samsung, TCL, Tokyo, VCP, etc.
+        known_brands = ["ALTECH", "GOODWEATHER", "HITACHI", "MABE", "MIDAS", "SAMSUNG", "TCL", "TOKYO", "VCP", "CARRIER", "LG", "MIDEA", "OSTER", "FAMA", "HAUSTEC", "WHIRLPOOL", "MITSUBISHI"]
+        
+        # Check for known brands anywhere in the title (case heavy)
+        found_brand = False
+        for b in known_brands:
+            if b in parts:
+                brand = b
+                found_brand = True
+                break
+        
+        if not found_brand and len(parts) > 0:
+            # Specific pattern for GG: "Acondicionador de Aire [BRAND] ..."
+            try:
+                if "AIRE" in parts:
+                    idx = parts.index("AIRE")
+                    if len(parts) > idx + 1:
+                        potential = parts[idx + 1]
+                        if potential not in ["SPLIT", "INVERTER", "PORTATIL", "PARED", "PISO", "VENTANA", "DE", "CON"]:
+                            brand = potential
+                            found_brand = True
+                
+                if not found_brand and "ACONDICIONADOR" in parts:
+                    idx = parts.index("ACONDICIONADOR")
+                    if len(parts) > idx + 1:
+                        potential = parts[idx + 1]
+                        if potential not in ["DE", "SPLIT", "AIRE"]:
+                            brand = potential
+                            found_brand = True
+            except: pass
+            
+            if not found_brand:
+                # Fallback to first non-generic word
+                generic_words = ["ACONDICIONADOR", "AIRE", "SPLIT", "INVERTER", "DE", "CON", "FRÍO", "CALOR"]
+                for word in parts:
+                    if word not in generic_words and len(word) > 2:
+                        brand = word
+                        break
+        return brand
+
+    async def _listing_unchanged(self, page, name: str, selector: str) -> bool:
+        """
+        Fingerprint the product cards matching `selector` and compare with the
+        last successful run of `name`. The fingerprint is kept for the ScrapeLog.
+        """
+        return self._cards_unchanged(name, await page.eval_on_selector_all(selector, _FINGERPRINT_JS))
+
+    def _cards_unchanged(self, name: str, cards: List[str]) -> bool:
+        """Fingerprint one string per product card and compare with `name`'s last successful run."""
+        if not cards:
+            return False
+        fingerprint = hashlib.sha256("\n".join(cards).encode("utf-8")).hexdigest()
+        self.fingerprints[name] = fingerprint
+        last = self.last_fingerprints.get(name)
+        return SKIP_UNCHANGED_LISTINGS and last is not None and last[0] == fingerprint
+
+    def _load_last_fingerprint(self, session, competitor_id: int):
+        """
+        (fingerprint, started_at) of the newest successful or unchanged run of a
+        competitor. Read inside a SAVEPOINT so a failure leaves the run's
+        transaction usable; None when there is no such run or it cannot be
+        read, and the listing is then simply fully processed.
+        """
+        try:
+            conn = session.connection()
+            with conn.begin_nested():
+                return conn.execute(
+                    select(ScrapeLog.fingerprint, ScrapeLog.started_at)
+                    .where(ScrapeLog.competitor_id == competitor_id,
+                           ScrapeLog.status.in_(('success', 'unchanged')),
+                           ScrapeLog.fingerprint.isnot(None))
+                    .order_by(ScrapeLog.started_at.desc())
+                    .limit(1)
+                ).first()
+        except SQLAlchemyError as e:
+            logger.warning(f"[FINGERPRINT] Could not load the last fingerprint of competitor {competitor_id}: {e}")
+            return None
+
     def _save_json(self, visuar_data, bristol_data, gg_data):
         """Phase 2: Save as categorized JSON for legacy frontend features."""
         os.makedirs(JSON_OUTPUT_DIR, exist_ok=True)
@@ -264,91 +363,344 @@ class MarketIntelligenceEngine:
                 cat[brand].append(p)
             return cat
 
+        # None = source unchanged since the last run: keep its previous file
         files = {
-            "visuar_ac_data.json": categorize(visuar_data),
-            "gg_ac_data.json": categorize(gg_data),
+            "visuar_ac_data.json": categorize(visuar_data) if visuar_data is not None else None,
+            "gg_ac_data.json": categorize(gg_data) if gg_data is not None else None,
             "bristol_ac_data.json": categorize(bristol_data)
         }
         
         for name, data in files.items():
+            if data is None:
+                continue
             path = os.path.join(JSON_OUTPUT_DIR, name)
             with open(path, 'w', encoding='utf-8') as f:
                 json.dump(data, f, ensure_ascii=False, indent=2)
             logger.info(f"[EXPORT] Saved {path}")
         
         # Update metadata for frontend timestamp
-        self._update_metadata(len(visuar_data), len(gg_data), list(categorize(visuar_data).keys()), list(categorize(gg_data).keys()))
+        self._update_metadata(
+            len(visuar_data) if visuar_data is not None else None,
+            len(gg_data) if gg_data is not None else None,
+            list(files["visuar_ac_data.json"]) if visuar_data is not None else None,
+            list(files["gg_ac_data.json"]) if gg_data is not None else None,
+        )
 
     def _update_metadata(self, visuar_count, gg_count, visuar_brands, gg_brands):
-        """Update scrape_metadata.json with the latest run info."""
+        """Update scrape_metadata.json with the latest run info (None keeps the previous value)."""
         metadata_path = os.path.join(JSON_OUTPUT_DIR, "scrape_metadata.json")
+        previous = {}
+        if os.path.exists(metadata_path):
+            try:
+                with open(metadata_path, encoding='utf-8') as f:
+                    previous = json.load(f)
+            except (OSError, ValueError):
+                previous = {}
         metadata = {
             "last_scrape": datetime.now(timezone.utc).isoformat(),
-            "visuar_count": visuar_count,
-            "gg_count": gg_count,
-            "visuar_brands": sorted(visuar_brands),
-            "gg_brands": sorted(gg_brands)
+            "visuar_count": visuar_count if visuar_count is not None else previous.get("visuar_count", 0),
+            "gg_count": gg_count if gg_count is not None else previous.get("gg_count", 0),
+            "visuar_brands": sorted(visuar_brands) if visuar_brands is not None else previous.get("visuar_brands", []),
+            "gg_brands": sorted(gg_brands) if gg_brands is not None else previous.get("gg_brands", [])
         }
         with open(metadata_path, 'w', encoding='utf-8') as f:
             json.dump(metadata, f, ensure_ascii=False, indent=2)
         logger.info(f"[EXPORT] Updated {metadata_path}")
 
-    async def run_pipeline(self):
-        logger.info("[PIPELINE_START] Commencing Market Intelligence Data Ingestion")
-        session = self.Session()
-        
-        async with async_playwright() as p:
-            browser = await p.chromium.launch(headless=True)
-            context = await browser.new_context(user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36")
-            page = await context.new_page()
-            
-            # ── Visuar ──
-            visuar_data = []
-            visuar_log = ScrapeLog(started_at=datetime.now(timezone.utc), status='failed')
+    async def _fetch_visuar(self, client) -> list:
+        """Fast path: Visuar's PrestaShop JSON listing over plain HTTP, no browser."""
+        items, metrics = await fetch_prestashop_listing(client, VISUAR_LISTING_URL, VISUAR_BASE_URL)
+        self.fetch_metrics["Visuar"] = metrics
+        logger.info(f"[SOURCE_A] Visuar listing fetched over HTTP: {len(items)} items in {metrics['elapsed_ms']} ms")
+        if self._cards_unchanged("Visuar", [f"{i['name']}\x1f{i['url']}\x1f{i['price']}" for i in items]):
+            logger.info("[SOURCE_A] Visuar listing unchanged since last run.")
+            return LISTING_UNCHANGED
+        # Same item shape as the browser path
+        return [{key: item[key] for key in ("name", "price", "url", "sku", "brand")} for item in items]
+
+    async def _visit_visuar(self, page) -> list:
+        # STABLE BASELINE: Use resultsPerPage=9999999 to load all 73 products at once
+        await page.goto("https://www.visuar.com.py/hogar/aires-acondicionados/?resultsPerPage=9999999", wait_until="domcontentloaded", timeout=60000)
+
+        # Auto-pagination: While we have everything, we still scroll for lazy triggers
+        seen_urls = set()
+        all_results = []
+        waits = self.page_waits["Visuar"] = PageWaits(page)
+
+        # Cards are server-rendered: ready as soon as the first one is in the DOM
+        await page.wait_for_selector('.product-miniature', timeout=20000)
+
+        # Scroll until the card count stops growing (the DOM goes quiet)
+        count = await page.locator('.js-product-miniature').count()
+        for _ in range(3):
+            await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
+            grown = await waits.count_growth('.js-product-miniature', count, quiet_ms=500, timeout_ms=5000)
+            if grown <= count:
+                break
+            count = grown
+
+        if await self._listing_unchanged(page, "Visuar", '.js-product-miniature'):
+            logger.info("[SOURCE_A] Visuar listing unchanged since last run, skipping extraction.")
+            return LISTING_UNCHANGED
+
+        current_results = await self._scraped_results_visuar(page)
+        for r in current_results:
+            if r["url"] not in seen_urls:
+                seen_urls.add(r["url"])
+                all_results.append(r)
+
+        logger.info(f"[SOURCE_A] Visuar found {len(all_results)} items using 'View All' strategy.")
+        return all_results
+
+    async def _visit_gg(self, page) -> list:
+        # Set a more realistic User-Agent
+        await page.set_extra_http_headers({
+            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36"
+        })
+        # Subscribed before navigation so no listing answer is missed
+        responses = ListingResponses(page, "gonzalezgimenez.com.py", GG_CARD_MARKER)
+        waits = self.page_waits["Gonzalez Gimenez"] = PageWaits(page)
+        items = None
+        try:
+            await page.goto("https://www.gonzalezgimenez.com.py/categoria/127/acondicionadores-de-aire", wait_until="domcontentloaded")
+            # Wait for the catalogue to render instead of a fixed delay
+            await page.wait_for_selector('.item-catalogo', timeout=60000)
+
+            await self._dismiss_gg_popups(page, waits)
+
+            items = await self._gg_from_xhr(page, responses)
+            if items is None:
+                logger.info("[GG_SCRAPE] No listing XHR seen, falling back to scrolling the DOM")
+                await self._scroll_gg(page, waits)
+
+        except Exception as e:
+            logger.warning(f"Error during GG infinite scroll: {e}")
+            await page.screenshot(path='/app/output/gg_debug.png')
+        finally:
+            responses.close()
+
+        if items is not None:
+            if self._cards_unchanged("Gonzalez Gimenez", [f"{i['name']}\x1f{i['url']}\x1f{i['price']}" for i in items]):
+                logger.info("[GG_SCRAPE] Listing unchanged since last run, skipping extraction.")
+                return LISTING_UNCHANGED
+            return items
+        if await self._listing_unchanged(page, "Gonzalez Gimenez", '.product'):
+            logger.info("[GG_SCRAPE] Listing unchanged since last run, skipping extraction.")
+            return LISTING_UNCHANGED
+        return await self._scraped_results_gg(page)
+
+    async def _dismiss_gg_popups(self, page, waits: PageWaits):
+        """
+        Multi-attempt popup bypass: dismiss popups as they appear, stop once
+        none shows up. When the saved browser state has kept popups away on
+        recent runs, only a quick check is made; a popup appearing anyway
+        (stale state) switches back to the full wait and is remembered.
+        """
+        name = "Gonzalez Gimenez"
+        memory = self.state_store.popups(name) if self.state_store else None
+        warm = bool(self.state_store) and name in self.state_store.restored
+        needed = memory is None or memory.needed(warm)
+        selectors = memory.ordered(GG_POPUP_SELECTORS) if memory else GG_POPUP_SELECTORS
+        if not needed:
+            logger.info("[GG_SCRAPE] Saved state has kept popups away, quick check only")
+
+        fired = []
+        timeout = GG_POPUP_TIMEOUT_MS if needed else GG_POPUP_CHECK_MS
+        for _ in range(3):
+            selector = await waits.popup(selectors, timeout_ms=timeout)
+            if selector is None:
+                break
+            fired.append(selector)
+            timeout = GG_POPUP_TIMEOUT_MS
             try:
-                comp_v = session.query(Competitor).filter_by(name='Visuar').first()
-                if comp_v:
-                    visuar_log.competitor_id = comp_v.id
-                self._update_progress(source="Visuar", phase="Scraping", current=0, total=0)
-                logger.info("Connecting to Visuar...")
-                
-                async def visit_visuar():
-                    # STABLE BASELINE: Use resultsPerPage=9999999 to load all 73 products at once
-                    await page.goto("https://www.visuar.com.py/hogar/aires-acondicionados/?resultsPerPage=9999999", wait_until="networkidle", timeout=60000)
-                    
-                    # Auto-pagination: While we have everything, we still scroll for lazy images/triggers
-                    seen_urls = set()
-                    all_results = []
-                    
-                    # Small wait for DOM items to render
-                    await page.wait_for_selector('.product-miniature', timeout=20000)
-                    
-                    # Force a few scrolls to ensure everything is in state
-                    for _ in range(3):
-                        await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
-                        await page.wait_for_timeout(2000)
-                    
-                    current_results = await self._scraped_results_visuar(page)
-                    for r in current_results:
-                        if r["url"] not in seen_urls:
-                            seen_urls.add(r["url"])
-                            all_results.append(r)
-                            
-                    logger.info(f"[SOURCE_A] Visuar found {len(all_results)} items using 'View All' strategy.")
-                    return all_results
-                
-                visuar_data = await retry_with_backoff(visit_visuar, max_retries=3)
-                visuar_log.status = 'success'
-                visuar_log.products_scraped = len(visuar_data)
-                self._update_progress(source="Visuar", current=len(visuar_data), total=len(visuar_data))
-                logger.info(f"[SOURCE_A] Ingested {len(visuar_data)} records from Visuar")
+                await page.click(selector, timeout=2000)
+                logger.info(f"[GG_SCRAPE] Closed popup using {selector}")
+                await page.keyboard.press("Escape")
+            except Exception: pass
+
+        if memory:
+            memory.record(fired, warm)
+        self.fetch_metrics[name].update({"state_restored": warm, "popups": fired, "popup_check": "full" if needed else "quick"})
+
+    async def _gg_from_xhr(self, page, responses: ListingResponses) -> Optional[list]:
+        """
+        GG listing from its infinite-scroll answers: the cards already in the
+        DOM, the answer to one scroll, then the following pages requested
+        directly when the endpoint is paginated by query parameter (else one
+        scroll per page, each waiting only for its answer). None when no
+        listing answer arrives, so the caller can scroll the DOM instead.
+        """
+        items = {}
+
+        def add(batch) -> int:
+            new = [item for item in batch if (item["url"] or item["name"]) not in items]
+            for item in new:
+                items[item["url"] or item["name"]] = item
+            self._update_progress(source="Gonzalez Gimenez", current=len(items), total=68, phase=f"Loading GG ({len(items)}/68)")
+            return len(new)
+
+        async def parse(fragments) -> list:
+            batch = []
+            for fragment in fragments:
+                batch.extend(self._gg_items(await extract_html(page, fragment, GG_LISTING)))
+            return batch
+
+        add(await self._scraped_results_gg(page))
+        await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
+        first = await responses.next_listing()
+        if first is None:
+            return None
+        first_batch = await parse(first.fragments)
+        add(first_batch)
+        pages = 1
+
+        if page_param(first.url) and first.method == "GET":
+            mode = f"direct requests to {urlparse(first.url).path}"
+            async for fragments in following_pages(page, first, len(first_batch), GG_CARD_MARKER):
+                pages += 1
+                if not add(await parse(fragments)):
+                    break
+        else:
+            mode = "scroll answers"
+            while pages < INFINITE_SCROLL_MAX_PAGES:
+                if await page.get_by_text(GG_END_OF_LIST).is_visible():
+                    break
+                await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
+                answer = await responses.next_listing()
+                if answer is None or not add(await parse(answer.fragments)):
+                    break
+                pages += 1
+
+        logger.info(f"[GG_SCRAPE] {len(items)} items from {pages} XHR page(s) via {mode}")
+        return list(items.values())
+
+    async def _scroll_gg(self, page, waits: PageWaits):
+        """Fallback: reveal the GG listing by scrolling until it stops growing."""
+        # Dynamic Infinite Scroll Loop
+        last_count = 0
+        stuck_count = 0
+        for i in range(50): # Max 50 attempts
+            # Scroll by a larger increment, then wait for new cards or a quiet DOM
+            await page.evaluate("window.scrollBy(0, 3000)")
+            current_count = await waits.count_growth('.product.item-catalogo', last_count, quiet_ms=1500, timeout_ms=8000)
+            self._update_progress(source="Gonzalez Gimenez", current=current_count, total=68, phase=f"Scrolling GG ({current_count}/68)")
+
+            # Log progress
+            if i % 5 == 0:
+                logger.info(f"[GG_SCRAPE] Scroll {i}: Found {current_count} items...")
+
+            # Break if we see the end message or reach target
+            end_msg = await page.get_by_text(GG_END_OF_LIST).is_visible()
+            if end_msg or current_count >= 68:
+                logger.info(f"[GG_SCRAPE] End reached. Items: {current_count}")
+                break
+
+            if current_count > last_count:
+                last_count = current_count
+                stuck_count = 0
+            else:
+                stuck_count += 1
+                # Shaking the scroll if stuck
+                if stuck_count >= 3:
+                    await page.evaluate("window.scrollBy(0, -1000)")
+                    await page.evaluate("window.scrollBy(0, 2000)")
+
+                if stuck_count > 6:
+                    logger.warning(f"[GG_SCRAPE] No new items after {stuck_count} scrolls. Stopping at {current_count}.")
+                    break
+
+            # Standard scroll to bottom, plus an extra nudge to trigger the lazy loader
+            await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
+            await page.mouse.wheel(0, 1000)
+
+    async def _scrape_source(self, pool, semaphore, session, name: str, tag: str, visit, fetch=None) -> list:
+        """
+        Scrape a single competitor in its own pooled browser context.
+
+        `fetch`, if given, is a browser-free fast path tried first; the
+        browser `visit` only runs when it raises ListingFetchError. Waits for
+        a slot in the concurrency cap, bounds the whole attempt (HTTP fetch,
+        browser visit and its retries) by SCRAPE_SOURCE_TIMEOUT and always
+        records a ScrapeLog for the source, whatever the outcome. Returns the items, or
+        LISTING_UNCHANGED when the listing fingerprint matches the last run.
+        """
+        data = []
+        log = ScrapeLog(started_at=datetime.now(timezone.utc), status='failed')
+        self.scrape_logs[name] = log
+        self.fingerprints.pop(name, None)
+        self.page_waits.pop(name, None)
+        self.fetch_metrics[name] = {"fetch": "browser"}
+
+        async def fetch_or_visit():
+            if fetch is not None:
+                try:
+                    return await fetch()
+                except ListingFetchError as e:
+                    self.fetch_metrics[name] = {"fetch": "browser", "http_fallback": str(e)}
+                    logger.warning(f"[{tag}] {name} HTTP fetch failed ({e}), falling back to the browser")
+            async with pool.page(name, user_agent=USER_AGENT) as page:
+                logger.info(f"Connecting to {name}...")
+                return await retry_with_backoff(lambda: visit(page), max_retries=3)
+
+        async with semaphore:
+            log.started_at = datetime.now(timezone.utc)
+            try:
+                comp = session.query(Competitor).filter_by(name=name).first()
+                if comp:
+                    log.competitor_id = comp.id
+                    last = self._load_last_fingerprint(session, comp.id)
+                    if last:
+                        self.last_fingerprints[name] = last
+                self._update_progress(source=name, phase="Scraping", current=0, total=0)
+                data = await asyncio.wait_for(fetch_or_visit(), timeout=SCRAPE_SOURCE_TIMEOUT)
+                log.fingerprint = self.fingerprints.get(name)
+                if data is LISTING_UNCHANGED:
+                    log.status = 'unchanged'
+                    logger.info(f"[{tag}] {name} unchanged since last run (fingerprint {log.fingerprint[:12]})")
+                else:
+                    log.status = 'success'
+                    log.products_scraped = len(data)
+                    self._update_progress(source=name, current=len(data), total=len(data))
+                    logger.info(f"[{tag}] Ingested {len(data)} records from {name}")
+            except asyncio.TimeoutError:
+                log.error_message = f"Timed out after {SCRAPE_SOURCE_TIMEOUT}s"
+                logger.error(f"[{tag}] {name} scrape timed out after {SCRAPE_SOURCE_TIMEOUT}s")
             except Exception as e:
-                visuar_log.error_message = str(e)
-                logger.error(f"[SOURCE_A] Visuar scrape failed: {e}")
+                log.error_message = str(e)
+                logger.error(f"[{tag}] {name} scrape failed: {e}")
             finally:
-                visuar_log.finished_at = datetime.now(timezone.utc)
-                session.add(visuar_log)
-            
+                log.finished_at = datetime.now(timezone.utc)
+                log.metrics = dict(self.fetch_metrics[name])
+                blocker = pool.blocker(name)
+                if blocker and log.metrics["fetch"] == "browser":
+                    log.metrics.update(blocker.metrics())
+                    logger.info(f"[{tag}] {name} browser: {blocker.summary()}")
+                if pool.asset_cache and log.metrics["fetch"] == "browser":
+                    log.metrics["asset_cache"] = pool.asset_cache.metrics(name)
+                    logger.info(f"[{tag}] {name} asset cache: {pool.asset_cache.summary(name)}")
+                waits = self.page_waits.get(name)
+                if waits:
+                    log.metrics["waits"] = waits.metrics()
+                    logger.info(f"[{tag}] {name} waits: {waits.summary()}")
+                if log.status == 'failed' and log.metrics["fetch"] == "browser":
+                    # Saved cookies may be what broke the site: start the next run cold
+                    pool.discard_state(name)
+                session.add(log)
+        return data
+
+    async def run_pipeline(self):
+        logger.info("[PIPELINE_START] Commencing Market Intelligence Data Ingestion")
+        session = self.Session()
+        # Restored/discarded keys are tracked per run
+        self.state_store = StateStore() if BROWSER_STATE else None
+
+        # One browser for the listing scrape and the deep scrape
+        asset_cache = AssetCache() if ASSET_CACHE else None
+        async with BrowserPool(state_store=self.state_store, asset_cache=asset_cache) as pool, \
+                http_client(USER_AGENT) as client:
+            semaphore = asyncio.Semaphore(SCRAPE_MAX_CONCURRENCY)
+            started = time.monotonic()
+
             # ── Bristol ──
             # DISABLED: User requested only GG scraping
             bristol_data = []
@@ -356,114 +708,40 @@ class MarketIntelligenceEngine:
             logger.info("[Bristol] Skipped - DISABLED by user request")
             session.add(bristol_log)
 
-            # ── Gonzalez Gimenez ──
-            gg_data = []
-            gg_log = ScrapeLog(started_at=datetime.now(timezone.utc), status='failed')
-            try:
-                comp_g = session.query(Competitor).filter_by(name='Gonzalez Gimenez').first()
-                if comp_g:
-                    gg_log.competitor_id = comp_g.id
-                self._update_progress(source="Gonzalez Gimenez", phase="Scraping", current=0, total=0)
-                logger.info("Connecting to Gonzalez Gimenez...")
-                # Set a more realistic User-Agent
-                await context.set_extra_http_headers({
-                    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36"
-                })
-                
-                async def visit_gg():
-                    await page.goto("https://www.gonzalezgimenez.com.py/categoria/127/acondicionadores-de-aire", wait_until="domcontentloaded")
-                    try:
-                        # Initial wait for JS to load
-                        await page.wait_for_timeout(5000)
-                        
-                        # Multi-attempt popup bypass
-                        for _ in range(3):
-                            try:
-                                close_selectors = [".ins-close-button", ".close-modal", ".modal-close", ".btn-close", ".pop-close"]
-                                for selector in close_selectors:
-                                    if await page.is_visible(selector):
-                                        await page.click(selector, timeout=2000)
-                                        logger.info(f"[GG_SCRAPE] Closed popup using {selector}")
-                                        break
-                                await page.keyboard.press("Escape")
-                                await page.wait_for_timeout(1000)
-                            except: pass
-
-                        await page.wait_for_selector('.item-catalogo', timeout=60000)
-                        
-                        # Dynamic Infinite Scroll Loop
-                        last_count = 0
-                        stuck_count = 0
-                        for i in range(50): # Max 50 attempts (~150s)
-                            # Scroll by a larger increment
-                            await page.evaluate("window.scrollBy(0, 3000)")
-                            await page.wait_for_timeout(3000)
-                            
-                            items = await page.query_selector_all('.product.item-catalogo')
-                            current_count = len(items)
-                            self._update_progress(source="Gonzalez Gimenez", current=current_count, total=68, phase=f"Scrolling GG ({current_count}/68)")
-                            
-                            # Log progress
-                            if i % 5 == 0:
-                                logger.info(f"[GG_SCRAPE] Scroll {i}: Found {current_count} items...")
-
-                            # Break if we see the end message or reach target
-                            end_msg = await page.get_by_text("- Se llegó al final de la lista -").is_visible()
-                            if end_msg or current_count >= 68:
-                                logger.info(f"[GG_SCRAPE] End reached. Items: {current_count}")
-                                break
-                                
-                            if current_count > last_count:
-                                last_count = current_count
-                                stuck_count = 0
-                            else:
-                                stuck_count += 1
-                                # Shaking the scroll if stuck
-                                if stuck_count >= 3:
-                                    await page.evaluate("window.scrollBy(0, -1000)")
-                                    await page.wait_for_timeout(1000)
-                                    await page.evaluate("window.scrollBy(0, 2000)")
-                                
-                                if stuck_count > 6:
-                                    logger.warning(f"[GG_SCRAPE] No new items after {stuck_count} scrolls. Stopping at {current_count}.")
-                                    break
-                            
-                            # Standard scroll to bottom
-                            await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
-                            await page.wait_for_timeout(3000)
-                            # Extra nudge to trigger lazy loader
-                            await page.mouse.wheel(0, 1000)
-                            await page.wait_for_timeout(2000)
-                            
-                    except Exception as e:
-                        logger.warning(f"Error during GG infinite scroll: {e}")
-                        await page.screenshot(path='/app/output/gg_debug.png')
-                    return await self._scraped_results_gg(page)
-                
-                gg_data = await retry_with_backoff(visit_gg, max_retries=3)
-                gg_log.status = 'success'
-                gg_log.products_scraped = len(gg_data)
-                self._update_progress(source="Gonzalez Gimenez", current=len(gg_data), total=len(gg_data), phase="Scraping Complete")
-                logger.info(f"[SOURCE_C] Ingested {len(gg_data)} records from Gonzalez Gimenez")
-            except Exception as e:
-                gg_log.error_message = str(e)
-                logger.error(f"[SOURCE_C] GG scrape failed: {e}")
-            finally:
-                gg_log.finished_at = datetime.now(timezone.utc)
-                session.add(gg_log)
+            # ── Visuar + Gonzalez Gimenez ──
+            # Each source runs in its own context, so wall-clock time is
+            # bounded by the slowest site instead of the sum of all of them.
+            visuar_data, gg_data = await asyncio.gather(
+                self._scrape_source(pool, semaphore, session, "Visuar", "SOURCE_A", self._visit_visuar,
+                                    fetch=(lambda: self._fetch_visuar(client)) if HTTP_LISTING_FETCH else None),
+                self._scrape_source(pool, semaphore, session, "Gonzalez Gimenez", "SOURCE_C", self._visit_gg),
+            )
+            self._update_progress(phase="Scraping Complete")
+            logger.info(f"[PIPELINE] Listing scrape finished in {time.monotonic() - started:.1f}s")
+
+            # Unchanged sources skip sync, matching and alerts (their listings only get a heartbeat)
+            unchanged = {
+                name: self.last_fingerprints[name][1]
+                for name, data in (("Visuar", visuar_data), ("Gonzalez Gimenez", gg_data))
+                if data is LISTING_UNCHANGED
+            }
+            if unchanged:
+                logger.info(f"[PIPELINE] Unchanged listings: {', '.join(sorted(unchanged))}")
+            if visuar_data is LISTING_UNCHANGED:
+                visuar_data = None
+            if gg_data is LISTING_UNCHANGED:
+                gg_data = None
 
-            await browser.close()
-            
-            # ── Deep Scraping for unmatched ──
-            # We do this before sync or after? 
-            # Better after sync to know what is new/unmatched?
-            # Actually, we can do it during sync or right after.
-            
             # ── Database Sync ──
-            self._sync_to_database(visuar_data, bristol_data, gg_data)
-            
+            if not self._sync_to_database(visuar_data, bristol_data, gg_data, unchanged=unchanged):
+                # Don't let a fingerprint whose data never reached the DB skip the next run
+                for log in self.scrape_logs.values():
+                    if log.status == 'success':
+                        log.fingerprint = None
+
             # ── Targeted Deep Scraping (for those missing description/product_id) ──
-            await self._run_targeted_deep_scrape()
+            if visuar_data is not None or gg_data is not None:
+                await self._run_targeted_deep_scrape(pool)
 
             # ── Legacy JSON Export ──
             self._save_json(visuar_data, bristol_data, gg_data)
@@ -477,7 +755,18 @@ class MarketIntelligenceEngine:
         finally:
             session.close()
 
-    def _sync_to_database(self, visuar_data: List[Dict], bristol_data: List[Dict], gg_data: List[Dict] = None):
+        # New prices are in: drop cached dashboard responses
+        live_data_cache.invalidate()
+
+    def _sync_to_database(self, visuar_data: Optional[List[Dict]], bristol_data: List[Dict],
+                          gg_data: Optional[List[Dict]] = None, unchanged: Optional[Dict[str, datetime]] = None) -> bool:
+        """
+        Write one run's items and run matching/alerts on them. Sources listed in
+        `unchanged` ({name: start of their last synced run}) are not re-synced;
+        their listings only get a last_seen_at heartbeat. Returns False if the
+        transaction was rolled back.
+        """
+        unchanged = unchanged or {}
         session = self.Session()
         try:
             comp_visuar = session.query(Competitor).filter_by(name='Visuar').first()
@@ -497,71 +786,28 @@ class MarketIntelligenceEngine:
             
             session.flush()
 
-            total_sync = len(visuar_data) + len(bristol_data) + (len(gg_data) if gg_data else 0)
-            self._update_progress(source="Database", phase="Syncing Data", current=0, total=total_sync)
-            current_sync = 0
-
-            def get_or_create_cp(comp_id, item):
-                nonlocal current_sync
-                current_sync += 1
-                self._update_progress(current=current_sync)
-                cp = session.query(CompetitorProduct).filter_by(
-                    competitor_id=comp_id, name=item['name']
-                ).first()
-                if cp:
-                    # Update potentially missing fields
-                    if not cp.url and item.get('url'): cp.url = item.get('url')
-                    if not cp.sku and item.get('sku'): cp.sku = item.get('sku')
-                    if not cp.raw_brand and item.get('brand'): cp.raw_brand = item.get('brand')
-                else:
-                    btu = self._normalize_btu(item['name'])
-                    inverter = self._is_inverter(item['name'])
-                    cp = CompetitorProduct(
-                        competitor_id=comp_id,
-                        name=item['name'],
-                        capacity_btu=btu,
-                        is_inverter=inverter,
-                        sku=item.get('sku'),
-                        url=item.get('url'),
-                        raw_brand=item.get('brand')
-                    )
-                    session.add(cp)
-                    session.flush()
-                return cp
-
-            # Visuar acting as absolute canonical
-            for v_item in visuar_data:
-                cp_visuar = get_or_create_cp(comp_visuar.id, v_item)
-                
-                # Auto-approve canonical Visuar products
-                if not cp_visuar.product_id:
-                    db_product = Product(
-                        name=v_item['name'],
-                        capacity_btu=cp_visuar.capacity_btu,
-                        is_inverter=cp_visuar.is_inverter,
-                        brand=cp_visuar.raw_brand or "Identified",
-                        description=cp_visuar.description
-                    )
-                    session.add(db_product)
-                    session.flush()
-                    cp_visuar.product_id = db_product.id
-                    session.flush()
+            competitors = {"Visuar": comp_visuar, "Bristol": comp_bristol, "Gonzalez Gimenez": comp_gg}
+            for name, seen_since in unchanged.items():
+                touch_competitor_listings(session, competitors[name].id, seen_since)
 
-                session.add(PriceLog(
-                    competitor_product_id=cp_visuar.id,
-                    price=v_item['price'],
-                    is_in_stock=True
-                ))
+            # (competitor_id, items, is_canonical) — Visuar acts as absolute canonical
+            sources = [
+                (comp_visuar.id, visuar_data or [], True),
+                (comp_bristol.id, bristol_data, False),
+                (comp_gg.id, gg_data or [], False),
+            ]
+            if not any(items for _, items, _ in sources):
+                session.commit()
+                logger.info("[PIPELINE] No changed source to sync; skipping AI matching and alerts.")
+                return True
 
-            # Competitors (Staged for Human in loop mapping or AI)
-            for b_item in bristol_data:
-                cp_b = get_or_create_cp(comp_bristol.id, b_item)
-                session.add(PriceLog(competitor_product_id=cp_b.id, price=b_item['price'], is_in_stock=True))
+            total_sync = sum(len(items) for _, items, _ in sources)
+            self._update_progress(source="Database", phase="Syncing Data", current=0, total=total_sync)
 
-            if gg_data:
-                for g_item in gg_data:
-                    cp_g = get_or_create_cp(comp_gg.id, g_item)
-                    session.add(PriceLog(competitor_product_id=cp_g.id, price=g_item['price'], is_in_stock=True))
+            if SYNC_MODE == "bulk":
+                changed_ids = self._sync_bulk(session, sources)
+            else:
+                changed_ids = self._sync_rows(session, sources)
 
             session.commit()
             logger.info("[PIPELINE_COMPLETE] Database synchronized. Staged raw data with pending suggestions.")
@@ -572,58 +818,302 @@ class MarketIntelligenceEngine:
 
             # Run Alert Engine
             from alert_engine import evaluate_alerts
-            logger.info("[ALERT_ENGINE] Evaluating price alerts...")
-            evaluate_alerts(session)
-            
+            logger.info(f"[ALERT_ENGINE] Evaluating price alerts ({ALERT_EVAL_MODE})...")
+            evaluate_alerts(session, changed_ids if ALERT_EVAL_MODE == "incremental" else None)
+            return True
+
         except Exception as e:
             session.rollback()
             logger.error(f"[INTEGRITY_COMPROMISED] Transaction rolled back due to error: {e}", exc_info=True)
+            return False
         finally:
             session.close()
 
-    async def _run_targeted_deep_scrape(self):
-        """Find CP without description and fetch it."""
+    def _sync_rows(self, session, sources: list) -> set:
+        """Legacy sync path: one lookup + flush per scraped item. Returns the logged competitor_product ids."""
+        current_sync = 0
+        priced_ids, unchanged_ids = set(), set()
+        price_logs = []
+        last_prices = last_known_prices(session, [comp_id for comp_id, _, _ in sources]) if INGEST_MODE == "cdc" else None
+
+        def get_or_create_cp(comp_id, item):
+            nonlocal current_sync
+            current_sync += 1
+            self._update_progress(current=current_sync)
+            cp = session.query(CompetitorProduct).filter_by(
+                competitor_id=comp_id, name=item['name']
+            ).first()
+            if cp:
+                # Update potentially missing fields
+                if not cp.url and item.get('url'): cp.url = item.get('url')
+                if not cp.sku and item.get('sku'): cp.sku = item.get('sku')
+                if not cp.raw_brand and item.get('brand'): cp.raw_brand = item.get('brand')
+            else:
+                btu = self._normalize_btu(item['name'])
+                inverter = self._is_inverter(item['name'])
+                cp = CompetitorProduct(
+                    competitor_id=comp_id,
+                    name=item['name'],
+                    capacity_btu=btu,
+                    is_inverter=inverter,
+                    sku=item.get('sku'),
+                    url=item.get('url'),
+                    raw_brand=item.get('brand')
+                )
+                session.add(cp)
+                session.flush()
+            return cp
+
+        for comp_id, items, is_canonical in sources:
+            for item in items:
+                cp = get_or_create_cp(comp_id, item)
+
+                # Auto-approve canonical Visuar products
+                if is_canonical and not cp.product_id:
+                    db_product = Product(
+                        name=item['name'],
+                        capacity_btu=cp.capacity_btu,
+                        is_inverter=cp.is_inverter,
+                        brand=cp.raw_brand or "Identified",
+                        description=cp.description
+                    )
+                    session.add(db_product)
+                    session.flush()
+                    cp.product_id = db_product.id
+                    session.flush()
+
+                # Competitors stay staged for Human in loop mapping or AI
+                if last_prices is not None:
+                    if not is_price_change(last_prices.get(cp.id), item['price'], True):
+                        unchanged_ids.add(cp.id)
+                        continue
+                    last_prices[cp.id] = (float(item['price']), True)
+                price_log = PriceLog(competitor_product_id=cp.id, price=item['price'], is_in_stock=True)
+                session.add(price_log)
+                price_logs.append(price_log)
+                priced_ids.add(cp.id)
+
+        session.flush()
+        touch_latest_prices(session, unchanged_ids)
+        refresh_latest_prices(session, [price_log.id for price_log in price_logs])
+        return priced_ids
+
+    def _load_competitor_products(self, session, competitor_ids: list) -> dict:
+        """Load every known competitor product for the given competitors in one query, keyed by (competitor_id, name)."""
+        rows = session.execute(
+            select(
+                CompetitorProduct.id, CompetitorProduct.competitor_id, CompetitorProduct.name,
+                CompetitorProduct.product_id, CompetitorProduct.capacity_btu, CompetitorProduct.is_inverter,
+                CompetitorProduct.description, CompetitorProduct.raw_brand, CompetitorProduct.sku,
+                CompetitorProduct.url,
+            ).where(CompetitorProduct.competitor_id.in_(competitor_ids))
+        )
+        return {(r.competitor_id, r.name): r for r in rows}
+
+    def _sync_bulk(self, session, sources: list) -> set:
+        """
+        Bulk sync path: a fixed number of statements regardless of catalog size.
+
+        Existing (competitor_id, name) keys are loaded once, new CompetitorProduct
+        rows are inserted in batches (ON CONFLICT DO NOTHING, so a concurrent
+        run's rows win), canonical Product rows are created only for the
+        listings this run actually inserted or found unmapped, missing fields
+        and product links are patched with a bulk UPDATE by primary key, PriceLogs are written with a
+        single executemany and latest_prices is upserted from the new log ids.
+        In 'cdc' ingest mode only items whose price/stock changed are logged;
+        unchanged listings get a last_seen_at heartbeat. Returns the logged
+        competitor_product ids.
+        """
+        competitor_ids = [comp_id for comp_id, _, _ in sources]
+        existing = self._load_competitor_products(session, competitor_ids)
+
+        new_cps, new_products, patches, canonical_keys = {}, [], {}, set()
+        for comp_id, items, is_canonical in sources:
+            for item in items:
+                key = (comp_id, item['name'])
+                if key in new_cps:
+                    continue
+                row = existing.get(key)
+                if row is None:
+                    cp = {
+                        "competitor_id": comp_id,
+                        "name": item['name'],
+                        "capacity_btu": self._normalize_btu(item['name']),
+                        "is_inverter": self._is_inverter(item['name']),
+                        "sku": item.get('sku'),
+                        "url": item.get('url'),
+                        "raw_brand": item.get('brand'),
+                        "product_id": None,
+                    }
+                    if is_canonical:
+                        canonical_keys.add(key)
+                    new_cps[key] = cp
+                    continue
+
+                patch = patches.get(row.id, {})
+                # Update potentially missing fields
+                if not row.url and item.get('url'): patch["url"] = item.get('url')
+                if not row.sku and item.get('sku'): patch["sku"] = item.get('sku')
+                if not row.raw_brand and item.get('brand'): patch["raw_brand"] = item.get('brand')
+                if is_canonical and not row.product_id and "product_id" not in patch:
+                    patch["product_id"] = uuid.uuid4()
+                    new_products.append({
+                        "id": patch["product_id"],
+                        "name": item['name'],
+                        "capacity_btu": row.capacity_btu,
+                        "is_inverter": row.is_inverter,
+                        "brand": row.raw_brand or patch.get("raw_brand") or "Identified",
+                        "description": row.description,
+                    })
+                if patch:
+                    patches[row.id] = patch
+
+        if new_cps:
+            dialect_insert = pg_insert if self.engine.dialect.name == "postgresql" else sqlite_insert
+            stmt = (
+                dialect_insert(CompetitorProduct)
+                .on_conflict_do_nothing(index_elements=["competitor_id", "name"])
+                .returning(CompetitorProduct.id, CompetitorProduct.competitor_id, CompetitorProduct.name)
+            )
+            for batch in _chunks(list(new_cps.values()), SYNC_BATCH_SIZE):
+                for inserted in session.execute(stmt, batch):
+                    key = (inserted.competitor_id, inserted.name)
+                    # Auto-approve canonical Visuar products, only for rows this run inserted:
+                    # a listing a concurrent run got in first keeps that run's product
+                    if key in canonical_keys:
+                        cp = new_cps[key]
+                        patches[inserted.id] = {"product_id": uuid.uuid4()}
+                        new_products.append({
+                            "id": patches[inserted.id]["product_id"],
+                            "name": cp["name"],
+                            "capacity_btu": cp["capacity_btu"],
+                            "is_inverter": cp["is_inverter"],
+                            "brand": cp["raw_brand"] or "Identified",
+                            "description": None,
+                        })
+            existing = self._load_competitor_products(session, competitor_ids)
+
+        # Products go in before the UPDATE that links competitor products to them
+        for batch in _chunks(new_products, SYNC_BATCH_SIZE):
+            session.execute(insert(Product), batch)
+
+        if patches:
+            session.execute(update(CompetitorProduct), [{"id": cp_id, **patch} for cp_id, patch in patches.items()])
+
+        last_prices = last_known_prices(session, competitor_ids) if INGEST_MODE == "cdc" else None
+        price_logs, unchanged_ids, scraped = [], set(), 0
+        for comp_id, items, _ in sources:
+            for item in items:
+                scraped += 1
+                cp_id = existing[(comp_id, item['name'])].id
+                if last_prices is not None:
+                    if not is_price_change(last_prices.get(cp_id), item['price'], True):
+                        unchanged_ids.add(cp_id)
+                        continue
+                    last_prices[cp_id] = (float(item['price']), True)
+                price_logs.append({"competitor_product_id": cp_id, "price": item['price'], "is_in_stock": True})
+
+        touch_latest_prices(session, unchanged_ids)
+        price_log_ids = []
+        for batch in _chunks(price_logs, SYNC_BATCH_SIZE):
+            price_log_ids.extend(session.execute(insert(PriceLog).returning(PriceLog.id), batch).scalars())
+        refresh_latest_prices(session, price_log_ids)
+
+        self._update_progress(current=scraped)
+        logger.info(
+            f"[BULK_SYNC] {len(new_cps)} new competitor products, {len(new_products)} canonical products, "
+            f"{len(patches)} patched, {len(price_logs)} price logs, {len(unchanged_ids)} unchanged ({INGEST_MODE})"
+        )
+        return {row["competitor_product_id"] for row in price_logs}
+
+    async def _deep_scrape_item(self, page, row) -> Optional[dict]:
+        """Visit one detail page and return the fields to write back, if any."""
+        await page.goto(row.url, wait_until="domcontentloaded", timeout=20000)
+        try:
+            await page.wait_for_selector(DETAIL_READY_SELECTOR, state="attached", timeout=5000)
+        except Exception:
+            pass  # Pages without a description block are still checked for a SKU
+
+        patch = {}
+        details = await extract(page, DETAIL_PAGE)
+        raw = details[0] if details else {}
+        if clean_text(raw.get("description")):
+            patch["description"] = clean_text(raw["description"])
+
+        # Also try SKU if missing
+        if not row.sku and raw.get("sku"):
+            patch["sku"] = raw["sku"].strip()
+
+        if patch:
+            patch["id"] = row.id
+        return patch or None
+
+    async def _run_targeted_deep_scrape(self, pool: Optional[BrowserPool] = None):
+        """
+        Find CP without description and fetch it.
+
+        DEEP_SCRAPE_WORKERS workers pull from a shared queue and open a page
+        per item from `pool` (a private pool if none), each domain is
+        capped at DEEP_SCRAPE_PER_DOMAIN in-flight requests spaced at least
+        DEEP_SCRAPE_DELAY seconds apart, and results are written back with a
+        bulk UPDATE every DEEP_SCRAPE_COMMIT_BATCH items.
+        """
         session = self.Session()
         try:
-            unmatched = session.query(CompetitorProduct).filter(
-                CompetitorProduct.description == None,
-                CompetitorProduct.url != None
+            unmatched = session.execute(
+                select(CompetitorProduct.id, CompetitorProduct.name, CompetitorProduct.url, CompetitorProduct.sku)
+                .where(CompetitorProduct.description == None, CompetitorProduct.url != None)
             ).all()
             
             if not unmatched: return
             
-            logger.info(f"[DEEP_SCRAPE] Processing {len(unmatched)} items...")
-            self._update_progress(source="Deep Scrape", phase="Processing Details", current=0, total=len(unmatched))
-            async with async_playwright() as p:
-                browser = await p.chromium.launch(headless=True)
-                page = await browser.new_page()
-                for idx, cp in enumerate(unmatched):
+            total = len(unmatched)
+            logger.info(f"[DEEP_SCRAPE] Processing {total} items with {DEEP_SCRAPE_WORKERS} workers...")
+            self._update_progress(source="Deep Scrape", phase="Processing Details", current=0, total=total)
+
+            queue = asyncio.Queue()
+            for row in unmatched:
+                queue.put_nowait(row)
+            throttle = DomainThrottle(DEEP_SCRAPE_PER_DOMAIN, DEEP_SCRAPE_DELAY)
+            pending_writes = []
+            done = 0
+
+            def flush_writes():
+                if pending_writes:
+                    session.execute(update(CompetitorProduct), pending_writes)
+                    session.commit()
+                    logger.info(f"[DEEP_SCRAPE] Committed {len(pending_writes)} item(s)")
+                    pending_writes.clear()
+
+            async def worker(pool):
+                nonlocal done
+                while True:
+                    try:
+                        row = queue.get_nowait()
+                    except asyncio.QueueEmpty:
+                        return
                     try:
-                        self._update_progress(current=idx + 1, total=len(unmatched))
-                        logger.info(f"[DEEP_SCRAPE] Item: {cp.name}")
-                        await page.goto(cp.url, wait_until="networkidle", timeout=20000)
-                        
-                        selectors = ['.product-description-short', '#product-desc-tab', '.caracteristicas', '.description']
-                        content = None
-                        for s in selectors:
-                            el = await page.query_selector(s)
-                            if el:
-                                content = await el.inner_text()
-                                if content: break
-                        
-                        if content:
-                            cp.description = content.strip()
-                        
-                        # Also try SKU if missing
-                        if not cp.sku:
-                            ref_el = await page.query_selector('.product-reference')
-                            if ref_el: cp.sku = (await ref_el.inner_text()).strip()
-                            
+                        async with throttle.slot(row.url), pool.page("Deep Scrape", user_agent=USER_AGENT) as page:
+                            logger.info(f"[DEEP_SCRAPE] Item: {row.name}")
+                            patch = await self._deep_scrape_item(page, row)
+                        if patch:
+                            pending_writes.append(patch)
+                            if len(pending_writes) >= DEEP_SCRAPE_COMMIT_BATCH:
+                                flush_writes()
                     except Exception as e:
-                        logger.warning(f"[DEEP_SCRAPE] Skip {cp.url}: {e}")
-                
-                session.commit()
-                await browser.close()
+                        logger.warning(f"[DEEP_SCRAPE] Skip {row.url}: {e}")
+                    finally:
+                        done += 1
+                        self._update_progress(current=done, total=total)
+
+            async with borrow_pool(pool) as pool:
+                await asyncio.gather(*(worker(pool) for _ in range(min(DEEP_SCRAPE_WORKERS, total))))
+                flush_writes()
+                blocker = pool.blocker("Deep Scrape")
+                if blocker:
+                    logger.info(f"[DEEP_SCRAPE] Browser: {blocker.summary()}")
+                if pool.asset_cache:
+                    logger.info(f"[DEEP_SCRAPE] Asset cache: {pool.asset_cache.summary('Deep Scrape')}")
         finally:
             session.close()
 
@@ -1,6 +1,6 @@
 import asyncio
 import re
-from playwright.async_api import async_playwright
+from browser_pool import borrow_pool
 from thefuzz import fuzz, process
 from typing import List, Dict, Any
 
@@ -23,6 +23,8 @@ class SmartMatcher:
     def __init__(self, master_products_dict: Dict[int, str]):
         # Example format: {1: "Split Samsung 12000 BTU Inverter", 45: "Split MDV 18000 BTU"}
         self.masters = master_products_dict
+        # Cleaned once here instead of on every get_match call
+        self.choices = {k: re.sub(r'[^a-zA-Z0-9\s]', '', v.lower()) for k, v in master_products_dict.items()}
 
     def get_match(self, raw_name: str, threshold: int = 85) -> Dict[str, Any]:
         """
@@ -33,8 +35,8 @@ class SmartMatcher:
             return {"master_id": None, "confidence": 0, "suggested": None, "status": "NO_MASTERS_AVAILABLE"}
 
         clean_target = re.sub(r'[^a-zA-Z0-9\s]', '', raw_name.lower())
-        choices = {k: re.sub(r'[^a-zA-Z0-9\s]', '', v.lower()) for k, v in self.masters.items()}
-        
+        choices = self.choices
+
         # Token set ratio is ideal for jumbled product names
         best_match_str, score, best_match_id = process.extractOne(
             clean_target, 
@@ -58,13 +60,11 @@ class SmartMatcher:
         }
 
 class ScraperEngine:
-    async def run(self):
+    async def run(self, pool=None):
         print("[*] Starting asynchronous market intelligence scraper...")
         scraped_data = []
 
-        async with async_playwright() as p:
-            browser = await p.chromium.launch(headless=True)
-            page = await browser.new_page()
+        async with borrow_pool(pool) as pool, pool.page("ScraperEngine") as page:
             
             # --- SCRAPE VISUAR ---
             try:
@@ -144,8 +144,6 @@ class ScraperEngine:
 
             except Exception as e:
                 print(f"[-] Error scraping Bristol: {e}")
-            
-            await browser.close()
         
         return scraped_data
 
@@ -6,12 +6,17 @@ Tests critical business logic including:
 - JSON response parsing
 - Brand validation logic
 - Error handling
+- Concurrent / batched matching against a local OpenAI-compatible stub
 
 Usage:
     pytest test_ai_matcher.py -v
 """
 import json
+import re
+import threading
+import uuid
 import pytest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from unittest.mock import Mock, patch, MagicMock
 from datetime import datetime
 
@@ -400,5 +405,141 @@ class TestPromptTemplate:
         assert "Product A" in prompt
 
 
+class StubOpenAIHandler(BaseHTTPRequestHandler):
+    """Minimal OpenAI-compatible /chat/completions endpoint that streams SSE chunks."""
+
+    requests = []
+    fail_first = 0
+    reply = None  # callable(prompt) -> dict
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        type(self).requests.append(body)
+        if type(self).fail_first > 0:
+            type(self).fail_first -= 1
+            self.send_response(429)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Retry-After", "0")
+            self.end_headers()
+            self.wfile.write(b'{"error": {"message": "rate limited"}}')
+            return
+
+        content = json.dumps(type(self).reply(body["messages"][-1]["content"]))
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        for piece in (content[:10], content[10:]):
+            chunk = {
+                "id": "stub", "object": "chat.completion.chunk", "created": 0, "model": "stub",
+                "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}],
+            }
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+        self.wfile.write(b"data: [DONE]\n\n")
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub_server(monkeypatch):
+    """Run the stub API on localhost and point ai_matcher at it."""
+    import ai_matcher
+
+    StubOpenAIHandler.requests = []
+    StubOpenAIHandler.fail_first = 0
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubOpenAIHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setattr(ai_matcher, "NVIDIA_BASE_URL", f"http://127.0.0.1:{server.server_address[1]}/v1")
+    monkeypatch.setattr(ai_matcher, "AI_MATCHER_RETRY_BASE_DELAY", 0)
+    monkeypatch.setattr(ai_matcher, "AI_MATCHER_RPM", 0)
+    yield StubOpenAIHandler
+    server.shutdown()
+
+
+def _seed_matching_db():
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from models import Base, Competitor, CompetitorProduct, Product
+
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    session.add(Competitor(id=1, name="Gonzalez Gimenez", url="https://gg.test"))
+    product = Product(id=uuid.uuid4(), name="Samsung 12000 BTU Inverter", brand="Samsung", capacity_btu=12000, is_inverter=True)
+    session.add(product)
+    for i in range(3):
+        session.add(CompetitorProduct(id=i + 1, competitor_id=1, name=f"Aire Samsung 12000 BTU #{i}",
+                                      capacity_btu=12000, is_inverter=True, raw_brand="Samsung"))
+    session.commit()
+    return session, product
+
+
+class TestStubServer:
+    """Tests against a local server speaking the OpenAI streaming API."""
+
+    def test_call_deepseek_retries_on_429(self, stub_server):
+        import ai_matcher
+
+        stub_server.fail_first = 2
+        stub_server.reply = lambda prompt: {"best_match_id": "abc", "confidence": 91}
+
+        result = ai_matcher._call_deepseek("Test prompt", ai_matcher._build_client())
+
+        assert result == {"best_match_id": "abc", "confidence": 91}
+        assert len(stub_server.requests) == 3
+
+    def test_run_ai_matching_batch_mode(self, stub_server):
+        import ai_matcher
+        from models import CompetitorProduct, PendingMapping
+
+        session, product = _seed_matching_db()
+        stub_server.reply = lambda prompt: {"matches": [
+            {"competitor_product_id": int(cp_id), "best_match_id": str(product.id), "confidence": 95, "reasoning": "stub"}
+            for cp_id in re.findall(r"- ID: (\d+)", prompt)
+        ]}
+
+        ai_matcher.run_ai_matching(session, workers=2, batch_size=5)
+
+        assert len(stub_server.requests) == 1
+        assert session.query(PendingMapping).count() == 3
+        assert all(cp.product_id == product.id for cp in session.query(CompetitorProduct))
+        session.close()
+
+    def test_run_ai_matching_concurrent_single_mode(self, stub_server):
+        import ai_matcher
+        from models import PendingMapping
+
+        session, product = _seed_matching_db()
+        stub_server.reply = lambda prompt: {"best_match_id": str(product.id), "confidence": 70, "reasoning": "stub"}
+
+        ai_matcher.run_ai_matching(session, workers=3, batch_size=1)
+
+        assert len(stub_server.requests) == 3
+        assert session.query(PendingMapping).count() == 3
+        session.close()
+
+    def test_run_ai_matching_reuses_cached_verdicts(self, stub_server):
+        import ai_matcher
+        from models import MatchCacheEntry, Product
+
+        session, product = _seed_matching_db()
+        stub_server.reply = lambda prompt: {"best_match_id": str(product.id), "confidence": 40, "reasoning": "stub"}
+
+        ai_matcher.run_ai_matching(session, workers=2, batch_size=1)
+        assert len(stub_server.requests) == 3
+        assert session.query(MatchCacheEntry).count() == 3
+
+        # Nothing changed: every verdict comes from the cache
+        ai_matcher.run_ai_matching(session, workers=2, batch_size=1)
+        assert len(stub_server.requests) == 3
+
+        # A new canonical product in the same BTU bucket changes the candidate set
+        session.add(Product(id=uuid.uuid4(), name="Samsung WindFree 12000 BTU", brand="Samsung", capacity_btu=12000))
+        session.commit()
+        ai_matcher.run_ai_matching(session, workers=2, batch_size=1)
+        assert len(stub_server.requests) == 6
+        session.close()
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
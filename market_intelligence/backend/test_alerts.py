@@ -23,6 +23,7 @@ from models import (
     AlertRule, NotificationLog, ScrapeLog,
 )
 from alert_engine import evaluate_alerts
+from latest_prices import refresh_latest_prices
 
 
 def setup_test_db():
@@ -172,6 +173,121 @@ def test_snapshot_immutability():
     session.close()
 
 
+# ─── TEST 4: Set-Based Evaluation ───────────────────────────────────
+
+def setup_pgcrypto_test_db():
+    """In-memory database with a passthrough pgp_sym_decrypt and a SELECT counter."""
+    import uuid
+    from sqlalchemy import event
+
+    engine = create_engine(TEST_DB_URL)
+
+    @event.listens_for(engine, "connect")
+    def _register_pgcrypto(dbapi_conn, _):
+        dbapi_conn.create_function("pgp_sym_decrypt", 2, lambda data, key: data)
+
+    selects = []
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _count(conn, cursor, statement, *args):
+        if statement.lstrip().upper().startswith("SELECT"):
+            selects.append(statement)
+
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    session.add_all([Competitor(id=1, name="StoreA", url="https://a.test"),
+                     Competitor(id=2, name="StoreB", url="https://b.test")])
+    products = [Product(id=uuid.uuid4(), name=f"Aire Samsung {btu} BTU", brand="Samsung", capacity_btu=btu)
+                for btu in (9000, 12000, 18000)]
+    session.add_all(products)
+    session.flush()
+    cp_id = 0
+    for product in products:
+        for comp_id in (1, 2):
+            cp_id += 1
+            session.add(CompetitorProduct(id=cp_id, competitor_id=comp_id, product_id=product.id,
+                                          name=f"{product.name} @{comp_id}"))
+            session.flush()
+            # Older history is above target; only the latest entry per competitor counts
+            for day, price in enumerate((5000000.0, 4500000.0, 3000000.0 + comp_id)):
+                session.add(PriceLog(competitor_product_id=cp_id, price=price, is_in_stock=True,
+                                     scraped_at=datetime(2024, 1, 1 + day)))
+    session.flush()
+    refresh_latest_prices(session, [pl.id for pl in session.query(PriceLog)])
+    session.commit()
+    return session, products, selects
+
+
+def test_set_based_evaluation_query_count():
+    """Query count stays constant as rules and price history grow."""
+    session, products, selects = setup_pgcrypto_test_db()
+    for product in products:
+        session.add(AlertRule(product_id=product.id, target_price=4000000.0, notification_channel="email",
+                              contact_info=b"test@visuar.com", cooldown_hours=24))
+    # Competitor-scoped rule: only StoreB's latest price may appear
+    session.add(AlertRule(product_id=products[0].id, competitor_id=2, target_price=4000000.0,
+                          notification_channel="email", contact_info=b"test@visuar.com", cooldown_hours=24))
+    session.commit()
+
+    selects.clear()
+    evaluate_alerts(session)
+    assert len(selects) == 2, f"Expected 2 SELECTs, got {len(selects)}"
+
+    notifications = session.query(NotificationLog).order_by(NotificationLog.alert_rule_id).all()
+    assert len(notifications) == 4
+    assert "StoreA: Gs. 3,000,001" in notifications[0].message_sent
+    assert "StoreB: Gs. 3,000,002" in notifications[0].message_sent
+    assert "StoreA" not in notifications[3].message_sent
+
+    # Every rule is now in cooldown
+    evaluate_alerts(session)
+    assert session.query(NotificationLog).count() == 4
+    session.close()
+
+
+# ─── TEST 5: Incremental Evaluation ─────────────────────────────────
+
+def test_incremental_evaluation_fires_on_transitions_only():
+    """Only rules on changed listings are evaluated, and only real transitions fire."""
+    session, products, selects = setup_pgcrypto_test_db()
+    price_rule = AlertRule(product_id=products[0].id, target_price=4000000.0, notification_channel="email",
+                           contact_info=b"test@visuar.com", cooldown_hours=0)
+    other_rule = AlertRule(product_id=products[1].id, target_price=4000000.0, notification_channel="email",
+                           contact_info=b"test@visuar.com", cooldown_hours=0)
+    stock_rule = AlertRule(product_id=products[2].id, notify_on_stock_change=True, notification_channel="email",
+                           contact_info=b"test@visuar.com", cooldown_hours=0)
+    session.add_all([price_rule, other_rule, stock_rule])
+    session.commit()
+
+    # Listing 1 (product 0 @ StoreA) went 4,500,000 -> 3,000,001: crosses the target
+    selects.clear()
+    evaluate_alerts(session, changed_competitor_product_ids={1})
+    assert len(selects) == 2, f"Expected 2 SELECTs, got {len(selects)}"
+    notifications = session.query(NotificationLog).all()
+    assert [n.alert_rule_id for n in notifications] == [price_rule.id]
+    assert "StoreA" in notifications[0].message_sent and "StoreB" not in notifications[0].message_sent
+
+    # Listing 2 was already below target: a further drop is not a crossing
+    session.add(PriceLog(competitor_product_id=2, price=2900000.0, is_in_stock=True))
+    # Listing 5 (product 2 @ StoreA) flips out of stock and back in
+    session.add(PriceLog(competitor_product_id=5, price=3000001.0, is_in_stock=False,
+                         scraped_at=datetime(2024, 1, 4)))
+    session.add(PriceLog(competitor_product_id=5, price=3000001.0, is_in_stock=True,
+                         scraped_at=datetime(2024, 1, 5)))
+    session.commit()
+    evaluate_alerts(session, changed_competitor_product_ids={2, 5, 6})
+
+    notifications = session.query(NotificationLog).order_by(NotificationLog.id).all()
+    assert [n.alert_rule_id for n in notifications] == [price_rule.id, stock_rule.id]
+    assert "StoreA" in notifications[1].message_sent and "StoreB" not in notifications[1].message_sent
+
+    # Nothing changed: nothing is evaluated
+    selects.clear()
+    evaluate_alerts(session, changed_competitor_product_ids=set())
+    assert selects == []
+    session.close()
+
+
 # ─── Run All Tests ──────────────────────────────────────────────────
 
 if __name__ == "__main__":
@@ -183,6 +299,8 @@ if __name__ == "__main__":
     test_alert_fires_on_price_drop()
     test_cooldown_blocks_duplicate_alert()
     test_snapshot_immutability()
+    test_set_based_evaluation_query_count()
+    test_incremental_evaluation_fires_on_transitions_only()
 
     print()
     print("=" * 60)
@@ -0,0 +1,248 @@
+"""
+Test suite for asset_cache.py.
+
+A local HTTP server plays a competitor's static assets with different
+caching headers; routes are driven by a fake Playwright route whose
+fetch() goes to that server, so nothing leaves the machine.
+Covers:
+  1. Freshness rules (max-age, Age, Expires, no-cache, no-store, validators)
+  2. Fresh hits served from disk, 304 revalidation, stale copies when the site is down
+  3. Content-addressed blobs, pruning, per-key hit rate, routing order in BrowserPool
+  4. Default types leave out what the blocker aborts; an overlap is logged
+
+Usage:
+    pytest test_asset_cache.py -v
+"""
+import asyncio
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import pytest
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+import resource_blocking
+from asset_cache import CACHE_HEADER, AssetCache, freshness
+from browser_pool import BrowserPool
+
+NOW = 1_700_000_000.0
+
+ASSETS = {
+    "/themes/theme.css": ({"Cache-Control": "max-age=3600", "Content-Type": "text/css"}, b"body{margin:0}" * 100),
+    "/themes/copy.css": ({"Cache-Control": "max-age=3600", "Content-Type": "text/css"}, b"body{margin:0}" * 100),
+    "/js/app.js": ({"Cache-Control": "no-cache", "ETag": '"v1"'}, b"console.log('app')" * 50),
+    "/js/live.js": ({"Cache-Control": "no-store"}, b"live()"),
+    "/api/products": ({"Content-Type": "application/json"}, b"[]"),
+}
+
+
+class AssetHandler(BaseHTTPRequestHandler):
+    hits = []
+
+    def do_GET(self):
+        AssetHandler.hits.append(self.path)
+        headers, body = ASSETS[self.path]
+        if headers.get("ETag") and self.headers.get("If-None-Match") == headers["ETag"]:
+            self.send_response(304)
+            self.send_header("ETag", headers["ETag"])
+            self.end_headers()
+            return
+        self.send_response(200)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    AssetHandler.hits = []
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), AssetHandler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def base_url(httpd):
+    return f"http://127.0.0.1:{httpd.server_address[1]}"
+
+
+class FakeRequest:
+    def __init__(self, url, resource_type, method="GET"):
+        self.url = url
+        self.resource_type = resource_type
+        self.method = method
+        self.headers = {"user-agent": "test-agent"}
+
+
+class FakeAPIResponse:
+    def __init__(self, response):
+        self.status = response.status_code
+        self.headers = {k.lower(): v for k, v in response.headers.items()}
+        self._body = response.content
+
+    async def body(self):
+        return self._body
+
+
+class FakeRoute:
+    """Playwright route whose fetch() goes to the fixture server."""
+
+    def __init__(self, url, resource_type="stylesheet", method="GET"):
+        self.request = FakeRequest(url, resource_type, method)
+        self.outcome = None
+        self.fulfilled = None
+
+    async def fetch(self, headers=None):
+        async with httpx.AsyncClient() as client:
+            return FakeAPIResponse(await client.get(self.request.url, headers=headers))
+
+    async def fulfill(self, status=None, headers=None, body=None):
+        self.outcome = "fulfilled"
+        self.fulfilled = (status, headers, body)
+
+    async def fallback(self):
+        self.outcome = "fallback"
+
+    async def abort(self, error_code=None):
+        self.outcome = "aborted"
+
+
+class FakeContext:
+    def __init__(self):
+        self.handlers = []
+
+    async def route(self, pattern, handler):
+        self.handlers.append(handler)
+
+    def on(self, event, handler):
+        pass
+
+    async def new_page(self):
+        return self
+
+    async def close(self):
+        pass
+
+
+def request(context, url, resource_type="stylesheet"):
+    route = FakeRoute(url, resource_type)
+    asyncio.run(context.handlers[-1](route))
+    return route
+
+
+def test_freshness_rules():
+    assert freshness({"cache-control": "public, max-age=600"}, NOW) == 600
+    assert freshness({"cache-control": "max-age=600", "age": "100"}, NOW) == 500
+    assert freshness({"expires": "Tue, 14 Nov 2023 23:13:20 GMT", "date": "Tue, 14 Nov 2023 22:13:20 GMT"}, NOW) == 3600
+    assert freshness({"cache-control": "no-cache", "etag": '"a"'}, NOW) == 0
+    assert freshness({"cache-control": "no-cache"}, NOW) is None
+    assert freshness({"cache-control": "no-store, max-age=600"}, NOW) is None
+    assert freshness({"cache-control": "max-age=600", "vary": "*"}, NOW) is None
+    # Validators only: heuristic freshness; nothing at all: not stored
+    assert freshness({"last-modified": "Tue, 14 Nov 2023 22:13:20 GMT"}, NOW) == 3600
+    assert freshness({"content-type": "text/css"}, NOW) is None
+
+
+def test_hits_revalidation_and_offline(server, tmp_path):
+    url = base_url(server)
+    cache = AssetCache(str(tmp_path), types={"stylesheet", "script"})
+
+    def run(path, resource_type="stylesheet"):
+        context = FakeContext()
+        asyncio.run(cache.attach(context, "Visuar"))
+        return request(context, url + path, resource_type)
+
+    # First run: everything misses and goes to the server
+    for path, resource_type in [("/themes/theme.css", "stylesheet"), ("/js/app.js", "script"),
+                                ("/js/live.js", "script")]:
+        route = run(path, resource_type)
+        assert route.fulfilled[0] == 200 and CACHE_HEADER not in route.fulfilled[1]
+    # XHR is not an asset: left to the other routes / the network
+    assert run("/api/products", "xhr").outcome == "fallback"
+    assert AssetHandler.hits == ["/themes/theme.css", "/js/app.js", "/js/live.js"]
+
+    # Next run (new context): the fresh stylesheet comes from disk, app.js is revalidated, no-store refetched
+    status, headers, body = run("/themes/theme.css").fulfilled
+    assert (status, body) == (200, ASSETS["/themes/theme.css"][1])
+    assert headers["content-type"] == "text/css" and headers[CACHE_HEADER] == "hit"
+    assert "content-length" not in headers
+    app = run("/js/app.js", "script")
+    assert app.fulfilled[1][CACHE_HEADER] == "revalidated" and app.fulfilled[2] == ASSETS["/js/app.js"][1]
+    assert run("/js/live.js", "script").fulfilled[1].get(CACHE_HEADER) is None
+    assert AssetHandler.hits[3:] == ["/js/app.js", "/js/live.js"]
+
+    # Site down: fresh and expired copies are still served, uncached assets fall through
+    server.shutdown()
+    server.server_close()
+    assert run("/themes/theme.css").fulfilled[1][CACHE_HEADER] == "hit"
+    assert run("/js/app.js", "script").fulfilled[1][CACHE_HEADER] == "stale"
+    assert run("/js/live.js", "script").outcome == "fallback"
+
+    metrics = cache.metrics("Visuar")
+    assert (metrics["lookups"], metrics["hits"], metrics["revalidated"], metrics["stale"], metrics["misses"]) == (9, 2, 1, 1, 4)
+    assert metrics["hit_rate"] == round(4 / 9, 3)
+    assert metrics["bytes_saved"] == 2 * len(ASSETS["/themes/theme.css"][1]) + 2 * len(ASSETS["/js/app.js"][1])
+    assert cache.metrics("Gonzalez Gimenez")["hit_rate"] == 0.0
+    assert cache.summary("Visuar").startswith("4/9 assets from disk (44%)")
+
+
+def test_blobs_shared_pruned_and_pool_routing(server, tmp_path, monkeypatch):
+    url = base_url(server)
+    cache = AssetCache(str(tmp_path), max_bytes=len(ASSETS["/themes/theme.css"][1]))
+    context = FakeContext()
+    asyncio.run(cache.attach(context, "Visuar"))
+    request(context, url + "/themes/theme.css")
+    request(context, url + "/themes/copy.css")
+    request(context, url + "/js/app.js", "script")
+
+    # Identical bodies under two URLs share one blob
+    assert len(os.listdir(tmp_path / "entries")) == 3 and len(os.listdir(tmp_path / "blobs")) == 2
+    os.utime(tmp_path / "blobs" / cache.lookup(url + "/js/app.js")["blob"], (1, 1))
+    cache.prune()
+    assert cache.lookup(url + "/js/app.js") is None and cache.lookup(url + "/themes/copy.css")
+
+    # In a pool, the cache is routed before the blocker, so the blocker sees requests first
+    monkeypatch.setattr(resource_blocking, "SCRAPE_BLOCKING", True)
+
+    class Browser:
+        async def new_context(self, **options):
+            return context
+
+        def is_connected(self):
+            return True
+
+        async def close(self):
+            pass
+
+    async def launch():
+        return Browser()
+
+    async def run():
+        context.handlers.clear()
+        async with BrowserPool(launcher=launch, asset_cache=cache) as pool:
+            async with pool.page("Visuar"):
+                pass
+            return pool
+
+    pool = asyncio.run(run())
+    assert [getattr(h, "__self__", None) for h in context.handlers] == [None, pool.blocker("Visuar")]
+    blocked = request(context, url + "/img/aire.jpg", "image")
+    passed = request(context, url + "/themes/theme.css")
+    assert blocked.outcome == "aborted" and passed.outcome == "fallback"
+
+
+def test_pool_reports_blocked_cache_types(tmp_path, monkeypatch, caplog):
+    monkeypatch.setattr(resource_blocking, "SCRAPE_BLOCKING", True)
+    assert AssetCache(str(tmp_path)).types == {"stylesheet", "script"}
+
+    BrowserPool(asset_cache=AssetCache(str(tmp_path), types={"stylesheet", "font", "image"}))
+    assert "['font', 'image'] are blocked before the cache; caching ['stylesheet']" in caplog.text
@@ -0,0 +1,137 @@
+"""
+Test suite for browser_pool.py.
+Covers:
+  1. One launch shared by all pages; per-key contexts
+  2. Contexts recycled after N pages, closed once their last page is
+  3. Relaunch after a disconnect, blockers kept per key, pool stats
+
+Usage:
+    pytest test_browser_pool.py -v
+"""
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+import resource_blocking
+from browser_pool import BrowserPool, borrow_pool
+
+
+class FakePage:
+    def __init__(self, context):
+        self.context = context
+        self.closed = False
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeContext:
+    def __init__(self, options):
+        self.options = options
+        self.closed = False
+        self.routes = 0
+
+    async def new_page(self):
+        return FakePage(self)
+
+    async def route(self, pattern, handler):
+        self.routes += 1
+
+    def on(self, event, handler):
+        pass
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeBrowser:
+    def __init__(self):
+        self.contexts = []
+        self.connected = True
+
+    async def new_context(self, **options):
+        self.contexts.append(FakeContext(options))
+        return self.contexts[-1]
+
+    def is_connected(self):
+        return self.connected
+
+    async def close(self):
+        self.connected = False
+
+
+def make_pool(max_pages=50):
+    browsers = []
+
+    async def launch():
+        browsers.append(FakeBrowser())
+        return browsers[-1]
+
+    return BrowserPool(max_pages_per_context=max_pages, launcher=launch), browsers
+
+
+def test_pages_share_one_browser_per_key_contexts():
+    pool, browsers = make_pool()
+
+    async def run():
+        async with pool:
+            async with pool.page("Visuar", user_agent="UA") as a, pool.page("Visuar") as b:
+                assert a.context is b.context and a.context.options == {"user_agent": "UA"}
+            async with pool.page("Gonzalez Gimenez") as c:
+                assert c.context is not a.context
+            assert a.closed and b.closed and not a.context.closed
+            # A nested borrow reuses the pool instead of launching
+            async with borrow_pool(pool) as same:
+                assert same is pool
+            return pool.stats()
+
+    stats = asyncio.run(run())
+
+    assert len(browsers) == 1 and not browsers[0].connected
+    assert all(ctx.closed for ctx in browsers[0].contexts)
+    assert (stats["launches"], stats["contexts_created"], stats["live_contexts"], stats["pages_opened"]) == (1, 2, 2, 3)
+
+
+def test_contexts_recycled_after_max_pages():
+    pool, browsers = make_pool(max_pages=2)
+
+    async def run():
+        async with pool:
+            async with pool.page("Deep Scrape") as first:
+                async with pool.page("Deep Scrape"):
+                    pass
+                # Third page: the full context is retired but stays open for `first`
+                async with pool.page("Deep Scrape") as third:
+                    assert third.context is not first.context
+                    assert not first.context.closed
+                    assert pool.stats()["live_contexts"] == 2
+            assert first.context.closed and not third.context.closed
+            return pool.stats()
+
+    stats = asyncio.run(run())
+
+    assert (stats["contexts_created"], stats["contexts_recycled"], stats["live_contexts"]) == (2, 1, 1)
+
+
+def test_relaunch_and_blockers(monkeypatch):
+    monkeypatch.setattr(resource_blocking, "SCRAPE_BLOCKING", True)
+    pool, browsers = make_pool(max_pages=1)
+
+    async def run():
+        async with pool:
+            async with pool.page("Visuar"):
+                pass
+            browsers[0].connected = False  # e.g. Chromium crashed
+            async with pool.page("Visuar") as page:
+                assert page.context in browsers[1].contexts
+            return pool.stats()
+
+    stats = asyncio.run(run())
+
+    assert stats["launches"] == 2
+    # Every context of a key routes through the key's single blocker
+    assert pool.blocker("Visuar").site == "Visuar" and pool.blocker("Gonzalez Gimenez") is None
+    assert [ctx.routes for b in browsers for ctx in b.contexts] == [1, 1]
+    assert stats["rss_bytes"] is None or stats["rss_bytes"] > 0
@@ -0,0 +1,188 @@
+"""
+Test suite for browser_state.py and its use by BrowserPool and the GG scraper.
+Covers:
+  1. Storage state saved on context close and restored into the next run's context
+  2. Stale state (old, corrupt, all cookies expired, rejected, discarded) starts cold
+  3. Popup memory: dismissal skipped after quiet warm runs, restored when a popup shows up again
+
+Usage:
+    pytest test_browser_state.py -v
+"""
+import asyncio
+import json
+import os
+import sys
+import time
+
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+
+os.environ.setdefault("NVIDIA_API_KEY", "test_key")
+sys.path.insert(0, os.path.dirname(__file__))
+
+import scraper
+from browser_pool import BrowserPool
+from browser_state import PopupMemory, StateStore
+from waits import PageWaits
+
+COOKIE = {"name": "popup_seen", "value": "1", "domain": ".gonzalezgimenez.com.py", "path": "/",
+          "expires": time.time() + 86400, "httpOnly": False, "secure": False, "sameSite": "Lax"}
+
+
+class FakePage:
+    def __init__(self, context=None):
+        self.context = context
+
+    async def close(self):
+        pass
+
+
+class FakeContext:
+    def __init__(self, options):
+        self.options = options
+        # A restored context carries its saved cookies; a fresh visit adds the consent cookie
+        self.state = options.get("storage_state") or {"cookies": [COOKIE], "origins": []}
+
+    async def new_page(self):
+        return FakePage(self)
+
+    async def storage_state(self):
+        return self.state
+
+    async def route(self, pattern, handler):
+        pass
+
+    def on(self, event, handler):
+        pass
+
+    async def close(self):
+        pass
+
+
+class FakeBrowser:
+    def __init__(self, reject_state=False):
+        self.contexts = []
+        self.reject_state = reject_state
+
+    async def new_context(self, **options):
+        if self.reject_state and "storage_state" in options:
+            raise ValueError("storage_state: invalid cookie")
+        self.contexts.append(FakeContext(options))
+        return self.contexts[-1]
+
+    def is_connected(self):
+        return True
+
+    async def close(self):
+        pass
+
+
+def run_pool(store, key="Gonzalez Gimenez", browser=None):
+    browser = browser or FakeBrowser()
+
+    async def launch():
+        return browser
+
+    async def run():
+        async with BrowserPool(launcher=launch, state_store=store) as pool:
+            async with pool.page(key, user_agent="UA") as page:
+                return page.context.options, pool.restored(key), browser
+    return asyncio.run(run())
+
+
+def test_state_saved_and_restored_across_runs(tmp_path):
+    options, restored, _ = run_pool(StateStore(str(tmp_path)))
+    assert "storage_state" not in options and not restored
+    with open(tmp_path / "gonzalez_gimenez.state.json") as f:
+        assert json.load(f)["cookies"][0]["name"] == "popup_seen"
+
+    # Next run (new store, as in a new pipeline run) starts from the saved cookies
+    options, restored, _ = run_pool(StateStore(str(tmp_path)))
+    assert options["storage_state"]["cookies"][0]["name"] == "popup_seen"
+    assert options["user_agent"] == "UA" and restored
+
+
+def test_stale_state_starts_cold(tmp_path):
+    store = StateStore(str(tmp_path), max_age_hours=1)
+    path = str(tmp_path / "visuar.state.json")
+
+    def write(state, age_hours=0):
+        with open(path, "w") as f:
+            f.write(state if isinstance(state, str) else json.dumps(state))
+        os.utime(path, (time.time() - age_hours * 3600,) * 2)
+
+    write({"cookies": [COOKIE], "origins": []}, age_hours=2)
+    assert store.load("Visuar") is None and not os.path.exists(path)
+    write("{truncated")
+    assert store.load("Visuar") is None and not os.path.exists(path)
+    write({"cookies": [dict(COOKIE, expires=time.time() - 60)], "origins": []})
+    assert store.load("Visuar") is None and "Visuar" not in store.restored
+
+    # Session cookies (expires -1) are kept, expired ones dropped
+    write({"cookies": [dict(COOKIE, expires=-1), dict(COOKIE, name="old", expires=1)], "origins": []})
+    assert [c["name"] for c in store.load("Visuar")["cookies"]] == ["popup_seen"]
+
+    # A state Playwright rejects is discarded and the context is created without it
+    options, restored, browser = run_pool(store, "Visuar", FakeBrowser(reject_state=True))
+    assert "storage_state" not in options and not restored and len(browser.contexts) == 1
+    # ...and not written back for the rest of the run
+    assert not os.path.exists(path)
+
+
+def test_popup_dismissal_skipped_after_quiet_warm_runs(tmp_path, monkeypatch):
+    monkeypatch.setattr(scraper, "DATABASE_URL", "sqlite://")
+    engine = scraper.MarketIntelligenceEngine()
+    name = "Gonzalez Gimenez"
+
+    class PopupPage:
+        def __init__(self, popup=None):
+            self.popup = popup
+            self.timeouts = []
+            self.clicked = []
+            self.keyboard = self
+
+        async def wait_for_selector(self, selector, state=None, timeout=None):
+            self.timeouts.append(timeout)
+            if self.popup is None:
+                raise PlaywrightTimeoutError(f"Timeout {timeout}ms exceeded.")
+            return self
+
+        async def evaluate(self, script, selectors):
+            return self.popup
+
+        async def click(self, selector, timeout=None):
+            self.clicked.append(selector)
+            self.popup = None
+
+        async def press(self, key):
+            pass
+
+    def visit(warm, popup=None):
+        engine.state_store = StateStore(str(tmp_path))
+        if warm:
+            engine.state_store.restored.add(name)
+        engine.fetch_metrics[name] = {"fetch": "browser"}
+        page = PopupPage(popup)
+        asyncio.run(engine._dismiss_gg_popups(page, PageWaits(page)))
+        return page, engine.fetch_metrics[name]
+
+    # Cold run: full wait, the popup that fired is remembered
+    page, metrics = visit(warm=False, popup=".ins-close-button")
+    assert page.clicked == [".ins-close-button"] and page.timeouts == [2000, 2000]
+    assert metrics["popups"] == [".ins-close-button"] and metrics["popup_check"] == "full"
+
+    # Warm runs keep the full wait until enough of them in a row saw no popup
+    for _ in range(2):
+        page, metrics = visit(warm=True)
+        assert page.timeouts == [2000]
+    page, metrics = visit(warm=True)
+    assert page.timeouts == [scraper.GG_POPUP_CHECK_MS] and metrics["popup_check"] == "quick"
+
+    # Stale state: the quick check still catches the popup, and the next run waits fully again
+    page, metrics = visit(warm=True, popup=".ins-close-button")
+    assert page.clicked == [".ins-close-button"] and page.timeouts == [scraper.GG_POPUP_CHECK_MS, 2000]
+    page, _ = visit(warm=True)
+    assert page.timeouts == [2000]
+
+    # Selectors that fired before are tried first
+    memory = PopupMemory(str(tmp_path / "gonzalez_gimenez.popups.json"))
+    assert memory.ordered(scraper.GG_POPUP_SELECTORS)[0] == ".ins-close-button"
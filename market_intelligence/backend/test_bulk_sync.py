@@ -0,0 +1,284 @@
+"""
+Test suite for the bulk database sync path in scraper.py.
+Covers:
+  1. New competitor/canonical products and price logs are written
+  2. Re-syncing reuses existing rows and back-fills missing fields
+  3. Statement count stays constant as the catalog grows
+  4. latest_prices follows the newest PriceLog in both sync paths
+  5. CDC ingest only logs price/stock changes and heartbeats the rest
+  6. A listing a concurrent run inserted first is skipped without orphan products
+  7. A SQLite database from the baseline schema is upgraded (duplicates merged) and syncs
+  8. An upgraded SQLite database gets latest_prices filled from its price history
+
+Usage:
+    pytest test_bulk_sync.py -v
+"""
+import os
+import sqlite3
+import sys
+
+os.environ.setdefault("NVIDIA_API_KEY", "test_key")
+sys.path.insert(0, os.path.dirname(__file__))
+
+from sqlalchemy import event
+
+import scraper
+from models import Competitor, CompetitorProduct, LatestPrice, Product, PriceLog
+
+
+# Tables as they were before competitor_products had its (competitor_id, name) key
+BASELINE_SCHEMA = """
+CREATE TABLE products (id CHAR(32) PRIMARY KEY, name VARCHAR NOT NULL, brand VARCHAR, capacity_btu INTEGER,
+    is_inverter BOOLEAN, internal_cost NUMERIC(15, 2), description TEXT, created_at DATETIME);
+CREATE TABLE competitors (id INTEGER PRIMARY KEY, name VARCHAR NOT NULL UNIQUE, url VARCHAR NOT NULL,
+    created_at DATETIME);
+CREATE TABLE competitor_products (id INTEGER PRIMARY KEY, competitor_id INTEGER NOT NULL REFERENCES competitors (id),
+    product_id CHAR(32) REFERENCES products (id), name VARCHAR NOT NULL, capacity_btu INTEGER, is_inverter BOOLEAN,
+    description TEXT, raw_brand VARCHAR(100), sku VARCHAR(100), url VARCHAR, created_at DATETIME);
+CREATE TABLE price_logs (id INTEGER PRIMARY KEY, competitor_product_id INTEGER NOT NULL
+    REFERENCES competitor_products (id), price FLOAT NOT NULL, is_in_stock BOOLEAN, scraped_at DATETIME);
+CREATE TABLE pending_mappings (id INTEGER PRIMARY KEY, competitor_product_id INTEGER NOT NULL
+    REFERENCES competitor_products (id), suggested_product_id CHAR(32) NOT NULL REFERENCES products (id),
+    match_score INTEGER NOT NULL, created_at DATETIME);
+CREATE TABLE scrape_logs (id INTEGER PRIMARY KEY, competitor_id INTEGER REFERENCES competitors (id),
+    started_at DATETIME, finished_at DATETIME, status VARCHAR(20), products_scraped INTEGER, error_message TEXT);
+"""
+
+
+def make_engine(monkeypatch):
+    """Engine bound to a fresh in-memory SQLite database."""
+    monkeypatch.setattr(scraper, "DATABASE_URL", "sqlite://")
+    return scraper.MarketIntelligenceEngine()
+
+
+def seed_competitors(session):
+    comps = [
+        Competitor(name="Visuar", url="https://www.visuar.com.py/"),
+        Competitor(name="Gonzalez Gimenez", url="https://www.gonzalezgimenez.com.py/"),
+    ]
+    session.add_all(comps)
+    session.commit()
+    return comps[0].id, comps[1].id
+
+
+def catalog(prefix, n):
+    return [
+        {"name": f"{prefix} Aire Samsung {i} 12000 BTU Inverter", "price": 1000.0 + i,
+         "url": f"https://example.com/{prefix}/{i}", "sku": None, "brand": "Samsung"}
+        for i in range(n)
+    ]
+
+
+def test_bulk_sync_inserts_rows(monkeypatch):
+    engine = make_engine(monkeypatch)
+    session = engine.Session()
+    visuar_id, gg_id = seed_competitors(session)
+
+    engine._sync_bulk(session, [(visuar_id, catalog("v", 3), True), (gg_id, catalog("g", 2), False)])
+    session.commit()
+
+    assert session.query(CompetitorProduct).count() == 5
+    assert session.query(Product).count() == 3
+    assert session.query(PriceLog).count() == 5
+
+    visuar_cps = session.query(CompetitorProduct).filter_by(competitor_id=visuar_id).all()
+    assert all(cp.product_id is not None for cp in visuar_cps)
+    assert all(cp.capacity_btu == 12000 and cp.is_inverter for cp in visuar_cps)
+    gg_cps = session.query(CompetitorProduct).filter_by(competitor_id=gg_id).all()
+    assert all(cp.product_id is None for cp in gg_cps)
+    session.close()
+
+
+def test_bulk_sync_reuses_and_backfills(monkeypatch):
+    engine = make_engine(monkeypatch)
+    session = engine.Session()
+    visuar_id, gg_id = seed_competitors(session)
+
+    # Pre-existing GG row without url, and an unmapped Visuar row
+    session.add(CompetitorProduct(competitor_id=gg_id, name="g Aire Samsung 0 12000 BTU Inverter"))
+    session.add(CompetitorProduct(competitor_id=visuar_id, name="v Aire Samsung 0 12000 BTU Inverter"))
+    session.commit()
+
+    engine._sync_bulk(session, [(visuar_id, catalog("v", 1), True), (gg_id, catalog("g", 1), False)])
+    session.commit()
+
+    assert session.query(CompetitorProduct).count() == 2
+    gg_cp = session.query(CompetitorProduct).filter_by(competitor_id=gg_id).one()
+    assert gg_cp.url == "https://example.com/g/0"
+    assert gg_cp.raw_brand == "Samsung"
+    visuar_cp = session.query(CompetitorProduct).filter_by(competitor_id=visuar_id).one()
+    assert visuar_cp.product_id is not None
+    assert session.query(Product).count() == 1
+
+    # Second run only appends price history (append ingest logs unchanged prices too)
+    monkeypatch.setattr(scraper, "INGEST_MODE", "append")
+    engine._sync_bulk(session, [(visuar_id, catalog("v", 1), True), (gg_id, catalog("g", 1), False)])
+    session.commit()
+    assert session.query(CompetitorProduct).count() == 2
+    assert session.query(Product).count() == 1
+    assert session.query(PriceLog).count() == 4
+    session.close()
+
+
+def test_bulk_sync_statement_count_is_constant(monkeypatch):
+    def count_statements(n):
+        engine = make_engine(monkeypatch)
+        session = engine.Session()
+        visuar_id, gg_id = seed_competitors(session)
+        statements = []
+        event.listen(engine.engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+        engine._sync_bulk(session, [(visuar_id, catalog("v", n), True), (gg_id, catalog("g", n), False)])
+        session.commit()
+        assert session.query(PriceLog).count() == 2 * n
+        session.close()
+        return len(statements)
+
+    assert count_statements(10) == count_statements(200)
+
+
+def test_sync_maintains_latest_prices(monkeypatch):
+    engine = make_engine(monkeypatch)
+    session = engine.Session()
+    visuar_id, gg_id = seed_competitors(session)
+
+    engine._sync_bulk(session, [(visuar_id, catalog("v", 2), True), (gg_id, catalog("g", 2), False)])
+    session.commit()
+    assert session.query(LatestPrice).count() == 4
+
+    repriced = [dict(item, price=item["price"] + 500) for item in catalog("g", 2)]
+    engine._sync_rows(session, [(gg_id, repriced[:1], False)])
+    engine._sync_bulk(session, [(gg_id, repriced[1:], False)])
+    session.commit()
+
+    assert session.query(LatestPrice).count() == 4
+    for latest in session.query(LatestPrice):
+        newest = (
+            session.query(PriceLog)
+            .filter_by(competitor_product_id=latest.competitor_product_id)
+            .order_by(PriceLog.id.desc())
+            .first()
+        )
+        assert (latest.price_log_id, latest.price) == (newest.id, newest.price)
+    gg_prices = sorted(lp.price for lp in session.query(LatestPrice).join(CompetitorProduct)
+                       .filter(CompetitorProduct.competitor_id == gg_id))
+    assert gg_prices == [1500.0, 1501.0]
+    session.close()
+
+
+def test_cdc_ingest_logs_only_changes(monkeypatch):
+    engine = make_engine(monkeypatch)
+    session = engine.Session()
+    visuar_id, gg_id = seed_competitors(session)
+    sources = [(visuar_id, catalog("v", 3), True), (gg_id, catalog("g", 3), False)]
+
+    assert len(engine._sync_bulk(session, sources)) == 6
+    session.commit()
+    session.query(LatestPrice).update({LatestPrice.last_seen_at: None})
+    session.commit()
+
+    # Same prices again: no new history, every listing heartbeated
+    assert engine._sync_bulk(session, sources) == set()
+    session.commit()
+    assert session.query(PriceLog).count() == 6
+    assert session.query(LatestPrice).filter(LatestPrice.last_seen_at.is_(None)).count() == 0
+
+    # One repriced item per path: only those get a PriceLog
+    gg = catalog("g", 3)
+    gg[1]["price"] += 50
+    changed = engine._sync_bulk(session, [(gg_id, gg, False)])
+    visuar = catalog("v", 3)
+    visuar[2]["price"] -= 10
+    changed |= engine._sync_rows(session, [(visuar_id, visuar, True)])
+    session.commit()
+
+    assert session.query(PriceLog).count() == 8
+    logged = {cp.name for cp in session.query(CompetitorProduct).filter(CompetitorProduct.id.in_(changed))}
+    assert logged == {gg[1]["name"], visuar[2]["name"]}
+    assert sorted(lp.price for lp in session.query(LatestPrice)) == [992.0, 1000.0, 1000.0, 1001.0, 1002.0, 1051.0]
+    session.close()
+
+
+def test_bulk_sync_concurrent_insert_leaves_no_orphans(monkeypatch):
+    engine = make_engine(monkeypatch)
+    session = engine.Session()
+    visuar_id, _ = seed_competitors(session)
+    items = catalog("v", 2)
+
+    # Another run inserted (and mapped) the first listing after this run loaded its keys
+    engine._sync_bulk(session, [(visuar_id, items[:1], True)])
+    session.commit()
+    load = engine._load_competitor_products
+    calls = []
+
+    def stale_first_load(sess, ids):
+        calls.append(ids)
+        return {} if len(calls) == 1 else load(sess, ids)
+
+    monkeypatch.setattr(engine, "_load_competitor_products", stale_first_load)
+    engine._sync_bulk(session, [(visuar_id, items, True)])
+    session.commit()
+
+    assert session.query(CompetitorProduct).count() == 2
+    # Only the listing this run inserted got a new canonical product; none is left unreferenced
+    assert session.query(Product).count() == 2
+    linked = {cp.product_id for cp in session.query(CompetitorProduct)}
+    assert linked == {p.id for p in session.query(Product)}
+    session.close()
+
+
+
+def test_baseline_sqlite_database_is_upgraded_and_syncs(monkeypatch, tmp_path):
+    path = tmp_path / "market_intel.db"
+    with sqlite3.connect(path) as conn:
+        conn.executescript(BASELINE_SCHEMA)
+        conn.execute("INSERT INTO competitors (id, name, url) VALUES (1, 'Visuar', 'https://www.visuar.com.py/')")
+        # The same listing twice (possible without the key), each with its own history
+        conn.executemany("INSERT INTO competitor_products (id, competitor_id, name) VALUES (?, 1, ?)",
+                         [(1, "v Aire Samsung 0 12000 BTU Inverter"), (2, "v Aire Samsung 0 12000 BTU Inverter")])
+        conn.executemany("INSERT INTO price_logs (competitor_product_id, price, is_in_stock, scraped_at) "
+                         "VALUES (?, ?, 1, '2024-01-01 00:00:00')", [(1, 900.0), (2, 950.0)])
+    monkeypatch.setattr(scraper, "DATABASE_URL", f"sqlite:///{path}")
+    engine = scraper.MarketIntelligenceEngine()
+
+    session = engine.Session()
+    assert [(pl.competitor_product_id, pl.price) for pl in session.query(PriceLog).order_by(PriceLog.id)] == [
+        (1, 900.0), (1, 950.0)]
+    assert [(lp.competitor_product_id, lp.price) for lp in session.query(LatestPrice)] == [(1, 950.0)]
+
+    engine._sync_bulk(session, [(1, catalog("v", 2), True)])
+    session.commit()
+    assert session.query(CompetitorProduct).count() == 2
+    assert sorted(lp.price for lp in session.query(LatestPrice)) == [1000.0, 1001.0]
+    session.close()
+    # Upgrading again changes nothing
+    assert scraper.upgrade_sqlite_schema(engine.engine) == []
+
+
+
+def test_baseline_sqlite_database_backfills_latest_prices(monkeypatch, tmp_path):
+    path = tmp_path / "market_intel.db"
+    with sqlite3.connect(path) as conn:
+        conn.executescript(BASELINE_SCHEMA)
+        conn.execute("INSERT INTO competitors (id, name, url) VALUES (1, 'Visuar', 'https://www.visuar.com.py/')")
+        conn.executemany("INSERT INTO competitor_products (id, competitor_id, name) VALUES (?, 1, ?)",
+                         [(1, "v Aire 1"), (2, "v Aire 2"), (3, "v Aire 3")])
+        conn.executemany("INSERT INTO price_logs (competitor_product_id, price, is_in_stock, scraped_at) "
+                         "VALUES (?, ?, ?, ?)", [(1, 900.0, 1, "2024-01-01 00:00:00"),
+                                                 (2, 500.0, 1, "2024-01-01 00:00:00"),
+                                                 (1, 880.0, 0, "2024-01-02 00:00:00")])
+    monkeypatch.setattr(scraper, "DATABASE_URL", f"sqlite:///{path}")
+    engine = scraper.MarketIntelligenceEngine()
+
+    session = engine.Session()
+    latest = session.query(LatestPrice).order_by(LatestPrice.competitor_product_id).all()
+    assert [(lp.competitor_product_id, lp.price_log_id, lp.price, lp.is_in_stock) for lp in latest] == [
+        (1, 3, 880.0, False), (2, 2, 500.0, True)]
+    assert latest[0].last_seen_at == latest[0].scraped_at
+    session.close()
+    # Only an empty table is filled: later runs leave it to the ingest path
+    assert scraper.upgrade_sqlite_schema(engine.engine) == []
+
+
+if __name__ == "__main__":
+    import pytest
+    pytest.main([__file__, "-v"])
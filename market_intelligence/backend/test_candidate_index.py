@@ -0,0 +1,69 @@
+"""
+Unit tests for candidate_index.py
+
+Covers blocking (BTU / brand), model-code postings, pre-ranking and the
+top-K cap on the candidate list sent to the AI matcher.
+
+Usage:
+    pytest test_candidate_index.py -v
+"""
+import os
+import sys
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from candidate_index import CandidateIndex, detect_product_type, model_codes
+
+
+def product(pid, name, brand, btu, inverter=True):
+    return SimpleNamespace(id=pid, name=name, brand=brand, capacity_btu=btu, is_inverter=inverter, description=None)
+
+
+def competitor(name, brand=None, btu=None, inverter=True, sku=None):
+    return SimpleNamespace(name=name, raw_brand=brand, capacity_btu=btu, is_inverter=inverter, sku=sku)
+
+
+CATALOG = [
+    product(1, "Aire Split Samsung AR12BSHQ 12000 BTU Inverter", "Samsung", 12000),
+    product(2, "Aire Split LG Dualcool 12000 BTU Inverter", "LG", 12000),
+    product(3, "Aire Cassette Midea 12000 BTU", "Midea", 12000, inverter=False),
+    product(4, "Aire Split Samsung WindFree 18000 BTU Inverter", "Samsung", 18000),
+    product(5, "Aire Portátil Tokyo 9000 BTU", "Tokyo", 9000, inverter=False),
+]
+
+
+def test_detect_product_type():
+    assert detect_product_type("Aire Portátil Tokyo") == "portatil"
+    assert detect_product_type("Aire Piso/Techo Carrier") == "piso_techo"
+    assert detect_product_type("Split Pared Midea") == "split"
+    assert detect_product_type("Acondicionador Midea") is None
+
+
+def test_model_codes_ignore_plain_capacities():
+    assert model_codes("Samsung AR12BSHQ 12000BTU 12k") == {"ar12bshq"}
+    assert model_codes("Midea MSAFC-12CRN8") == {"msafc12crn8"}
+
+
+def test_btu_block_ranks_same_brand_first():
+    index = CandidateIndex(CATALOG)
+    result = index.candidates(competitor("Acondicionador Samsung 12000 BTU Inverter", brand="SAMSUNG", btu=12000))
+    assert [p.id for p in result] == [1, 2, 3]
+
+
+def test_no_btu_uses_brand_block_not_whole_catalog():
+    index = CandidateIndex(CATALOG)
+    result = index.candidates(competitor("Aire Samsung Inverter", brand="Samsung"))
+    assert {p.id for p in result} == {1, 4}
+
+
+def test_model_code_posting_crosses_btu_block():
+    index = CandidateIndex(CATALOG)
+    # BTU parsed wrongly, but the model code still pulls in the right product
+    result = index.candidates(competitor("Samsung AR12BSHQ", brand="Samsung", btu=18000))
+    assert result[0].id == 1
+
+
+def test_top_k_caps_candidates():
+    index = CandidateIndex(CATALOG)
+    assert len(index.candidates(competitor("Aire acondicionado"), k=2)) == 2
@@ -0,0 +1,105 @@
+"""
+Test suite for the streaming price history export (/api/export/price_history).
+Covers NDJSON and CSV output and their value types, time range / competitor
+filters, chunked streaming and input validation.
+
+Usage:
+    pytest test_export.py -v
+"""
+import csv
+import io
+import json
+import os
+import sys
+from datetime import datetime
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from models import Base, Competitor, CompetitorProduct, PriceLog
+
+
+def make_client(monkeypatch, chunk_size=3):
+    import api_server
+
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    session.add_all([Competitor(id=1, name="Visuar", url="https://v.test"),
+                     Competitor(id=2, name="Gonzalez Gimenez", url="https://gg.test")])
+    session.add_all([CompetitorProduct(id=1, competitor_id=1, name="Aire Samsung 12000 BTU", sku="V1"),
+                     CompetitorProduct(id=2, competitor_id=2, name="Aire LG 9000 BTU, \"Dual\"", sku="G1")])
+    for day in range(1, 11):
+        session.add(PriceLog(competitor_product_id=1 + day % 2, price=1000.0 + day, is_in_stock=True,
+                             scraped_at=datetime(2024, 1, day)))
+    session.commit()
+    session.close()
+
+    monkeypatch.setattr(api_server, "engine", engine)
+    monkeypatch.setattr(api_server, "EXPORT_CHUNK_SIZE", chunk_size)
+    return api_server.app.test_client()
+
+
+def test_ndjson_export_streams_all_rows(monkeypatch):
+    client = make_client(monkeypatch)
+
+    response = client.get("/api/export/price_history")
+    assert response.status_code == 200
+    assert response.mimetype == "application/x-ndjson"
+    assert response.is_streamed
+
+    rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [r["price_log_id"] for r in rows] == list(range(1, 11))
+    assert rows[0]["competitor"] == "Gonzalez Gimenez" and rows[1]["competitor"] == "Visuar"
+    # Native JSON types and ISO 8601 timestamps, as in the CSV
+    assert rows[0]["scraped_at"] == "2024-01-01T00:00:00"
+    assert rows[0]["price"] == 1001.0 and rows[0]["is_in_stock"] is True
+
+
+def test_export_values_are_normalized():
+    import api_server
+
+    # PostgreSQL DECIMAL prices come back as Decimal; they are exported as numbers
+    assert api_server._export_value(Decimal("2500000.00")) == 2500000.0
+    assert api_server._export_value(datetime(2024, 1, 2, 6, 30)) == "2024-01-02T06:30:00"
+    assert api_server._export_value(None) is None
+
+
+def test_export_is_chunked(monkeypatch):
+    import api_server
+
+    make_client(monkeypatch, chunk_size=3)
+
+    chunks = list(api_server._stream_price_history([], {}, "ndjson"))
+    assert [len(chunk.splitlines()) for chunk in chunks] == [3, 3, 3, 1]
+
+
+def test_csv_export_with_filters(monkeypatch):
+    client = make_client(monkeypatch)
+
+    response = client.get("/api/export/price_history?format=csv&since=2024-01-03&until=2024-01-09"
+                          "&competitor=gonzalez gimenez")
+    assert response.mimetype == "text/csv"
+
+    rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+    assert [r["price_log_id"] for r in rows] == ["3", "5", "7"]
+    assert rows[0]["product_name"] == "Aire LG 9000 BTU, \"Dual\""
+    assert rows[0]["scraped_at"].startswith("2024-01-03")
+
+
+def test_competitor_filter_accepts_ids(monkeypatch):
+    client = make_client(monkeypatch)
+
+    lines = client.get("/api/export/price_history?competitor=1").get_data(as_text=True).splitlines()
+    assert len(lines) == 5
+    assert all(json.loads(line)["competitor_id"] == 1 for line in lines)
+
+
+def test_export_rejects_bad_input(monkeypatch):
+    client = make_client(monkeypatch)
+
+    assert client.get("/api/export/price_history?format=xml").status_code == 400
+    assert client.get("/api/export/price_history?since=yesterday").status_code == 400
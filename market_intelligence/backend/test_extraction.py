@@ -0,0 +1,115 @@
+"""
+Test suite for extraction.py and the scraper's listing parsers.
+Covers:
+  1. Shared price/text/URL parsing
+  2. Each listing is read with a single page.evaluate round trip
+  3. Raw card values map to the same items the per-element parsers produced
+
+Usage:
+    pytest test_extraction.py -v
+"""
+import asyncio
+import os
+import sys
+
+os.environ.setdefault("NVIDIA_API_KEY", "test_key")
+sys.path.insert(0, os.path.dirname(__file__))
+
+import scraper
+from extraction import (
+    BRISTOL_LISTING, DETAIL_PAGE, GG_LISTING, VISUAR_LISTING, absolute_url, clean_text, parse_number, parse_price,
+)
+
+
+class FakePage:
+    """Answers page.evaluate with canned cards per spec and counts the round trips."""
+
+    def __init__(self, cards_by_spec):
+        self.cards_by_spec = cards_by_spec
+        self.calls = 0
+
+    async def evaluate(self, script, spec):
+        self.calls += 1
+        cards = self.cards_by_spec[id(spec)]
+        return [{name: card.get(name) for name in spec["fields"]} for card in cards]
+
+
+def make_engine(monkeypatch):
+    monkeypatch.setattr(scraper, "DATABASE_URL", "sqlite://")
+    return scraper.MarketIntelligenceEngine()
+
+
+def test_shared_parsing():
+    assert parse_price("Gs. 5.989.000") == 5989000.0
+    assert parse_price("18 x Gs. 615.000", after="Gs.") == 615000.0
+    assert parse_price("₲ 1.250.000") == 1250000.0
+    assert parse_price("Consultar") == 0.0 and parse_price(None) == 0.0
+    assert parse_number("2599000.00") == 2599000.0 and parse_number("n/a") == 0.0
+    assert clean_text("  Samsung \n") == "Samsung" and clean_text("   ") is None
+    assert absolute_url("/aire-1.html", "https://www.visuar.com.py") == "https://www.visuar.com.py/aire-1.html"
+    assert absolute_url("https://x.test/a", "https://www.visuar.com.py") == "https://x.test/a"
+
+
+def test_visuar_listing_single_roundtrip(monkeypatch):
+    engine = make_engine(monkeypatch)
+    page = FakePage({id(VISUAR_LISTING): [
+        {"link": "/aire-samsung.html", "title": " Aire Samsung 12000 BTU Inverter\n", "price_content": "2599000",
+         "price_text": "Gs. 2.599.000", "sku": " AR12 ", "brand": "Samsung"},
+        {"link": "https://www.visuar.com.py/lg.html", "title": "Aire LG 9000 BTU", "price_text": "Gs. 1.999.000"},
+        {"link": None, "title": "Placeholder", "price_content": "1"},
+        {"link": "/sin-precio.html", "title": "Aire sin precio", "price_text": "Consultar"},
+    ]})
+
+    items = asyncio.run(engine._scraped_results_visuar(page))
+
+    assert page.calls == 1
+    assert items == [
+        {"name": "Aire Samsung 12000 BTU Inverter", "price": 2599000.0,
+         "url": "https://www.visuar.com.py/aire-samsung.html", "sku": "AR12", "brand": "Samsung"},
+        {"name": "Aire LG 9000 BTU", "price": 1999000.0, "url": "https://www.visuar.com.py/lg.html",
+         "sku": None, "brand": None},
+    ]
+
+
+def test_gg_and_bristol_listings(monkeypatch):
+    engine = make_engine(monkeypatch)
+    page = FakePage({
+        id(GG_LISTING): [
+            {"title": "Acondicionador de Aire TOKYO 12000 BTU", "url": "https://gg.test/1",
+             "price_text": "18 x Gs. 615.000"},
+            {"title": "Acondicionador de Aire Split Kaiser 9000", "url": "https://gg.test/2", "price_text": "Gs. 2.100.000"},
+            {"title": None, "price_text": "Gs. 1"},
+        ],
+        id(BRISTOL_LISTING): [{"title": "Aire Midea 12000", "url": None, "price_text": "GS. 3.100.000"}],
+    })
+
+    gg = asyncio.run(engine._scraped_results_gg(page))
+    bristol = asyncio.run(engine._scraped_results_bristol(page))
+
+    assert page.calls == 2
+    assert [(i["name"], i["price"], i["brand"]) for i in gg] == [
+        ("Acondicionador de Aire TOKYO 12000 BTU", 615000.0, "TOKYO"),
+        ("Acondicionador de Aire Split Kaiser 9000", 2100000.0, "KAISER"),
+    ]
+    assert bristol == [{"name": "Aire Midea 12000", "price": 3100000.0, "url": None}]
+
+
+def test_deep_scrape_detail_page(monkeypatch):
+    engine = make_engine(monkeypatch)
+
+    class DetailPage(FakePage):
+        async def goto(self, url, **kwargs):
+            pass
+
+        async def wait_for_selector(self, selector, **kwargs):
+            pass
+
+    class Row:
+        id, url, sku = 7, "https://www.visuar.com.py/aire.html", None
+
+    page = DetailPage({id(DETAIL_PAGE): [{"description": "  Split 12000 BTU, gas R410  ", "sku": "AR12 "}]})
+    assert asyncio.run(engine._deep_scrape_item(page, Row)) == {
+        "id": 7, "description": "Split 12000 BTU, gas R410", "sku": "AR12"}
+
+    page = DetailPage({id(DETAIL_PAGE): [{"description": None, "sku": None}]})
+    assert asyncio.run(engine._deep_scrape_item(page, Row)) is None
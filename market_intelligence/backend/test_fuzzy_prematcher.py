@@ -0,0 +1,122 @@
+"""
+Unit tests for fuzzy_prematcher.py
+
+Covers BTU blocking, the auto-accept gate in front of the AI matcher (ties
+and near-ties go to the LLM) and the fuzzy fallback used when the API gives
+no answer.
+
+Usage:
+    pytest test_fuzzy_prematcher.py -v
+"""
+import os
+import sys
+import uuid
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from fuzzy_prematcher import best_fuzzy_matches, run_fuzzy_prematching
+
+
+def _session():
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from models import Base, Competitor, Product
+
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    session.add(Competitor(id=1, name="Gonzalez Gimenez", url="https://gg.test"))
+    session.add_all([
+        Product(id=uuid.uuid4(), name="Aire Split Samsung 12000 BTU Inverter", brand="Samsung",
+                capacity_btu=12000, is_inverter=True),
+        Product(id=uuid.uuid4(), name="Aire Split Samsung 18000 BTU Inverter", brand="Samsung",
+                capacity_btu=18000, is_inverter=True),
+    ])
+    session.commit()
+    return session
+
+
+def _competitor(session, cp_id, name, brand, btu, inverter=True):
+    from models import CompetitorProduct
+
+    cp = CompetitorProduct(id=cp_id, competitor_id=1, name=name, raw_brand=brand,
+                           capacity_btu=btu, is_inverter=inverter)
+    session.add(cp)
+    session.commit()
+    return cp
+
+
+def test_best_fuzzy_matches_blocks_by_btu():
+    products = [
+        SimpleNamespace(id="a", name="Samsung Split 12000 BTU", capacity_btu=12000),
+        SimpleNamespace(id="b", name="Samsung Split 18000 BTU", capacity_btu=18000),
+    ]
+    cps = [
+        SimpleNamespace(id=1, name="Samsung Split 18000 BTU", capacity_btu=18000),
+        SimpleNamespace(id=2, name="Samsung Split", capacity_btu=None),
+        SimpleNamespace(id=3, name="Samsung Split 24000 BTU", capacity_btu=24000),
+    ]
+
+    best = best_fuzzy_matches(cps, products)
+
+    assert best[1][0].id == "b" and best[1][1] == 100
+    assert 2 in best  # no BTU: scored against the whole catalog
+    assert 3 not in best  # no canonical product with that BTU
+
+
+def test_auto_accepts_only_unambiguous_pairs():
+    from models import PendingMapping
+
+    session = _session()
+    exact = _competitor(session, 1, "Aire Split Samsung 12000 BTU Inverter", "Samsung", 12000)
+    other_brand = _competitor(session, 2, "Aire Split Samsung 12000 BTU Inverter Blanco", "LG", 12000)
+    no_inverter = _competitor(session, 3, "Aire Split Samsung 18000 BTU Inverter", "Samsung", 18000, inverter=False)
+
+    ambiguous, suggestions = run_fuzzy_prematching(session, [exact, other_brand, no_inverter])
+
+    assert ambiguous == [other_brand, no_inverter]
+    assert exact.product_id == suggestions[1][0].id
+    assert session.query(PendingMapping).filter_by(competitor_product_id=1).one().match_score == 100
+    session.close()
+
+
+def test_tied_candidates_are_not_auto_accepted():
+    from models import Product
+
+    session = _session()
+    # Two 12000 BTU Samsung models: a generic title's tokens are a subset of both
+    session.add(Product(id=uuid.uuid4(), name="Aire Split Samsung 12000 BTU Inverter WindFree", brand="Samsung",
+                        capacity_btu=12000, is_inverter=True))
+    session.commit()
+    generic = _competitor(session, 1, "Samsung 12000 BTU Inverter", "Samsung", 12000)
+
+    ambiguous, suggestions = run_fuzzy_prematching(session, [generic])
+
+    assert suggestions[1][1] == 100  # still suggested with its score...
+    assert ambiguous == [generic] and generic.product_id is None  # ...but left to the LLM
+    session.close()
+
+
+def test_run_ai_matching_uses_fuzzy_fallback(monkeypatch):
+    import ai_matcher
+    from models import PendingMapping
+
+    session = _session()
+    _competitor(session, 1, "Aire Split Samsung 12000 BTU Inverter", "Samsung", 12000)
+    _competitor(session, 2, "Split Samsung 12000 Inverter Frio", "Samsung", 12000)
+    calls = []
+
+    def no_answer(prompt, client=None, rate_limiter=None):
+        calls.append(prompt)
+        return None
+
+    monkeypatch.setattr(ai_matcher, "_call_deepseek", no_answer)
+    monkeypatch.setattr(ai_matcher, "AI_CACHE_ENABLED", False)
+
+    ai_matcher.run_ai_matching(session, workers=1, batch_size=1)
+
+    assert len(calls) == 1  # the exact pair never reached the LLM
+    fallback = session.query(PendingMapping).filter_by(competitor_product_id=2).one()
+    assert fallback.match_score <= 89  # capped: always left for human review
+    session.close()
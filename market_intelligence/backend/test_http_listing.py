@@ -0,0 +1,201 @@
+"""
+Test suite for http_listing.py and the scraper's HTTP-first Visuar fetch.
+
+A local HTTP server plays Visuar from the saved PrestaShop listing in
+fixtures/visuar_listing.json.
+Covers:
+  1. JSON listing parsing (prices, regular prices, references, brands)
+  2. Validation failures: too few items, partial listing, HTML, HTTP errors
+  3. _scrape_source uses HTTP without a browser, and falls back when it fails
+  4. The per-source timeout bounds the HTTP fetch as well as the browser
+
+Usage:
+    pytest test_http_listing.py -v
+"""
+import asyncio
+import json
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+os.environ.setdefault("NVIDIA_API_KEY", "test_key")
+sys.path.insert(0, os.path.dirname(__file__))
+
+import scraper
+from browser_pool import BrowserPool
+from http_listing import ListingFetchError, fetch_prestashop_listing, http_client
+from models import Competitor, ScrapeLog
+
+FIXTURE = os.path.join(os.path.dirname(__file__), "fixtures", "visuar_listing.json")
+BASE = "https://www.visuar.com.py"
+
+
+class VisuarHandler(BaseHTTPRequestHandler):
+    requests = []
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        VisuarHandler.requests.append((url.path, parse_qs(url.query, keep_blank_values=True), dict(self.headers)))
+        with open(FIXTURE, encoding="utf-8") as f:
+            payload = json.load(f)
+        xhr = self.headers.get("X-Requested-With") == "XMLHttpRequest"
+
+        if url.path == "/error/":
+            self._send(503, "text/plain", b"maintenance")
+        elif url.path == "/html/" or not xhr:
+            self._send(200, "text/html", b"<html><body><article class='js-product-miniature'></article></body></html>")
+        else:
+            if url.path == "/partial/":
+                payload["pagination"]["total_items"] = 73
+            self._send(200, "application/json", json.dumps(payload).encode("utf-8"))
+
+    def _send(self, status, content_type, body):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope="module")
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), VisuarHandler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+
+
+def fetch(url, min_items=10):
+    async def run():
+        async with http_client("test-agent") as client:
+            return await fetch_prestashop_listing(client, url, BASE, min_items=min_items)
+    return asyncio.run(run())
+
+
+def test_fetch_parses_prestashop_json(server):
+    VisuarHandler.requests.clear()
+    items, metrics = fetch(server + "/hogar/aires-acondicionados/")
+
+    # The "Consultar" product (no price) is dropped like in the browser path
+    assert len(items) == 11
+    assert items[0] == {
+        "name": "Aire Acondicionado Samsung 12000 BTU Inverter WindFree", "price": 5989000.0, "regular_price": None,
+        "url": "https://www.visuar.com.py/hogar/aires-acondicionados/5101-aire-acondicionado-samsung-12000-btu-inverter-windfree.html",
+        "sku": "AR12BSEAMWKX", "brand": "Samsung"}
+    assert items[1]["regular_price"] == 7990000.0
+    assert metrics["fetch"] == "http" and metrics["bytes_transferred"] > 1000
+
+    path, query, headers = VisuarHandler.requests[-1]
+    assert query == {"resultsPerPage": ["9999999"], "from-xhr": [""]}
+    assert headers["User-Agent"] == "test-agent"
+
+
+@pytest.mark.parametrize("path, min_items, reason", [
+    ("/hogar/aires-acondicionados/", 20, "only 11 usable products"),
+    ("/partial/", 10, "partial listing"),
+    ("/html/", 10, "not JSON"),
+    ("/error/", 10, "request failed"),
+])
+def test_fetch_validation_failures(server, path, min_items, reason):
+    with pytest.raises(ListingFetchError, match=reason):
+        fetch(server + path, min_items=min_items)
+
+
+class FakePage:
+    async def close(self):
+        pass
+
+
+class FakeContext:
+    async def new_page(self):
+        return FakePage()
+
+    async def route(self, pattern, handler):
+        pass
+
+    def on(self, event, handler):
+        pass
+
+    async def close(self):
+        pass
+
+
+class FakeBrowser:
+    async def new_context(self, **kwargs):
+        return FakeContext()
+
+    def is_connected(self):
+        return True
+
+    async def close(self):
+        pass
+
+
+def test_scrape_source_http_first_with_browser_fallback(server, monkeypatch):
+    monkeypatch.setattr(scraper, "DATABASE_URL", "sqlite://")
+    engine = scraper.MarketIntelligenceEngine()
+    session = engine.Session()
+    session.add(Competitor(name="Visuar", url=BASE))
+    session.commit()
+    visits = []
+
+    async def visit(page):
+        visits.append(page)
+        return [{"name": "Aire desde el navegador", "price": 1.0}]
+
+    async def launch():
+        return FakeBrowser()
+
+    def scrape(url):
+        monkeypatch.setattr(scraper, "VISUAR_LISTING_URL", url)
+
+        async def run():
+            async with BrowserPool(launcher=launch) as pool, http_client("test-agent") as client:
+                data = await engine._scrape_source(pool, asyncio.Semaphore(1), session, "Visuar", "SOURCE_A", visit,
+                                                   fetch=lambda: engine._fetch_visuar(client))
+                return data, pool.stats()["launches"]
+        return asyncio.run(run())
+
+    data, launches = scrape(server + "/hogar/aires-acondicionados/")
+    assert (len(data), launches, visits) == (11, 0, [])
+    assert set(data[0]) == {"name", "price", "url", "sku", "brand"}
+
+    data, launches = scrape(server + "/partial/")
+    assert (data, launches, len(visits)) == ([{"name": "Aire desde el navegador", "price": 1.0}], 1, 1)
+    session.commit()
+
+    first, second = session.query(ScrapeLog).order_by(ScrapeLog.id).all()
+    assert first.status == second.status == "success"
+    assert first.metrics["fetch"] == "http" and first.fingerprint
+    assert second.metrics["fetch"] == "browser" and "partial listing" in second.metrics["http_fallback"]
+    session.close()
+
+
+def test_scrape_source_timeout_covers_http_fetch(monkeypatch):
+    monkeypatch.setattr(scraper, "DATABASE_URL", "sqlite://")
+    monkeypatch.setattr(scraper, "SCRAPE_SOURCE_TIMEOUT", 0.1)
+    engine = scraper.MarketIntelligenceEngine()
+    session = engine.Session()
+
+    async def hanging_fetch():
+        await asyncio.sleep(5)
+
+    async def visit(page):
+        raise AssertionError("the browser must not run once the budget is spent")
+
+    async def run():
+        async with BrowserPool(launcher=None) as pool:
+            return await engine._scrape_source(pool, asyncio.Semaphore(1), session, "Visuar", "SOURCE_A", visit,
+                                               fetch=hanging_fetch)
+
+    assert asyncio.run(run()) == []
+    log = engine.scrape_logs["Visuar"]
+    assert log.status == "failed" and log.error_message == "Timed out after 0.1s"
+    session.close()
@@ -0,0 +1,165 @@
+"""
+Test suite for infinite_scroll.py and the GG XHR listing path in scraper.py.
+Covers:
+  1. Card fragments from HTML/JSON bodies, page/offset parameter stepping
+  2. GG pages requested directly once the first scroll answer is seen
+  3. Scroll-answer mode for non-paginated endpoints, DOM fallback when none
+
+Usage:
+    pytest test_infinite_scroll.py -v
+"""
+import asyncio
+import json
+import os
+import sys
+
+os.environ.setdefault("NVIDIA_API_KEY", "test_key")
+sys.path.insert(0, os.path.dirname(__file__))
+
+import infinite_scroll
+import scraper
+from infinite_scroll import html_fragments, page_param, with_param
+
+BASE = "https://www.gonzalezgimenez.com.py"
+
+
+def card(n):
+    return {"title": f"Acondicionador de Aire TOKYO {n} BTU", "url": f"{BASE}/producto/{n}",
+            "price_text": f"Gs. {n}.000"}
+
+
+def fragment(*ns):
+    """Stand-in for an HTML answer: FakePage 'parses' it back into cards."""
+    return "<div class='product item-catalogo'>" + json.dumps([card(n) for n in ns]) + "</div>"
+
+
+class FakeRequest:
+    def __init__(self, method="GET", resource_type="xhr"):
+        self.method = method
+        self.resource_type = resource_type
+
+
+class FakeResponse:
+    def __init__(self, url, body, method="GET", resource_type="xhr", status=200):
+        self.url = url
+        self.body = body
+        self.request = FakeRequest(method, resource_type)
+        self.ok = status < 400
+
+    async def text(self):
+        return self.body
+
+
+class FakeAPI:
+    def __init__(self, pages):
+        self.pages = pages
+        self.urls = []
+
+    async def get(self, url, headers=None):
+        self.urls.append(url)
+        return FakeResponse(url, self.pages.get(url, "<p>- Se llegó al final de la lista -</p>"))
+
+
+class FakeLocator:
+    async def is_visible(self):
+        return False
+
+
+class FakePage:
+    """The listing shows `dom` cards; each scroll emits the next of `scroll_answers`."""
+
+    url = BASE + "/categoria/127/acondicionadores-de-aire"
+
+    def __init__(self, dom, scroll_answers=(), api_pages=None):
+        self.dom = dom
+        self.scroll_answers = list(scroll_answers)
+        self.request = FakeAPI(api_pages or {})
+        self.listeners = []
+        self.scrolls = 0
+
+    def on(self, event, handler):
+        self.listeners.append(handler)
+
+    def remove_listener(self, event, handler):
+        self.listeners.remove(handler)
+
+    def get_by_text(self, text):
+        return FakeLocator()
+
+    async def evaluate(self, script, arg=None):
+        if arg is None:  # a scroll
+            self.scrolls += 1
+            if self.scroll_answers:
+                response = self.scroll_answers.pop(0)
+                for handler in list(self.listeners):
+                    handler(response)
+            return None
+        if arg.get("html"):
+            return json.loads(arg["html"].split(">", 1)[1].rsplit("<", 1)[0])
+        return [card(n) for n in self.dom]
+
+
+def make_engine(monkeypatch):
+    monkeypatch.setattr(scraper, "DATABASE_URL", "sqlite://")
+    monkeypatch.setattr(infinite_scroll, "INFINITE_SCROLL_TIMEOUT", 0.2)
+    return scraper.MarketIntelligenceEngine()
+
+
+def read_gg(engine, page):
+    async def run():
+        responses = infinite_scroll.ListingResponses(page, "gonzalezgimenez.com.py", scraper.GG_CARD_MARKER)
+        # Analytics XHRs and other hosts are ignored
+        for handler in page.listeners:
+            handler(FakeResponse(BASE + "/carrito/cantidad", '{"count": 0}'))
+            handler(FakeResponse("https://www.google-analytics.com/collect", fragment(999)))
+        try:
+            return await engine._gg_from_xhr(page, responses)
+        finally:
+            responses.close()
+    return asyncio.run(run())
+
+
+def test_fragments_and_page_params():
+    html = "<div class='product item-catalogo'>A</div>"
+    assert html_fragments(html, "item-catalogo") == [html]
+    assert html_fragments(json.dumps({"ok": 1, "data": {"html": html, "more": [html]}}), "item-catalogo") == [html, html]
+    assert html_fragments("<p>- Se llegó al final de la lista -</p>", "item-catalogo") == []
+
+    assert page_param(BASE + "/ajax/productos?categoria=127&pagina=2") == ("pagina", 2, False)
+    assert page_param(BASE + "/ajax/productos?categoria=127&offset=12") == ("offset", 12, True)
+    assert page_param(BASE + "/ajax/productos?categoria=127") is None
+    assert with_param(BASE + "/ajax?categoria=127&pagina=2", "pagina", 5) == BASE + "/ajax?categoria=127&pagina=5"
+
+
+def test_gg_pages_fetched_directly(monkeypatch):
+    engine = make_engine(monkeypatch)
+    endpoint = BASE + "/ajax/productos?categoria=127&offset={}"
+    page = FakePage(
+        dom=range(1, 4),
+        scroll_answers=[FakeResponse(endpoint.format(3), fragment(4, 5, 6))],
+        api_pages={endpoint.format(6): fragment(7, 8, 9), endpoint.format(9): json.dumps({"html": fragment(10)})},
+    )
+
+    items = read_gg(engine, page)
+
+    assert [item["price"] for item in items] == [n * 1000.0 for n in range(1, 11)]
+    assert items[0]["brand"] == "TOKYO"
+    # One scroll to discover the endpoint, then offsets stepped by the page size
+    assert page.scrolls == 1
+    assert page.request.urls == [endpoint.format(6), endpoint.format(9), endpoint.format(12)]
+    assert page.listeners == []
+
+
+def test_gg_scroll_answers_and_dom_fallback(monkeypatch):
+    engine = make_engine(monkeypatch)
+    # POST endpoint: cannot be replayed by offset, so each scroll waits for its answer
+    page = FakePage(dom=[1, 2], scroll_answers=[
+        FakeResponse(BASE + "/ajax/cargar-mas", fragment(3, 4), method="POST"),
+        FakeResponse(BASE + "/ajax/cargar-mas", fragment(5), method="POST"),
+        FakeResponse(BASE + "/ajax/cargar-mas", fragment(5), method="POST"),
+    ])
+    assert [item["price"] for item in read_gg(engine, page)] == [n * 1000.0 for n in range(1, 6)]
+    assert page.scrolls == 3 and page.request.urls == []
+
+    # No listing answer at all: the caller scrolls the DOM instead
+    assert read_gg(engine, FakePage(dom=[1, 2])) is None
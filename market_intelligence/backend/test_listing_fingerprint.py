@@ -0,0 +1,192 @@
+"""
+Test suite for listing fingerprints in scraper.py.
+Covers:
+  1. The fingerprint follows card text/prices and matches the last run
+  2. _scrape_source records 'unchanged' ScrapeLogs with the fingerprint
+  3. Unchanged sources skip sync, AI matching and alerts but keep a heartbeat
+  4. Existing SQLite databases gain the fingerprint/metrics columns; an unreadable fingerprint is not fatal
+
+Usage:
+    pytest test_listing_fingerprint.py -v
+"""
+import asyncio
+import os
+import sqlite3
+import sys
+from datetime import datetime, timedelta
+
+os.environ.setdefault("NVIDIA_API_KEY", "test_key")
+sys.path.insert(0, os.path.dirname(__file__))
+
+import scraper
+from browser_pool import BrowserPool
+from models import Competitor, CompetitorProduct, LatestPrice, PriceLog, ScrapeLog, upgrade_sqlite_schema
+
+
+class FakePage:
+    def __init__(self, cards):
+        self.cards = cards
+
+    async def eval_on_selector_all(self, selector, script):
+        return list(self.cards)
+
+    async def close(self):
+        pass
+
+
+class FakeContext:
+    def __init__(self, page):
+        self.page = page
+
+    async def new_page(self):
+        return self.page
+
+    async def route(self, pattern, handler):
+        pass
+
+    def on(self, event, handler):
+        pass
+
+    async def close(self):
+        pass
+
+
+class FakeBrowser:
+    def __init__(self, page):
+        self.page = page
+
+    async def new_context(self, **kwargs):
+        return FakeContext(self.page)
+
+    def is_connected(self):
+        return True
+
+    async def close(self):
+        pass
+
+
+def make_engine(monkeypatch):
+    monkeypatch.setattr(scraper, "DATABASE_URL", "sqlite://")
+    return scraper.MarketIntelligenceEngine()
+
+
+def scrape(engine, session, page, name="Visuar"):
+    async def visit(p):
+        if await engine._listing_unchanged(p, name, ".js-product-miniature"):
+            return scraper.LISTING_UNCHANGED
+        return [{"name": card, "price": 1.0} for card in p.cards]
+
+    async def launch():
+        return FakeBrowser(page)
+
+    async def run():
+        async with BrowserPool(launcher=launch) as pool:
+            return await engine._scrape_source(pool, asyncio.Semaphore(1), session, name, "SOURCE_A", visit)
+
+    return asyncio.run(run())
+
+
+def test_fingerprint_tracks_card_content(monkeypatch):
+    engine = make_engine(monkeypatch)
+    cards = ["Aire Samsung 12000\x1f/p/1\x1f2500000", "Aire LG 9000\x1f/p/2\x1f1900000"]
+
+    assert asyncio.run(engine._listing_unchanged(FakePage(cards), "Visuar", ".card")) is False
+    first = engine.fingerprints["Visuar"]
+    engine.last_fingerprints["Visuar"] = (first, datetime(2024, 1, 1))
+    assert asyncio.run(engine._listing_unchanged(FakePage(cards), "Visuar", ".card")) is True
+
+    repriced = [cards[0], cards[1].replace("1900000", "1850000")]
+    assert asyncio.run(engine._listing_unchanged(FakePage(repriced), "Visuar", ".card")) is False
+    assert engine.fingerprints["Visuar"] != first
+
+    monkeypatch.setattr(scraper, "SKIP_UNCHANGED_LISTINGS", False)
+    assert asyncio.run(engine._listing_unchanged(FakePage(cards), "Visuar", ".card")) is False
+    # An empty listing is never treated as unchanged
+    assert asyncio.run(engine._listing_unchanged(FakePage([]), "Visuar", ".card")) is False
+
+
+def test_scrape_source_logs_unchanged(monkeypatch):
+    engine = make_engine(monkeypatch)
+    session = engine.Session()
+    session.add(Competitor(name="Visuar", url="https://www.visuar.com.py/"))
+    session.commit()
+    page = FakePage(["Aire Samsung 12000\x1f/p/1\x1f2500000"])
+
+    assert len(scrape(engine, session, page)) == 1
+    session.commit()
+    assert scrape(engine, session, page) is scraper.LISTING_UNCHANGED
+    session.commit()
+    page.cards.append("Aire LG 9000\x1f/p/2\x1f1900000")
+    assert len(scrape(engine, session, page)) == 2
+    session.commit()
+
+    logs = session.query(ScrapeLog).order_by(ScrapeLog.id).all()
+    assert [log.status for log in logs] == ["success", "unchanged", "success"]
+    assert logs[0].fingerprint == logs[1].fingerprint != logs[2].fingerprint
+    assert logs[1].products_scraped is None
+    session.close()
+
+
+def test_unchanged_source_skips_sync(monkeypatch):
+    engine = make_engine(monkeypatch)
+    calls = []
+    monkeypatch.setattr(scraper, "run_ai_matching", lambda session, **kwargs: calls.append("ai"))
+    import alert_engine
+    monkeypatch.setattr(alert_engine, "evaluate_alerts", lambda session, ids=None: calls.append("alerts"))
+
+    visuar = [{"name": "Aire Samsung 12000 BTU", "price": 2500000.0, "url": "https://v/1"}]
+    gg = [{"name": "Aire TCL 12000 BTU", "price": 2400000.0, "url": "https://g/1"}]
+    assert engine._sync_to_database(visuar, [], gg) is True
+    assert calls == ["ai", "alerts"]
+
+    session = engine.Session()
+    before = datetime.utcnow() - timedelta(hours=1)
+    session.query(LatestPrice).update({LatestPrice.last_seen_at: before})
+    session.commit()
+
+    # Both sources unchanged: nothing is synced, listings are heartbeated
+    calls.clear()
+    assert engine._sync_to_database(None, [], None, unchanged={"Visuar": before, "Gonzalez Gimenez": before}) is True
+    assert calls == []
+    assert session.query(PriceLog).count() == 2
+    session.expire_all()
+    assert all(lp.last_seen_at > before for lp in session.query(LatestPrice))
+
+    # Only GG changed: GG is synced, Visuar is left alone
+    gg[0]["price"] = 2300000.0
+    assert engine._sync_to_database(None, [], gg, unchanged={"Visuar": before}) is True
+    assert calls == ["ai", "alerts"]
+    logged = session.query(PriceLog).join(CompetitorProduct).filter(CompetitorProduct.name == gg[0]["name"]).count()
+    assert (session.query(PriceLog).count(), logged) == (3, 2)
+    session.close()
+
+
+def test_sqlite_database_gains_scrape_log_columns(monkeypatch, tmp_path):
+    path = tmp_path / "market_intel.db"
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE scrape_logs (id INTEGER PRIMARY KEY, competitor_id INTEGER, started_at DATETIME, "
+                     "finished_at DATETIME, status VARCHAR(20), products_scraped INTEGER, error_message TEXT)")
+    monkeypatch.setattr(scraper, "DATABASE_URL", f"sqlite:///{path}")
+    engine = scraper.MarketIntelligenceEngine()
+    with sqlite3.connect(path) as conn:
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(scrape_logs)")]
+    assert columns[-2:] == ["fingerprint", "metrics"]
+    assert upgrade_sqlite_schema(engine.engine) == []  # Already added at init; idempotent
+
+    session = engine.Session()
+    session.add(Competitor(name="Visuar", url="https://www.visuar.com.py/"))
+    session.commit()
+    page = FakePage(["Aire Samsung 12000\x1f/p/1\x1f2500000"])
+    assert len(scrape(engine, session, page)) == 1
+    session.commit()
+    assert scrape(engine, session, page) is scraper.LISTING_UNCHANGED
+    session.commit()
+
+    # A lookup that fails only costs the skip: the listing is processed in full
+    with engine.engine.begin() as conn:
+        conn.exec_driver_sql("ALTER TABLE scrape_logs DROP COLUMN fingerprint")
+    engine.last_fingerprints.clear()
+    assert len(scrape(engine, session, page)) == 1
+    assert "Visuar" not in engine.last_fingerprints
+    session.rollback()
+    session.close()
@@ -0,0 +1,136 @@
+"""
+Unit tests for price_archive.py
+
+Covers day-partitioned Parquet compaction, idempotent re-runs, pruning of
+the live table, the columnar reader filters and the history / export API
+reading pruned days back from the archive.
+
+Usage:
+    pytest test_price_archive.py -v
+"""
+import json
+import os
+import sys
+import uuid
+from datetime import date, datetime
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+pytest.importorskip("pyarrow")
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from latest_prices import refresh_latest_prices
+from models import Base, Competitor, CompetitorProduct, LatestPrice, PriceLog, Product
+from price_archive import archived_days, compact_price_logs, read_price_history
+
+TODAY = date(2024, 1, 4)
+
+
+@pytest.fixture
+def session():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    product = Product(id=uuid.uuid4(), name="Aire Samsung 12000 BTU", brand="Samsung")
+    session.add_all([Competitor(id=1, name="Visuar", url="https://v.test"),
+                     Competitor(id=2, name="Gonzalez Gimenez", url="https://gg.test"), product])
+    session.flush()
+    session.add_all([CompetitorProduct(id=1, competitor_id=1, name="v", product_id=product.id),
+                     CompetitorProduct(id=2, competitor_id=2, name="g", product_id=product.id),
+                     CompetitorProduct(id=3, competitor_id=2, name="g2")])
+    session.flush()
+    # Days 1-3 are closed, day 4 is "today"
+    for day in range(1, 5):
+        for cp_id in (1, 2, 3):
+            for hour in (6, 18):
+                session.add(PriceLog(competitor_product_id=cp_id, price=1000.0 * cp_id + day, is_in_stock=True,
+                                     scraped_at=datetime(2024, 1, day, hour)))
+    session.flush()
+    refresh_latest_prices(session, [pl.id for pl in session.query(PriceLog)])
+    session.commit()
+    session.product_id = product.id
+    yield session
+    session.close()
+
+
+def test_compaction_writes_closed_days_once(session, tmp_path):
+    stats = compact_price_logs(session, str(tmp_path), today=TODAY)
+
+    assert stats == {"days": 3, "rows": 18, "pruned": 0}
+    assert archived_days(str(tmp_path)) == [date(2024, 1, 1), date(2024, 1, 2), date(2024, 1, 3)]
+    assert sorted(os.listdir(tmp_path / "scraped_date=2024-01-02")) == ["_SUCCESS", "competitor_id=1", "competitor_id=2"]
+
+    # Re-running only picks up newly closed days
+    assert compact_price_logs(session, str(tmp_path), today=TODAY)["days"] == 0
+    assert compact_price_logs(session, str(tmp_path), today=date(2024, 1, 5))["days"] == 1
+
+
+def test_reader_filters_and_columns(session, tmp_path):
+    compact_price_logs(session, str(tmp_path), today=TODAY)
+
+    history = read_price_history(str(tmp_path), product_id=session.product_id,
+                                 start=datetime(2024, 1, 2), end=datetime(2024, 1, 3, 12))
+    assert list(history["price"]) == [1002.0, 2002.0, 1002.0, 2002.0, 1003.0, 2003.0]
+    assert str(history["scraped_at"].dtype).startswith("datetime64")
+
+    gg = read_price_history(str(tmp_path), competitor_id=2, columns=["competitor_product_id", "price"])
+    assert set(gg) == {"competitor_product_id", "price"}
+    assert set(gg["competitor_product_id"]) == {2, 3}
+    assert len(gg["price"]) == 12
+
+    frame = read_price_history(str(tmp_path), competitor_product_id=1, as_pandas=True)
+    assert list(frame.columns)[:2] == ["price_log_id", "competitor_product_id"]
+    assert len(frame) == 6
+
+    assert len(read_price_history(str(tmp_path / "missing"))["price"]) == 0
+
+
+def test_prune_keeps_referenced_rows(session, tmp_path):
+    # The newest log of listing 3 is on a closed day: latest_prices still points at it
+    session.query(PriceLog).filter(PriceLog.competitor_product_id == 3,
+                                   PriceLog.scraped_at >= datetime(2024, 1, 4)).delete()
+    session.query(LatestPrice).filter(LatestPrice.competitor_product_id == 3).delete()
+    refresh_latest_prices(session, [pl.id for pl in session.query(PriceLog)])
+    session.commit()
+
+    stats = compact_price_logs(session, str(tmp_path), today=TODAY, prune=True)
+
+    assert stats["rows"] == 18 and stats["pruned"] == 17
+    remaining = session.query(PriceLog).filter(PriceLog.scraped_at < datetime(2024, 1, 4)).all()
+    assert [(pl.competitor_product_id, pl.scraped_at) for pl in remaining] == [(3, datetime(2024, 1, 3, 18))]
+    # Everything is still readable from the archive
+    assert len(read_price_history(str(tmp_path))["price"]) == 18
+
+
+def test_pruned_days_stay_in_history_and_export(session, tmp_path, monkeypatch):
+    import api_server
+    import price_archive
+
+    monkeypatch.setattr(api_server, "engine", session.get_bind())
+    monkeypatch.setattr(price_archive, "ARCHIVE_DIR", str(tmp_path))
+    client = api_server.app.test_client()
+    url = f"/api/products/{session.product_id}/history?mode=raw"
+    before = client.get(url)
+    export_before = client.get("/api/export/price_history?competitor=visuar").get_data(as_text=True)
+
+    assert compact_price_logs(session, str(tmp_path), today=TODAY, prune=True)["pruned"] == 18
+
+    # Pruned days are read back from the archive; the ETag moves with the archive
+    after = client.get(url, headers={"If-None-Match": before.headers["ETag"]})
+    assert after.status_code == 200
+    assert after.get_json()["series"] == before.get_json()["series"]
+    assert [len(s["price"]) for s in after.get_json()["series"]] == [8, 8]
+    since = client.get(url + "&since=2024-01-02T12:00:00&competitor=2").get_json()["series"]
+    assert since[0]["t"][0] == "2024-01-02T12:00:00" and since[0]["price"][:2] == [2002.0, 2002.0]
+
+    export = client.get("/api/export/price_history?competitor=visuar").get_data(as_text=True)
+    rows = [json.loads(line) for line in export.splitlines()]
+    # Archived rows are exported exactly like the live rows they replace
+    assert rows == [json.loads(line) for line in export_before.splitlines()]
+    assert len(rows) == 8 and {r["competitor"] for r in rows} == {"Visuar"}
+    ranged = client.get("/api/export/price_history?format=csv&since=2024-01-03&until=2024-01-04T12:00:00")
+    assert len(ranged.get_data(as_text=True).splitlines()) == 1 + 6 + 3
@@ -0,0 +1,158 @@
+"""
+Test suite for price_history.py and /api/products/<id>/history.
+
+Covers LTTB point selection, daily min/max/last buckets, per-competitor
+series, change-point seeding and forward-fill, ETag revalidation and input
+validation.
+
+Usage:
+    pytest test_price_history.py -v
+"""
+import os
+import sys
+import uuid
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from latest_prices import refresh_latest_prices
+from models import Base, Competitor, CompetitorProduct, LatestPrice, PriceLog, Product
+from price_history import bucket_daily, lttb_indices
+
+PRODUCT_ID = uuid.UUID("8d6f1f0e-5f43-4c39-9a51-1b7d2f3c4a10")
+
+
+def test_lttb_keeps_endpoints_and_spikes():
+    x = list(range(1000))
+    y = [100.0] * 1000
+    y[250], y[700] = 500.0, 10.0
+
+    kept = lttb_indices(x, y, 20)
+
+    assert len(kept) == 20
+    assert kept[0] == 0 and kept[-1] == 999
+    assert 250 in kept and 700 in kept
+    assert list(kept) == sorted(kept)
+    # Short series are returned untouched
+    assert list(lttb_indices([1, 2, 3], [1, 2, 3], 20)) == [0, 1, 2]
+
+
+def test_daily_buckets_min_max_last():
+    times = [datetime(2024, 1, 1, h) for h in (0, 6, 12, 18)] + [datetime(2024, 1, 2, 6)]
+    prices = [100.0, 90.0, 120.0, 110.0, 95.0]
+
+    assert bucket_daily(times, prices) == {
+        "t": ["2024-01-01", "2024-01-02"],
+        "min": [90.0, 95.0],
+        "max": [120.0, 95.0],
+        "last": [110.0, 95.0],
+    }
+    # Days without a log carry the previous day's last price
+    assert bucket_daily([datetime(2024, 1, 1), datetime(2024, 1, 4)], [100.0, 80.0])["last"] == [100.0, 100.0, 100.0, 80.0]
+
+
+def make_client(monkeypatch):
+    import api_server
+
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    session.add_all([Competitor(id=1, name="Visuar", url="https://v.test"),
+                     Competitor(id=2, name="Gonzalez Gimenez", url="https://gg.test"),
+                     Product(id=PRODUCT_ID, name="Aire Samsung 12000 BTU", brand="Samsung")])
+    session.flush()
+    session.add_all([CompetitorProduct(id=1, competitor_id=1, name="v", product_id=PRODUCT_ID),
+                     CompetitorProduct(id=2, competitor_id=2, name="g", product_id=PRODUCT_ID),
+                     CompetitorProduct(id=3, competitor_id=2, name="other")])
+    start = datetime(2024, 1, 1)
+    for i in range(40):  # 10 days, 4 scrapes a day
+        for cp_id in (1, 2, 3):
+            session.add(PriceLog(competitor_product_id=cp_id, price=1000.0 + cp_id * 100 + i, is_in_stock=True,
+                                 scraped_at=start + timedelta(hours=6 * i)))
+    session.flush()
+    refresh_latest_prices(session, [pl.id for pl in session.query(PriceLog)])
+    session.commit()
+
+    monkeypatch.setattr(api_server, "engine", engine)
+    return api_server.app.test_client(), session
+
+
+def test_history_series_per_competitor(monkeypatch):
+    client, _ = make_client(monkeypatch)
+
+    body = client.get(f"/api/products/{PRODUCT_ID}/history").get_json()
+    assert body["mode"] == "daily"
+    assert [(s["competitor"], s["raw_points"], len(s["t"])) for s in body["series"]] == [
+        ("Visuar", 40, 10), ("Gonzalez Gimenez", 40, 10)]
+    gg = body["series"][1]
+    assert gg["t"][0] == "2024-01-01" and gg["min"][0] == 1200.0 and gg["last"][0] == 1203.0
+
+    body = client.get(f"/api/products/{PRODUCT_ID}/history?mode=lttb&points=12&competitor=visuar").get_json()
+    assert len(body["series"]) == 1 and len(body["series"][0]["price"]) == 12
+    assert body["series"][0]["t"][0] == "2024-01-01T00:00:00"
+
+    body = client.get(f"/api/products/{PRODUCT_ID}/history?mode=raw&since=2024-01-10").get_json()
+    assert [len(s["price"]) for s in body["series"]] == [4, 4]
+
+
+def test_history_etag_revalidation(monkeypatch):
+    client, session = make_client(monkeypatch)
+    url = f"/api/products/{PRODUCT_ID}/history?mode=lttb"
+
+    first = client.get(url)
+    etag = first.headers["ETag"]
+    assert first.status_code == 200 and etag
+
+    cached = client.get(url, headers={"If-None-Match": etag})
+    assert cached.status_code == 304 and cached.data == b""
+    assert client.get(url + "&points=50", headers={"If-None-Match": etag}).status_code == 200
+
+    # A new scrape for one of the product's listings changes the ETag
+    log = PriceLog(competitor_product_id=2, price=900.0, is_in_stock=True, scraped_at=datetime(2024, 1, 11))
+    session.add(log)
+    session.flush()
+    refresh_latest_prices(session, [log.id])
+    session.commit()
+    assert client.get(url, headers={"If-None-Match": etag}).status_code == 200
+
+
+def test_history_validation(monkeypatch):
+    client, _ = make_client(monkeypatch)
+
+    assert client.get("/api/products/not-a-uuid/history").status_code == 400
+    assert client.get(f"/api/products/{uuid.uuid4()}/history").status_code == 404
+    assert client.get(f"/api/products/{PRODUCT_ID}/history?mode=weekly").status_code == 400
+    assert client.get(f"/api/products/{PRODUCT_ID}/history?mode=lttb&points=2").status_code == 400
+    assert client.get(f"/api/products/{PRODUCT_ID}/history?since=yesterday").status_code == 400
+
+
+def test_change_points_cover_window(monkeypatch):
+    """INGEST_MODE=cdc logs only changes: series are seeded at since, carried to last_seen_at and forward-filled."""
+    client, session = make_client(monkeypatch)
+    session.add_all([Product(id=uuid.UUID(int=7), name="Heladera"),
+                     CompetitorProduct(id=4, competitor_id=1, name="heladera", product_id=uuid.UUID(int=7))])
+    session.flush()
+    logs = [PriceLog(competitor_product_id=4, price=price, is_in_stock=True, scraped_at=datetime(2024, 1, day, 8))
+            for day, price in ((1, 1000.0), (5, 900.0))]
+    session.add_all(logs)
+    session.flush()
+    refresh_latest_prices(session, [log.id for log in logs])
+    session.query(LatestPrice).filter_by(competitor_product_id=4).update({"last_seen_at": datetime(2024, 1, 8, 8)})
+    session.commit()
+
+    body = client.get("/api/products/00000000-0000-0000-0000-000000000007/history?since=2024-01-03").get_json()
+    series = body["series"][0]
+    assert series["t"] == [f"2024-01-0{d}" for d in range(3, 9)]
+    assert series["last"] == [1000.0, 1000.0, 900.0, 900.0, 900.0, 900.0]
+
+    body = client.get("/api/products/00000000-0000-0000-0000-000000000007/history"
+                      "?mode=raw&since=2024-01-03&until=2024-01-07").get_json()
+    assert body["series"][0]["t"] == ["2024-01-03T00:00:00", "2024-01-05T08:00:00", "2024-01-06T23:59:59.999999"]
+    assert body["series"][0]["price"] == [1000.0, 900.0, 900.0]
+
+    # A window after the listing was last seen has no series for it
+    body = client.get("/api/products/00000000-0000-0000-0000-000000000007/history?since=2024-02-01").get_json()
+    assert body["series"] == []
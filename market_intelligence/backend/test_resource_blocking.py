@@ -0,0 +1,97 @@
+"""
+Test suite for resource_blocking.py.
+Covers:
+  1. Which requests are aborted (resource types, trackers, per-site hosts)
+  2. Request/byte counters and the bytes-saved estimate
+
+Usage:
+    pytest test_resource_blocking.py -v
+"""
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from resource_blocking import TYPICAL_BYTES, RequestBlocker
+
+
+class FakeRequest:
+    def __init__(self, resource_type, url):
+        self.resource_type = resource_type
+        self.url = url
+
+
+class FakeRoute:
+    def __init__(self, resource_type, url):
+        self.request = FakeRequest(resource_type, url)
+        self.outcome = None
+
+    async def abort(self, error_code=None):
+        self.outcome = "aborted"
+
+    async def fallback(self):
+        self.outcome = "continued"
+
+
+class FakeResponse:
+    def __init__(self, length):
+        self.headers = {"content-length": length} if length is not None else {}
+
+
+class FakeContext:
+    def __init__(self):
+        self.handler = None
+        self.listeners = {}
+
+    async def route(self, pattern, handler):
+        self.handler = handler
+
+    def on(self, event, handler):
+        self.listeners[event] = handler
+
+
+def test_blocking_decisions():
+    blocker = RequestBlocker("Gonzalez Gimenez", block_types={"image", "font", "media"})
+
+    assert blocker.should_block("image", "https://www.gonzalezgimenez.com.py/img/aire.jpg")
+    assert blocker.should_block("font", "https://fonts.gstatic.com/s/roboto.woff2")
+    assert blocker.should_block("script", "https://www.googletagmanager.com/gtm.js?id=GTM-1")
+    assert blocker.should_block("xhr", "https://px.api.useinsider.com/v1/session")
+    assert blocker.should_block("script", "https://cdn.insider.com.tr/ins.js")
+    # First-party scripts/XHR and the document itself always load
+    assert not blocker.should_block("script", "https://www.gonzalezgimenez.com.py/js/app.js")
+    assert not blocker.should_block("xhr", "https://www.gonzalezgimenez.com.py/api/productos?page=2")
+    assert not blocker.should_block("document", "https://www.googletagmanager.com/ns.html")
+    # Host matching is by domain suffix, not substring
+    assert not blocker.should_block("script", "https://notgoogle-analytics.com.py/x.js")
+    # Site-specific hosts only apply to that site
+    assert not RequestBlocker("Visuar").should_block("script", "https://cdn.insider.com.tr/ins.js")
+
+
+def test_metrics_after_routing():
+    context = FakeContext()
+    blocker = asyncio.run(RequestBlocker("Visuar", block_types={"image", "font"}).attach(context))
+    requests = [
+        ("document", "https://www.visuar.com.py/hogar/aires-acondicionados/"),
+        ("image", "https://www.visuar.com.py/1-home_default/aire.jpg"),
+        ("image", "https://www.visuar.com.py/2-home_default/aire.jpg"),
+        ("font", "https://www.visuar.com.py/themes/font.woff2"),
+        ("script", "https://connect.facebook.net/en_US/fbevents.js"),
+        ("stylesheet", "https://www.visuar.com.py/themes/theme.css"),
+    ]
+    routes = [FakeRoute(*r) for r in requests]
+    for route in routes:
+        asyncio.run(context.handler(route))
+    for length in ("52000", "8000", None, "garbage"):
+        context.listeners["response"](FakeResponse(length))
+
+    assert [r.outcome for r in routes] == ["continued", "aborted", "aborted", "aborted", "aborted", "continued"]
+    metrics = blocker.metrics()
+    assert (metrics["requests"], metrics["blocked"]) == (6, 4)
+    assert metrics["blocked_by_type"] == {"image": 2, "font": 1, "script": 1}
+    assert metrics["top_blocked_hosts"]["www.visuar.com.py"] == 3
+    assert metrics["bytes_transferred"] == 60000
+    assert metrics["bytes_saved_estimate"] == (
+        2 * TYPICAL_BYTES["image"] + TYPICAL_BYTES["font"] + TYPICAL_BYTES["script"])
+    assert blocker.summary().startswith("4/6 requests blocked")
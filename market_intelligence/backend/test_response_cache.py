@@ -0,0 +1,188 @@
+"""
+Unit tests for response_cache.py and the cached /api/live_data endpoint.
+
+Covers LRU eviction, generation-based invalidation (explicit and via the
+scrape metadata file), degradation when the backend fails, and keyset
+pagination / filters / field projection on /api/live_data.
+
+Usage:
+    pytest test_response_cache.py -v
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from response_cache import MemoryBackend, ResponseCache
+
+
+def counting(value):
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return value
+    return compute, calls
+
+
+def test_memory_backend_evicts_least_recently_used():
+    backend = MemoryBackend(max_entries=2, generation_file=None)
+    backend.set("a", 1)
+    backend.set("b", 2)
+    backend.get("a")
+    backend.set("c", 3)
+
+    assert backend.get("a") == 1
+    assert backend.get("b") is None
+    assert backend.get("c") == 3
+
+
+def test_hits_until_invalidated():
+    cache = ResponseCache("test", MemoryBackend(generation_file=None))
+    compute, calls = counting({"rows": [1, 2]})
+
+    assert cache.get_or_compute(("rows", 1), compute) == ({"rows": [1, 2]}, False)
+    assert cache.get_or_compute(("rows", 1), compute) == ({"rows": [1, 2]}, True)
+    assert len(calls) == 1
+
+    cache.invalidate()
+    cache.get_or_compute(("rows", 1), compute)
+    assert len(calls) == 2
+    assert cache.stats == {"hits": 1, "misses": 2, "errors": 0}
+
+
+def test_metadata_rewrite_invalidates(tmp_path):
+    metadata = tmp_path / "scrape_metadata.json"
+    metadata.write_text("{}")
+    cache = ResponseCache("test", MemoryBackend(generation_file=str(metadata)))
+    compute, calls = counting([])
+
+    cache.get_or_compute(("rows",), compute)
+    cache.get_or_compute(("rows",), compute)
+    assert len(calls) == 1
+
+    # A pipeline run in another process rewrites the metadata file
+    stat = metadata.stat()
+    os.utime(metadata, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    cache.get_or_compute(("rows",), compute)
+    assert len(calls) == 2
+
+
+def test_backend_failure_falls_back_to_compute():
+    class Broken(MemoryBackend):
+        def generation(self, namespace):
+            raise ConnectionError("redis down")
+
+    cache = ResponseCache("test", Broken(generation_file=None))
+    compute, calls = counting([1])
+
+    assert cache.get_or_compute(("rows",), compute) == ([1], False)
+    assert cache.stats["errors"] == 1
+
+
+def test_live_data_served_from_cache(monkeypatch):
+    import api_server
+
+    cache = ResponseCache("live_data", MemoryBackend(generation_file=None))
+    monkeypatch.setattr(api_server, "live_data_cache", cache)
+    stats_calls, row_calls = [], []
+    monkeypatch.setattr(api_server, "_fetch_live_page",
+                        lambda sort, limit, filters, cursor_key, offset:
+                        row_calls.append((limit, offset, sort)) or {"rows": [{"id": "p1"}], "next_cursor": None})
+    monkeypatch.setattr(api_server, "_fetch_live_stats",
+                        lambda: stats_calls.append(1) or {"view_total": 120, "total": 130, "wins": 1})
+    client = api_server.app.test_client()
+
+    first = client.get("/api/live_data?page=2&limit=50")
+    second = client.get("/api/live_data?page=2&limit=50")
+    other_sort = client.get("/api/live_data?page=2&limit=50&sort=name")
+
+    assert first.headers["X-Cache"] == "MISS" and second.headers["X-Cache"] == "HIT"
+    assert second.get_json()["stats"] == {"total": 130, "wins": 1, "page": 2, "limit": 50, "matching": 120,
+                                          "total_pages": 3}
+    assert row_calls == [(50, 50, "loss_first"), (50, 50, "name")]
+    assert len(stats_calls) == 1
+    assert other_sort.status_code == 200
+    assert client.get("/api/live_data?sort=bogus").status_code == 400
+
+    cache.invalidate()
+    assert client.get("/api/live_data?page=2&limit=50").headers["X-Cache"] == "MISS"
+
+
+# ─── Keyset pagination / filters over a stand-in view ────────────────
+
+def _live_view_engine():
+    import random
+    from sqlalchemy import create_engine, text
+
+    engine = create_engine("sqlite://")
+    random.seed(7)
+    with engine.begin() as conn:
+        conn.execute(text("""
+            CREATE TABLE opportunity_margin_vw (
+                product_id TEXT, name TEXT, brand TEXT, capacity_btu INTEGER, internal_cost REAL,
+                visuar_price REAL, bristol_price REAL, gg_price REAL, gg_name TEXT,
+                real_margin_percent REAL, diff_percent REAL, status TEXT, last_updated TEXT
+            )
+        """))
+        for i in range(57):
+            diff = random.choice([None, 5.0, -5.0, round(random.uniform(-30, 30), 2)])
+            status = "NO_COMPETITOR_DATA" if diff is None else ("LOSS" if diff > 0 else "WIN")
+            conn.execute(text("""
+                INSERT INTO opportunity_margin_vw VALUES
+                (:id, :name, :brand, :btu, NULL, 1000, NULL, :gg, 'gg', NULL, :diff, :status, NULL)
+            """), {"id": f"p{i:03d}", "name": f"Aire {i % 7}", "brand": random.choice(["Samsung", "LG"]),
+                   "btu": random.choice([9000, 12000]), "gg": None if diff is None else 900, "diff": diff,
+                   "status": status})
+    return engine
+
+
+def test_live_data_keyset_walk_matches_full_sort(monkeypatch):
+    import api_server
+    from sqlalchemy import text
+
+    engine = _live_view_engine()
+    monkeypatch.setattr(api_server, "engine", engine)
+    monkeypatch.setattr(api_server, "live_data_cache", ResponseCache("live_data", MemoryBackend(generation_file=None)))
+    monkeypatch.setattr(api_server, "_fetch_live_stats", lambda: {"view_total": 57})
+    client = api_server.app.test_client()
+
+    for sort, order_by in [
+        ("loss_first", "CASE WHEN status = 'LOSS' THEN 0 ELSE 1 END, ABS(diff_percent) DESC NULLS LAST, product_id"),
+        ("diff", "ABS(diff_percent) DESC NULLS LAST, product_id"),
+        ("name", "name, product_id"),
+    ]:
+        with engine.connect() as conn:
+            expected = [r[0] for r in conn.execute(text(f"SELECT product_id FROM opportunity_margin_vw ORDER BY {order_by}"))]
+        seen, cursor = [], None
+        while True:
+            url = f"/api/live_data?limit=10&sort={sort}&fields=status" + (f"&cursor={cursor}" if cursor else "")
+            body = client.get(url).get_json()
+            assert all(set(row) == {"id", "status"} for row in body["rows"])
+            seen += [row["id"] for row in body["rows"]]
+            cursor = body["next_cursor"]
+            if not cursor:
+                break
+        assert seen == expected, sort
+
+
+def test_live_data_filters_and_validation(monkeypatch):
+    import api_server
+
+    engine = _live_view_engine()
+    monkeypatch.setattr(api_server, "engine", engine)
+    monkeypatch.setattr(api_server, "live_data_cache", ResponseCache("live_data", MemoryBackend(generation_file=None)))
+    monkeypatch.setattr(api_server, "_fetch_live_stats", lambda: {"view_total": 57})
+    client = api_server.app.test_client()
+
+    body = client.get("/api/live_data?limit=100&brand=samsung&btu=12000&status=loss,win&competitor=gg").get_json()
+    assert body["rows"] and body["next_cursor"] is None
+    assert all(r["brand"] == "Samsung" and r["btu"] == 12000 and r["status"] in ("LOSS", "WIN") for r in body["rows"])
+    assert body["stats"]["matching"] == len(body["rows"])
+
+    assert client.get("/api/live_data?btu=abc").status_code == 400
+    assert client.get("/api/live_data?status=GONE").status_code == 400
+    assert client.get("/api/live_data?fields=secret").status_code == 400
+    assert client.get("/api/live_data?cursor=garbage").status_code == 400
+    name_cursor = client.get("/api/live_data?limit=5&sort=name").get_json()["next_cursor"]
+    assert client.get(f"/api/live_data?sort=diff&cursor={name_cursor}").status_code == 400
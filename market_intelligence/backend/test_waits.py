@@ -0,0 +1,107 @@
+"""
+Test suite for waits.py (event-driven page waits).
+Covers:
+  1. network_idle returns once matching requests finish, ignores other URLs, times out
+  2. popup reports the visible selector, None on timeout
+  3. count_growth result passthrough and per-kind timing metrics
+
+Usage:
+    pytest test_waits.py -v
+"""
+import asyncio
+import os
+import sys
+
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from waits import PageWaits
+
+LISTING = "https://www.visuar.com.py/hogar/aires-acondicionados/?page=2&from-xhr"
+
+
+class FakeRequest:
+    def __init__(self, url):
+        self.url = url
+
+
+class FakeHandle:
+    def __init__(self, selector):
+        self.selector = selector
+
+    async def evaluate(self, script, selectors):
+        return self.selector
+
+
+class FakePage:
+    def __init__(self, visible=None, count=None):
+        self.listeners = {}
+        self.visible = visible
+        self.count = count
+
+    def on(self, event, handler):
+        self.listeners.setdefault(event, []).append(handler)
+
+    def remove_listener(self, event, handler):
+        self.listeners[event].remove(handler)
+
+    def emit(self, event, request):
+        for handler in list(self.listeners.get(event, [])):
+            handler(request)
+
+    async def wait_for_selector(self, selector, state=None, timeout=None):
+        if self.visible is None:
+            raise PlaywrightTimeoutError(f"Timeout {timeout}ms exceeded.")
+        assert self.visible in selector.split(", ") and state == "visible"
+        return FakeHandle(self.visible)
+
+    async def evaluate(self, script, arg):
+        return {"count": self.count, "reason": "grew" if self.count > arg["previous"] else "quiet"}
+
+
+def test_network_idle_waits_for_matching_requests():
+    async def run():
+        page = FakePage()
+        waits = PageWaits(page)
+        listing, tracker = FakeRequest(LISTING), FakeRequest("https://www.google-analytics.com/collect")
+        loop = asyncio.get_running_loop()
+        loop.call_soon(page.emit, "request", listing)
+        loop.call_soon(page.emit, "request", tracker)  # never finishes, but does not match
+        loop.call_later(0.15, page.emit, "requestfinished", listing)
+
+        started = loop.time()
+        assert await waits.network_idle(r"aires-acondicionados", idle_ms=50, timeout_ms=2000)
+        elapsed = loop.time() - started
+        assert page.listeners == {"request": [], "requestfinished": [], "requestfailed": []}
+
+        # A request still in flight at the deadline is a timeout
+        loop.call_soon(page.emit, "request", FakeRequest(LISTING))
+        assert not await waits.network_idle(r"aires-acondicionados", idle_ms=50, timeout_ms=200)
+        return elapsed, waits.metrics()
+
+    elapsed, metrics = asyncio.run(run())
+    # Idle right after the listing request finished plus the quiet window
+    assert 0.15 <= elapsed < 1
+    assert metrics["network_idle"]["count"] == 2 and metrics["network_idle"]["timeouts"] == 1
+
+
+def test_popup_and_count_growth_metrics():
+    async def run():
+        waits = PageWaits(FakePage(visible=".ins-close-button", count=12))
+        selectors = [".close-modal", ".ins-close-button"]
+        assert await waits.popup(selectors, timeout_ms=100) == ".ins-close-button"
+        assert await waits.count_growth(".product", 10) == 12
+        assert await waits.count_growth(".product", 12) == 12
+
+        waits.page.visible = None
+        assert await waits.popup(selectors, timeout_ms=100) is None
+        return waits
+
+    waits = asyncio.run(run())
+    metrics = waits.metrics()
+    assert metrics["popup"]["count"] == 2 and metrics["popup"]["timeouts"] == 1
+    assert metrics["count_growth"]["count"] == 2 and metrics["count_growth"]["timeouts"] == 0
+    assert [reason for kind, _, reason in waits.records] == ["visible", "grew", "quiet", "timeout"]
+    assert waits.summary().startswith("count_growth 2x/")
+    assert PageWaits(FakePage()).summary() == "no waits"
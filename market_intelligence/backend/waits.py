@@ -0,0 +1,134 @@
+"""
+Waits - Event-driven replacements for fixed wait_for_timeout sleeps.
+
+A fixed sleep is either too long (the site was faster) or too short (it was
+slower). PageWaits waits on what the scraper actually needs and returns as
+soon as it happens:
+
+  count_growth   until more elements match a selector, or the DOM has been
+                 quiet (no mutations) for quiet_ms - MutationObserver in page
+  network_idle   until no request matching a URL pattern has been in flight
+                 for idle_ms
+  popup          until one of several popup selectors is visible (returns
+                 which one), or timeout
+
+Every wait is timed; metrics() summarises them per kind for the ScrapeLog.
+"""
+import asyncio
+import re
+import time
+from typing import Dict, List, Optional
+
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+
+_COUNT_GROWTH_JS = """({selector, previous, quietMs, timeoutMs}) => new Promise(resolve => {
+    const count = () => document.querySelectorAll(selector).length;
+    if (count() > previous) return resolve({count: count(), reason: "grew"});
+    let quiet, limit, observer;
+    const done = reason => {
+        observer.disconnect();
+        clearTimeout(quiet);
+        clearTimeout(limit);
+        resolve({count: count(), reason});
+    };
+    observer = new MutationObserver(() => {
+        if (count() > previous) return done("grew");
+        clearTimeout(quiet);
+        quiet = setTimeout(() => done("quiet"), quietMs);
+    });
+    observer.observe(document.documentElement, {childList: true, subtree: true});
+    quiet = setTimeout(() => done("quiet"), quietMs);
+    limit = setTimeout(() => done("timeout"), timeoutMs);
+})"""
+
+_MATCHED_SELECTOR_JS = "(el, selectors) => selectors.find(s => el.matches(s)) || null"
+
+
+class PageWaits:
+    """Timed, event-driven waits on one page."""
+
+    def __init__(self, page):
+        self.page = page
+        self.records: List[tuple] = []  # (kind, elapsed_ms, reason)
+
+    def _record(self, kind: str, started: float, reason: str):
+        self.records.append((kind, round((time.perf_counter() - started) * 1000), reason))
+
+    async def count_growth(self, selector: str, previous: int, quiet_ms: int = 1000, timeout_ms: int = 10000) -> int:
+        """Wait until more than `previous` elements match `selector`, or quiet_ms without DOM mutations."""
+        started = time.perf_counter()
+        result = await self.page.evaluate(_COUNT_GROWTH_JS, {
+            "selector": selector, "previous": previous, "quietMs": quiet_ms, "timeoutMs": timeout_ms,
+        })
+        self._record("count_growth", started, result["reason"])
+        return result["count"]
+
+    async def network_idle(self, url_pattern: str, idle_ms: int = 500, timeout_ms: int = 10000) -> bool:
+        """
+        Wait until no request whose URL matches `url_pattern` (regex) has been
+        in flight for idle_ms. False on timeout.
+        """
+        started = time.perf_counter()
+        pattern = re.compile(url_pattern)
+        loop = asyncio.get_running_loop()
+        in_flight = set()
+        changed = asyncio.Event()
+
+        def on_request(request):
+            if pattern.search(request.url):
+                in_flight.add(request)
+                changed.set()
+
+        def on_done(request):
+            if request in in_flight:
+                in_flight.discard(request)
+                changed.set()
+
+        events = {"request": on_request, "requestfinished": on_done, "requestfailed": on_done}
+        for event, handler in events.items():
+            self.page.on(event, handler)
+        try:
+            deadline = loop.time() + timeout_ms / 1000
+            while True:
+                changed.clear()
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    self._record("network_idle", started, "timeout")
+                    return False
+                # Idle once the quiet window passes with nothing matching in flight
+                window = remaining if in_flight else min(idle_ms / 1000, remaining)
+                try:
+                    await asyncio.wait_for(changed.wait(), window)
+                except asyncio.TimeoutError:
+                    if not in_flight:
+                        self._record("network_idle", started, "idle")
+                        return True
+        finally:
+            for event, handler in events.items():
+                self.page.remove_listener(event, handler)
+
+    async def popup(self, selectors: List[str], timeout_ms: int = 2000) -> Optional[str]:
+        """The first of `selectors` to become visible within timeout_ms, or None."""
+        started = time.perf_counter()
+        try:
+            handle = await self.page.wait_for_selector(", ".join(selectors), state="visible", timeout=timeout_ms)
+        except PlaywrightTimeoutError:
+            self._record("popup", started, "timeout")
+            return None
+        self._record("popup", started, "visible")
+        return await handle.evaluate(_MATCHED_SELECTOR_JS, selectors)
+
+    def metrics(self) -> Dict[str, dict]:
+        summary: Dict[str, dict] = {}
+        for kind, elapsed_ms, reason in self.records:
+            entry = summary.setdefault(kind, {"count": 0, "total_ms": 0, "max_ms": 0, "timeouts": 0})
+            entry["count"] += 1
+            entry["total_ms"] += elapsed_ms
+            entry["max_ms"] = max(entry["max_ms"], elapsed_ms)
+            entry["timeouts"] += reason == "timeout"
+        return summary
+
+    def summary(self) -> str:
+        return ", ".join(
+            f"{kind} {m['count']}x/{m['total_ms']} ms" for kind, m in sorted(self.metrics().items())
+        ) or "no waits"
@@ -42,7 +42,9 @@ CREATE TABLE competitor_products (
     raw_brand VARCHAR(100),
     sku VARCHAR(100),
     url TEXT,
-    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    -- Natural key: the scraper upserts on (competitor_id, name)
+    CONSTRAINT uq_competitor_products_competitor_name UNIQUE (competitor_id, name)
 );
 
 -- Price Logs (Historical append-only facts)
@@ -54,41 +56,54 @@ CREATE TABLE price_logs (
     scraped_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
 );
 
+-- Latest price per competitor product, upserted by the scraper in the same
+-- transaction as the price_logs insert (reads never scan the history)
+CREATE TABLE latest_prices (
+    competitor_product_id INTEGER PRIMARY KEY REFERENCES competitor_products(id) ON DELETE CASCADE,
+    price_log_id INTEGER NOT NULL REFERENCES price_logs(id),
+    price DECIMAL(15, 2) NOT NULL,
+    is_in_stock BOOLEAN DEFAULT TRUE,
+    scraped_at TIMESTAMP WITH TIME ZONE,
+    -- Heartbeat: last run that saw the listing (price_logs only records changes)
+    last_seen_at TIMESTAMP WITH TIME ZONE
+);
+
 -- Indexes for time-series querying speeds
-CREATE INDEX idx_price_logs_product_time ON price_logs(product_id, scraped_at DESC);
+CREATE INDEX idx_price_logs_listing_time ON price_logs(competitor_product_id, scraped_at DESC);
 CREATE INDEX idx_price_logs_competitor ON price_logs(competitor_id);
 
 -- VIEW: Opportunity Margin (Dynamic Price Mismatch Engine)
 DROP VIEW IF EXISTS opportunity_margin_vw CASCADE;
 CREATE OR REPLACE VIEW opportunity_margin_vw AS
-WITH latest_prices AS (
-    -- Get the most recent price per product per competitor
+WITH latest AS (
+    -- Most recent price per product per competitor, from the maintained latest_prices table
     SELECT DISTINCT ON (cp.product_id, cp.competitor_id)
         cp.product_id,
         cp.competitor_id,
-        pl.price,
-        pl.is_in_stock,
-        pl.scraped_at
-    FROM price_logs pl
-    JOIN competitor_products cp ON pl.competitor_product_id = cp.id
+        cp.name,
+        lp.price,
+        lp.is_in_stock,
+        COALESCE(lp.last_seen_at, lp.scraped_at) AS scraped_at
+    FROM latest_prices lp
+    JOIN competitor_products cp ON lp.competitor_product_id = cp.id
     WHERE cp.product_id IS NOT NULL
-    ORDER BY cp.product_id, cp.competitor_id, pl.scraped_at DESC
+    ORDER BY cp.product_id, cp.competitor_id, COALESCE(lp.last_seen_at, lp.scraped_at) DESC
 ),
 visuar_prices AS (
     SELECT lp.product_id, lp.price as visuar_price, lp.is_in_stock as v_stock, lp.scraped_at
-    FROM latest_prices lp
+    FROM latest lp
     JOIN competitors c ON lp.competitor_id = c.id
     WHERE c.name = 'Visuar'
 ),
 bristol_prices AS (
     SELECT lp.product_id, lp.price as bristol_price, lp.is_in_stock as b_stock, lp.scraped_at as b_scraped_at
-    FROM latest_prices lp
+    FROM latest lp
     JOIN competitors c ON lp.competitor_id = c.id
     WHERE c.name = 'Bristol'
 ),
 gg_prices AS (
-    SELECT lp.product_id, lp.price as gg_price, lp.is_in_stock as g_stock, lp.scraped_at as g_scraped_at
-    FROM latest_prices lp
+    SELECT lp.product_id, lp.price as gg_price, lp.name as gg_name, lp.is_in_stock as g_stock, lp.scraped_at as g_scraped_at
+    FROM latest lp
     JOIN competitors c ON lp.competitor_id = c.id
     WHERE c.name = 'Gonzalez Gimenez'
 )
@@ -101,6 +116,7 @@ SELECT
     v.visuar_price,
     b.bristol_price,
     g.gg_price,
+    g.gg_name,
     LEAST(b.bristol_price, g.gg_price) as lowest_comp_price,
     -- Margen Real (Visuar Price - Internal Cost)
     CASE 
@@ -126,19 +142,17 @@ LEFT JOIN bristol_prices b ON p.id = b.product_id
 LEFT JOIN gg_prices g ON p.id = g.product_id
 WHERE v.visuar_price IS NOT NULL;
 
--- Índice compuesto para optimizar las consultas históricas del Dashboard
-CREATE INDEX IF NOT EXISTS idx_price_logs_product_date 
-ON price_logs(product_id, scraped_at DESC);
-
 -- Tabla para monitorear la salud y resiliencia del scraper
 CREATE TABLE scrape_logs (
     id SERIAL PRIMARY KEY,
     competitor_id INTEGER REFERENCES competitors(id),
     started_at TIMESTAMP WITH TIME ZONE,
     finished_at TIMESTAMP WITH TIME ZONE,
-    status VARCHAR(20), -- 'success', 'partial', 'failed'
+    status VARCHAR(20), -- 'success', 'unchanged', 'partial', 'failed', 'skipped'
     products_scraped INTEGER,
-    error_message TEXT
+    error_message TEXT,
+    fingerprint VARCHAR(64), -- hash of the listing page; same as last run => 'unchanged'
+    metrics JSONB -- per-run browser stats: requests, blocked by type, bytes transferred/saved
 );
 
 -- Índice requerido para el Dashboard: 'última ejecución por competidor'
@@ -0,0 +1,29 @@
+-- Migration: Natural key on competitor_products (competitor_id, name)
+-- Required by the bulk sync path in scraper.py (INSERT ... ON CONFLICT).
+-- Usage: psql -d market_intel_db -f add_competitor_products_unique_key.sql
+
+BEGIN;
+
+-- 1. Map every duplicate row to the oldest row with the same key
+CREATE TEMP TABLE cp_duplicates AS
+SELECT id, keep_id FROM (
+    SELECT id, MIN(id) OVER (PARTITION BY competitor_id, name) AS keep_id
+    FROM competitor_products
+) d
+WHERE id <> keep_id;
+
+-- 2. Re-point history and suggestions to the surviving row
+UPDATE price_logs pl SET competitor_product_id = d.keep_id
+FROM cp_duplicates d WHERE pl.competitor_product_id = d.id;
+
+UPDATE pending_mappings pm SET competitor_product_id = d.keep_id
+FROM cp_duplicates d WHERE pm.competitor_product_id = d.id;
+
+-- 3. Drop the duplicates
+DELETE FROM competitor_products cp USING cp_duplicates d WHERE cp.id = d.id;
+
+-- 4. Add the constraint
+ALTER TABLE competitor_products
+    ADD CONSTRAINT uq_competitor_products_competitor_name UNIQUE (competitor_id, name);
+
+COMMIT;
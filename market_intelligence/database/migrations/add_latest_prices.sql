@@ -0,0 +1,99 @@
+-- Migration: latest_prices table (latest PriceLog per competitor product)
+-- Maintained by scraper.py on ingest; opportunity_margin_vw and the alert
+-- engine read it instead of scanning the full price_logs history.
+-- Usage: psql -d market_intel_db -f add_latest_prices.sql
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS latest_prices (
+    competitor_product_id INTEGER PRIMARY KEY REFERENCES competitor_products(id) ON DELETE CASCADE,
+    price_log_id INTEGER NOT NULL REFERENCES price_logs(id),
+    price DECIMAL(15, 2) NOT NULL,
+    is_in_stock BOOLEAN DEFAULT TRUE,
+    scraped_at TIMESTAMP WITH TIME ZONE
+);
+
+-- Backfill from history (one pass; afterwards only new logs are applied)
+INSERT INTO latest_prices (competitor_product_id, price_log_id, price, is_in_stock, scraped_at)
+SELECT DISTINCT ON (competitor_product_id)
+    competitor_product_id, id, price, is_in_stock, scraped_at
+FROM price_logs
+ORDER BY competitor_product_id, id DESC
+ON CONFLICT (competitor_product_id) DO UPDATE SET
+    price_log_id = EXCLUDED.price_log_id,
+    price = EXCLUDED.price,
+    is_in_stock = EXCLUDED.is_in_stock,
+    scraped_at = EXCLUDED.scraped_at
+WHERE latest_prices.price_log_id < EXCLUDED.price_log_id;
+
+-- Point the view at latest_prices (same definition as init.sql)
+DROP VIEW IF EXISTS opportunity_margin_vw CASCADE;
+CREATE OR REPLACE VIEW opportunity_margin_vw AS
+WITH latest AS (
+    -- Most recent price per product per competitor, from the maintained latest_prices table
+    SELECT DISTINCT ON (cp.product_id, cp.competitor_id)
+        cp.product_id,
+        cp.competitor_id,
+        cp.name,
+        lp.price,
+        lp.is_in_stock,
+        lp.scraped_at
+    FROM latest_prices lp
+    JOIN competitor_products cp ON lp.competitor_product_id = cp.id
+    WHERE cp.product_id IS NOT NULL
+    ORDER BY cp.product_id, cp.competitor_id, lp.scraped_at DESC
+),
+visuar_prices AS (
+    SELECT lp.product_id, lp.price as visuar_price, lp.is_in_stock as v_stock, lp.scraped_at
+    FROM latest lp
+    JOIN competitors c ON lp.competitor_id = c.id
+    WHERE c.name = 'Visuar'
+),
+bristol_prices AS (
+    SELECT lp.product_id, lp.price as bristol_price, lp.is_in_stock as b_stock, lp.scraped_at as b_scraped_at
+    FROM latest lp
+    JOIN competitors c ON lp.competitor_id = c.id
+    WHERE c.name = 'Bristol'
+),
+gg_prices AS (
+    SELECT lp.product_id, lp.price as gg_price, lp.name as gg_name, lp.is_in_stock as g_stock, lp.scraped_at as g_scraped_at
+    FROM latest lp
+    JOIN competitors c ON lp.competitor_id = c.id
+    WHERE c.name = 'Gonzalez Gimenez'
+)
+SELECT 
+    p.id as product_id,
+    p.name,
+    p.brand,
+    p.capacity_btu,
+    p.internal_cost,
+    v.visuar_price,
+    b.bristol_price,
+    g.gg_price,
+    g.gg_name,
+    LEAST(b.bristol_price, g.gg_price) as lowest_comp_price,
+    -- Margen Real (Visuar Price - Internal Cost)
+    CASE 
+        WHEN p.internal_cost > 0 AND v.visuar_price > 0 
+        THEN ROUND(((v.visuar_price - p.internal_cost) / p.internal_cost) * 100, 2)
+        ELSE NULL
+    END as real_margin_percent,
+    -- Margin: Positive means Visuar is MORE expensive. Negative means Visuar is CHEAPER.
+    CASE 
+        WHEN v.visuar_price > 0 AND LEAST(b.bristol_price, g.gg_price) IS NOT NULL 
+        THEN ROUND(((v.visuar_price - LEAST(b.bristol_price, g.gg_price)) / LEAST(b.bristol_price, g.gg_price)) * 100, 2)
+        ELSE NULL
+    END as diff_percent,
+    CASE
+        WHEN LEAST(b.bristol_price, g.gg_price) < v.visuar_price THEN 'LOSS'
+        WHEN LEAST(b.bristol_price, g.gg_price) > v.visuar_price THEN 'WIN'
+        ELSE 'EQUAL'
+    END as status,
+    COALESCE(GREATEST(v.scraped_at, b.b_scraped_at, g.g_scraped_at), v.scraped_at) as last_updated
+FROM products p
+LEFT JOIN visuar_prices v ON p.id = v.product_id
+LEFT JOIN bristol_prices b ON p.id = b.product_id
+LEFT JOIN gg_prices g ON p.id = g.product_id
+WHERE v.visuar_price IS NOT NULL;
+
+COMMIT;
@@ -0,0 +1,81 @@
+-- Migration: change-data-capture ingest (price_logs only on price/stock change)
+-- Adds the latest_prices.last_seen_at heartbeat and points the view's
+-- last_updated at it, so unchanged listings still show when they were last seen.
+-- Usage: psql -d market_intel_db -f add_latest_prices_last_seen.sql
+
+BEGIN;
+
+ALTER TABLE latest_prices ADD COLUMN IF NOT EXISTS last_seen_at TIMESTAMP WITH TIME ZONE;
+UPDATE latest_prices SET last_seen_at = scraped_at WHERE last_seen_at IS NULL;
+
+-- Same definition as init.sql
+DROP VIEW IF EXISTS opportunity_margin_vw CASCADE;
+CREATE OR REPLACE VIEW opportunity_margin_vw AS
+WITH latest AS (
+    -- Most recent price per product per competitor, from the maintained latest_prices table
+    SELECT DISTINCT ON (cp.product_id, cp.competitor_id)
+        cp.product_id,
+        cp.competitor_id,
+        cp.name,
+        lp.price,
+        lp.is_in_stock,
+        COALESCE(lp.last_seen_at, lp.scraped_at) AS scraped_at
+    FROM latest_prices lp
+    JOIN competitor_products cp ON lp.competitor_product_id = cp.id
+    WHERE cp.product_id IS NOT NULL
+    ORDER BY cp.product_id, cp.competitor_id, COALESCE(lp.last_seen_at, lp.scraped_at) DESC
+),
+visuar_prices AS (
+    SELECT lp.product_id, lp.price as visuar_price, lp.is_in_stock as v_stock, lp.scraped_at
+    FROM latest lp
+    JOIN competitors c ON lp.competitor_id = c.id
+    WHERE c.name = 'Visuar'
+),
+bristol_prices AS (
+    SELECT lp.product_id, lp.price as bristol_price, lp.is_in_stock as b_stock, lp.scraped_at as b_scraped_at
+    FROM latest lp
+    JOIN competitors c ON lp.competitor_id = c.id
+    WHERE c.name = 'Bristol'
+),
+gg_prices AS (
+    SELECT lp.product_id, lp.price as gg_price, lp.name as gg_name, lp.is_in_stock as g_stock, lp.scraped_at as g_scraped_at
+    FROM latest lp
+    JOIN competitors c ON lp.competitor_id = c.id
+    WHERE c.name = 'Gonzalez Gimenez'
+)
+SELECT 
+    p.id as product_id,
+    p.name,
+    p.brand,
+    p.capacity_btu,
+    p.internal_cost,
+    v.visuar_price,
+    b.bristol_price,
+    g.gg_price,
+    g.gg_name,
+    LEAST(b.bristol_price, g.gg_price) as lowest_comp_price,
+    -- Margen Real (Visuar Price - Internal Cost)
+    CASE 
+        WHEN p.internal_cost > 0 AND v.visuar_price > 0 
+        THEN ROUND(((v.visuar_price - p.internal_cost) / p.internal_cost) * 100, 2)
+        ELSE NULL
+    END as real_margin_percent,
+    -- Margin: Positive means Visuar is MORE expensive. Negative means Visuar is CHEAPER.
+    CASE 
+        WHEN v.visuar_price > 0 AND LEAST(b.bristol_price, g.gg_price) IS NOT NULL 
+        THEN ROUND(((v.visuar_price - LEAST(b.bristol_price, g.gg_price)) / LEAST(b.bristol_price, g.gg_price)) * 100, 2)
+        ELSE NULL
+    END as diff_percent,
+    CASE
+        WHEN LEAST(b.bristol_price, g.gg_price) < v.visuar_price THEN 'LOSS'
+        WHEN LEAST(b.bristol_price, g.gg_price) > v.visuar_price THEN 'WIN'
+        ELSE 'EQUAL'
+    END as status,
+    COALESCE(GREATEST(v.scraped_at, b.b_scraped_at, g.g_scraped_at), v.scraped_at) as last_updated
+FROM products p
+LEFT JOIN visuar_prices v ON p.id = v.product_id
+LEFT JOIN bristol_prices b ON p.id = b.product_id
+LEFT JOIN gg_prices g ON p.id = g.product_id
+WHERE v.visuar_price IS NOT NULL;
+
+COMMIT;
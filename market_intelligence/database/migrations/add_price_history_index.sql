@@ -0,0 +1,8 @@
+-- Migration: index for per-product price history (/api/products/<id>/history)
+-- price_logs has no product_id column (the old idx_price_logs_product_* indexes
+-- never applied); history is reached through competitor_products, so series are
+-- read by (competitor_product_id, scraped_at).
+-- Usage: psql -d market_intel_db -f add_price_history_index.sql
+
+CREATE INDEX IF NOT EXISTS idx_price_logs_listing_time
+    ON price_logs(competitor_product_id, scraped_at DESC);
@@ -0,0 +1,6 @@
+-- Migration: listing fingerprint on scrape_logs
+-- The scraper hashes each competitor's listing page; when it matches the last
+-- successful run the source is logged as 'unchanged' and not re-synced.
+-- Usage: psql -d market_intel_db -f add_scrape_log_fingerprint.sql
+
+ALTER TABLE scrape_logs ADD COLUMN IF NOT EXISTS fingerprint VARCHAR(64);
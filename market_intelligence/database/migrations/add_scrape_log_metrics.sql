@@ -0,0 +1,6 @@
+-- Migration: per-run browser metrics on scrape_logs
+-- The scraper blocks images/media/fonts/trackers in its browser contexts and
+-- records request counts and bytes transferred/saved for each run.
+-- Usage: psql -d market_intel_db -f add_scrape_log_metrics.sql
+
+ALTER TABLE scrape_logs ADD COLUMN IF NOT EXISTS metrics JSONB;
@@ -2,38 +2,35 @@
 DROP VIEW IF EXISTS opportunity_margin_vw;
 
 CREATE VIEW opportunity_margin_vw AS
-WITH latest_prices AS (
+WITH latest AS (
+    -- One row per competitor product, maintained by the scraper on ingest
     SELECT 
-        l.competitor_product_id,
+        lp.competitor_product_id,
         cp.product_id,
         cp.competitor_id,
-        l.price,
-        l.is_in_stock,
-        l.scraped_at
-    FROM price_logs l
-    JOIN competitor_products cp ON l.competitor_product_id = cp.id
-    WHERE l.scraped_at = (
-        SELECT MAX(scraped_at)
-        FROM price_logs b
-        WHERE b.competitor_product_id = l.competitor_product_id
-    )
-    AND cp.product_id IS NOT NULL
+        cp.name,
+        lp.price,
+        lp.is_in_stock,
+        COALESCE(lp.last_seen_at, lp.scraped_at) AS scraped_at
+    FROM latest_prices lp
+    JOIN competitor_products cp ON lp.competitor_product_id = cp.id
+    WHERE cp.product_id IS NOT NULL
 ),
 visuar_prices AS (
     SELECT lp.product_id, lp.price as visuar_price, lp.is_in_stock as v_stock, lp.scraped_at
-    FROM latest_prices lp
+    FROM latest lp
     JOIN competitors c ON lp.competitor_id = c.id
     WHERE c.name = 'Visuar'
 ),
 bristol_prices AS (
     SELECT lp.product_id, lp.price as bristol_price, lp.is_in_stock as b_stock, lp.scraped_at as b_scraped_at
-    FROM latest_prices lp
+    FROM latest lp
     JOIN competitors c ON lp.competitor_id = c.id
     WHERE c.name = 'Bristol'
 ),
 gg_prices AS (
-    SELECT lp.product_id, lp.price as gg_price, lp.is_in_stock as g_stock, lp.scraped_at as g_scraped_at
-    FROM latest_prices lp
+    SELECT lp.product_id, lp.price as gg_price, lp.name as gg_name, lp.is_in_stock as g_stock, lp.scraped_at as g_scraped_at
+    FROM latest lp
     JOIN competitors c ON lp.competitor_id = c.id
     WHERE c.name = 'Gonzalez Gimenez'
 ),
@@ -46,6 +43,7 @@ calculated AS (
         v.visuar_price,
         b.bristol_price,
         g.gg_price,
+        g.gg_name,
         MIN(COALESCE(b.bristol_price, 9999999999), COALESCE(g.gg_price, 9999999999)) as lowest_comp,
         b.b_stock,
         g.g_stock,
@@ -66,6 +64,7 @@ SELECT
     visuar_price,
     bristol_price,
     gg_price,
+    gg_name,
     lowest_comp,
     CASE 
         WHEN visuar_price > 0 AND lowest_comp < 9999999999 
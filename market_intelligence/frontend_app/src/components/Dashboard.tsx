@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { TrendingDown, TrendingUp, Activity, RefreshCw, Layers, Scale, List, Clock, CheckCircle2, Loader2 } from 'lucide-react';
 import { DashboardKPIs } from './DashboardKPIs';
 import { PriceHistoryChart } from './PriceHistoryChart';
@@ -16,6 +16,8 @@ export default function Dashboard() {
     const [page, setPage] = useState(1);
     const [totalPages, setTotalPages] = useState(1);
     const [dataError, setDataError] = useState('');
+    // Keyset cursors: pageCursors.current[n - 1] fetches page n ('' = first page)
+    const pageCursors = useRef<string[]>(['']);
 
     // Comparador Libre - State
     const [compareVisuarId, setCompareVisuarId] = useState('');
@@ -30,10 +32,13 @@ export default function Dashboard() {
         setLoading(true);
         setDataError('');
         try {
-            const response = await fetch(`/backend/api/live_data?page=${currentPage}&limit=50`);
+            const cursor = pageCursors.current[currentPage - 1];
+            const position = cursor ? `cursor=${encodeURIComponent(cursor)}&` : '';
+            const response = await fetch(`/backend/api/live_data?${position}page=${currentPage}&limit=50`);
             if (!response.ok) throw new Error('Error en API en vivo');
             
             const data = await response.json();
+            if (data.next_cursor) pageCursors.current[currentPage] = data.next_cursor;
             const validRows = Array.isArray(data.rows) ? data.rows : [];
             setRows(validRows);
             setDashboardStats(data.stats || null);
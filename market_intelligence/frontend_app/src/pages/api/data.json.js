@@ -326,13 +326,15 @@ async function fetchDashboardData() {
     try {
         const pool = new Pool(PG_CONFIG);
         
-        // 1. Fetch Visuar Products (the base catalog)
+        // 1. Fetch Visuar Products (the base catalog) with their latest price
+        //    (latest_prices holds one row per listing, maintained on ingest)
         const visuarQuery = `
             SELECT p.id, p.name, p.brand, p.capacity_btu as btu, p.internal_cost,
-                   cp.price, cp.scraped_at
+                   lp.price, lp.scraped_at
             FROM products p
             JOIN competitor_products cp ON cp.product_id = p.id
             JOIN competitors c ON cp.competitor_id = c.id
+            JOIN latest_prices lp ON lp.competitor_product_id = cp.id
             WHERE c.name = 'Visuar'
         `;
         const visuarResult = await pool.query(visuarQuery);
@@ -343,9 +345,10 @@ async function fetchDashboardData() {
 
         // 3. Fetch GG products for comparison
         const ggQuery = `
-            SELECT cp.id, cp.product_id, cp.name, cp.price, cp.raw_brand as brand, cp.scraped_at
+            SELECT cp.id, cp.product_id, cp.name, lp.price, cp.raw_brand as brand, lp.scraped_at
             FROM competitor_products cp
             JOIN competitors c ON cp.competitor_id = c.id
+            JOIN latest_prices lp ON lp.competitor_product_id = cp.id
             WHERE c.name = 'Gonzalez Gimenez'
         `;
         const ggResult = await pool.query(ggQuery);
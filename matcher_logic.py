@@ -1,8 +1,9 @@
 import re
 import logging
 from dataclasses import dataclass
+from collections import defaultdict
 from typing import Optional, List, Dict, Union
-from thefuzz import fuzz
+from rapidfuzz import fuzz, process, utils
 
 logger = logging.getLogger("soc_audit.matcher_logic")
 
@@ -52,25 +53,43 @@ class MatchingEngine:
         
     def compare(self, products_a: List[Product], products_b: List[Product]) -> List[Dict[str, Union[str, float]]]:
         """
-        Cross-comparison logic using thefuzz.token_set_ratio.
+        Cross-comparison logic using token_set_ratio, scored per BTU block with rapidfuzz.cdist.
         Source A products matched against Source B.
         """
         results = []
         logger.info(f"[DATA_INTEGRITY] Initiating matching engine: Source A ({len(products_a)}) vs Source B ({len(products_b)})")
         
-        for p_a in products_a:
-            best_match: Optional[Product] = None
-            best_score = 0
-            
-            for p_b in products_b:
-                # Rule 1: Technical Attribute Validations - BTU match
-                if p_a.capacity_btu == p_b.capacity_btu and p_a.capacity_btu is not None:
-                    # Rule 2: Token-based similarity threshold
-                    score = fuzz.token_set_ratio(p_a.name, p_b.name)
-                    if score > self.threshold and score > best_score:
-                        best_score = score
-                        best_match = p_b
-                            
+        # Rule 1: Technical Attribute Validations - BTU match.
+        # Block Source B by BTU so each block is scored as one dense matrix.
+        by_btu = defaultdict(list)
+        for p_b in products_b:
+            if p_b.capacity_btu is not None:
+                by_btu[p_b.capacity_btu].append(p_b)
+
+        best: Dict[int, tuple] = {}
+        blocks = defaultdict(list)
+        for i, p_a in enumerate(products_a):
+            if p_a.capacity_btu in by_btu:
+                blocks[p_a.capacity_btu].append(i)
+
+        for btu, rows in blocks.items():
+            candidates = by_btu[btu]
+            # Rule 2: Token-based similarity threshold (vectorized)
+            scores = process.cdist(
+                [products_a[i].name for i in rows],
+                [p_b.name for p_b in candidates],
+                scorer=fuzz.token_set_ratio,
+                processor=utils.default_process,
+            ).round()
+            top = scores.argmax(axis=1)
+            for r, i in enumerate(rows):
+                score = int(scores[r, top[r]])
+                if score > self.threshold:
+                    best[i] = (candidates[int(top[r])], score)
+
+        for i, p_a in enumerate(products_a):
+            best_match, best_score = best.get(i, (None, 0))
+
             if best_match:
                 logger.info(f"[MATCH_FOUND] Identity match confirmed: '{p_a.name}' (A) <=> '{best_match.name}' (B) | Score: {best_score}")
                 
@@ -1,16 +1,60 @@
 import logging
-from typing import List
-from playwright.async_api import async_playwright, Page, BrowserContext
+import re
+from typing import List, Optional
+from playwright.async_api import Page
+
+# Extraction, the browser pool and page waits are shared with the production scraper
+# in market_intelligence/backend (loaded by path, see backend_shared).
+from backend_shared import browser_pool, extraction, waits
 from matcher_logic import Product, normalize_btu, normalize_inverter
 
+BrowserPool, borrow_pool = browser_pool.BrowserPool, browser_pool.borrow_pool
+clean_text, extract, field = extraction.clean_text, extraction.extract, extraction.field
+parse_number, parse_price = extraction.parse_number, extraction.parse_price
+PageWaits = waits.PageWaits
+
 logger = logging.getLogger("soc_audit.scraper_engine")
 
+# ── Listing specs (see extraction.extract) ──────────────────
+# Selectors of the pages this engine visits; the backend scraper keeps its own.
+
+VISUAR_LISTING = {
+    "containers": ["article.js-product-miniature"],
+    "fields": {
+        "title": field(".product-title"),
+        "brand": field(".product-brand"),
+        "price_content": field(".product-price", attr="content"),
+        "regular_price_text": field(".regular-price"),
+    },
+}
+
+BRISTOL_LISTING = {
+    "containers": [".it"],
+    "fields": {
+        "title": field(".info .tit h2"),
+        "price_text": field(".precios .venta .monto"),
+    },
+}
+
+GONZALEZ_GIMENEZ_LISTING = {
+    "containers": [".product"],
+    "fields": {
+        "title": field(".product-title"),
+        # CASH (Contado) price specifically, avoiding installments
+        "price_text": field(".btn-cart-contado .current-price", ".product-price .current-price"),
+        "old_price_text": field(".old-price-contado", ".btn-cart-contado .old-price"),
+    },
+}
+
 class ScraperEngine:
     """Async web scraping boundaries powered by Playwright with stealth overrides."""
+
+    def __init__(self, pool: Optional[BrowserPool] = None):
+        # Shared browser pool; each scrape uses a private one when None
+        self.pool = pool
     
-    async def _configure_stealth(self, context: BrowserContext) -> Page:
+    async def _configure_stealth(self, page: Page) -> Page:
         """Inject runtime configurations to pass bot detection integrity checks."""
-        page = await context.new_page()
         # await stealth_async(page)
         return page
 
@@ -22,11 +66,11 @@ class ScraperEngine:
         logger.info(f"[EXTRACT_START] Commencing operation against Source A (Visuar): {url}")
         products: List[Product] = []
         seen_titles = set()
+        card_count = 0  # cards extracted on the previous pass
         
-        async with async_playwright() as p:
-            browser = await p.chromium.launch(headless=True)
-            context = await browser.new_context()
-            page = await self._configure_stealth(context)
+        async with borrow_pool(self.pool) as pool, pool.page("Visuar") as page:
+            await self._configure_stealth(page)
+            waits = PageWaits(page)
             
             try:
                 await page.goto(url, wait_until='networkidle')
@@ -34,44 +78,26 @@ class ScraperEngine:
                 # Auto-pagination: Extract items, then click "Load More" or "Siguiente"
                 while True:
                     await page.mouse.wheel(0, 2000) # Scroll down to trigger lazy load or reveal button
-                    await page.wait_for_timeout(1000) # Let React/Prestashop breathe
+                    # Let React/Prestashop breathe: until new cards appear or the DOM goes quiet
+                    await waits.count_growth('article.js-product-miniature', card_count, quiet_ms=500, timeout_ms=5000)
                     
-                    # Extract current page items
-                    items = await page.query_selector_all('article.js-product-miniature')
-                    for item in items:
-                        title_el = await item.query_selector('.product-title')
-                        brand_el = await item.query_selector('.product-brand')
-                        price_el = await item.query_selector('.product-price')
-                        regular_price_el = await item.query_selector('.regular-price')
-                        
-                        title = await title_el.inner_text() if title_el else ""
+                    # Extract current page items (one evaluate for the whole page)
+                    cards = await extract(page, VISUAR_LISTING)
+                    card_count = len(cards)
+                    for raw in cards:
+                        title = raw["title"] or ""
                         if not title or title in seen_titles:
                             continue
                             
                         seen_titles.add(title)
                         
-                        brand = await brand_el.inner_text() if brand_el else "Unknown"
-                        if not brand or brand == "Unknown":
+                        brand = raw["brand"] or "Unknown"
+                        if brand == "Unknown":
                             brand_guess = title.split()[0].upper() if title else "Unknown"
                             brand = brand_guess if brand_guess in ['SAMSUNG', 'LG', 'MIDEA', 'JAM', 'WHIRLPOOL', 'CARRIER', 'TOKYO'] else brand
                         
-                        price = 0.0
-                        if price_el:
-                            price_content = await price_el.get_attribute('content')
-                            if price_content:
-                                try:
-                                    price = float(price_content)
-                                except ValueError:
-                                    pass
-                                    
-                        regular_price = None
-                        if regular_price_el:
-                            reg_price_text = await regular_price_el.inner_text()
-                            clean_reg_price = reg_price_text.upper().replace('₲', '').replace('GS', '').replace('.', '').replace(',', '').strip()
-                            try:
-                                regular_price = float(clean_reg_price)
-                            except ValueError:
-                                pass
+                        price = parse_number(raw["price_content"])
+                        regular_price = parse_price(raw["regular_price_text"]) or None
                                     
                         products.append(Product(
                             brand=brand,
@@ -88,7 +114,7 @@ class ScraperEngine:
                         load_more = await page.query_selector('.next.js-search-link, .infinite-scroll-button')
                         if load_more and await load_more.is_visible():
                             await load_more.click()
-                            await page.wait_for_timeout(3000) # Wait for network payload / page reload
+                            await waits.network_idle(re.escape(url.split("?")[0]), idle_ms=500, timeout_ms=10000) # Wait for network payload / page reload
                         else:
                             break # Reached the end of the catalog
                     except Exception:
@@ -96,8 +122,7 @@ class ScraperEngine:
                         
             except Exception as e:
                 logger.error(f"[EXTRACT_FAULT] Source A execution dropped with exception: {str(e)}", exc_info=True)
-            finally:
-                await browser.close()
+            logger.info(f"[WAITS] Source A: {waits.summary()}")
                 
         logger.info(f"[EXTRACT_COMPLETE] Extracted {len(products)} entities from Source A.")
         return products
@@ -110,31 +135,17 @@ class ScraperEngine:
         logger.info(f"[EXTRACT_START] Commencing operation against Source B (Bristol): {url}")
         products: List[Product] = []
         
-        async with async_playwright() as p:
-            browser = await p.chromium.launch(headless=True)
-            context = await browser.new_context()
-            page = await self._configure_stealth(context)
+        async with borrow_pool(self.pool) as pool, pool.page("Bristol") as page:
+            await self._configure_stealth(page)
             
             try:
                 await page.goto(url, wait_until='networkidle')
-                items = await page.query_selector_all('.it')
+                items = await extract(page, BRISTOL_LISTING)
                 logger.info(f"[DATA_DISCOVERY] Surfaced {len(items)} DOM entity containers in Source B")
                 
-                for item in items:
-                    title_el = await item.query_selector('.info .tit h2')
-                    price_el = await item.query_selector('.precios .venta .monto')
-                    
-                    title = await title_el.inner_text() if title_el else ""
-                    
-                    price = 0.0
-                    if price_el:
-                        price_text = await price_el.inner_text()
-                        # Sanitize typical currency payloads
-                        clean_price = price_text.upper().replace('GS', '').replace('.', '').replace(',', '').strip()
-                        try:
-                            price = float(clean_price)
-                        except ValueError:
-                            pass
+                for raw in items:
+                    title = raw["title"] or ""
+                    price = parse_price(raw["price_text"])
                             
                     if title:
                         products.append(Product(
@@ -147,8 +158,6 @@ class ScraperEngine:
                         ))
             except Exception as e:
                 logger.error(f"[EXTRACT_FAULT] Source B execution dropped with exception: {str(e)}", exc_info=True)
-            finally:
-                await browser.close()
                 
         logger.info(f"[EXTRACT_COMPLETE] Extracted {len(products)} entities from Source B.")
         return products
@@ -162,10 +171,9 @@ class ScraperEngine:
         products: List[Product] = []
         seen_titles = set()
         
-        async with async_playwright() as p:
-            browser = await p.chromium.launch(headless=True)
-            context = await browser.new_context()
-            page = await self._configure_stealth(context)
+        async with borrow_pool(self.pool) as pool, pool.page("Gonzalez Gimenez") as page:
+            await self._configure_stealth(page)
+            waits = PageWaits(page)
             
             try:
                 await page.goto(url, wait_until='networkidle')
@@ -176,33 +184,18 @@ class ScraperEngine:
                 
                 while retries < 4:
                     await page.mouse.wheel(0, 4000)
-                    await page.wait_for_timeout(1500)
-                    
-                    items = await page.query_selector_all('.product')
-                    if len(items) == previous_count:
+                    count = await waits.count_growth('.product', previous_count, quiet_ms=1500, timeout_ms=8000)
+                    if count <= previous_count:
                         retries += 1
                     else:
                         retries = 0
-                        previous_count = len(items)
+                        previous_count = count
                 
-                items = await page.query_selector_all('.product')
+                items = await extract(page, GONZALEZ_GIMENEZ_LISTING)
                 logger.info(f"[DATA_DISCOVERY] Surfaced {len(items)} DOM entity containers in Source C after scrolling")
                 
-                for item in items:
-                    title_el = await item.query_selector('.product-title')
-                    # Refined selector to target the CASH (Contado) price specifically, avoiding installments
-                    price_el = await item.query_selector('.btn-cart-contado .current-price')
-                    
-                    if not price_el:
-                        price_el = await item.query_selector('.product-price .current-price')
-                        
-                    old_price_el = await item.query_selector('.old-price-contado')
-                    if not old_price_el:
-                         # Fallback if they use a generic class name inside the contado button
-                         old_price_el = await item.query_selector('.btn-cart-contado .old-price')
-                    
-                    title = await title_el.inner_text() if title_el else ""
-                    title = title.strip()
+                for raw in items:
+                    title = clean_text(raw["title"]) or ""
                     if not title or title in seen_titles:
                         continue
                         
@@ -221,25 +214,8 @@ class ScraperEngine:
                             brand = b
                             break
                     
-                    price = 0.0
-                    if price_el:
-                        price_text = await price_el.inner_text()
-                        # Sanitize: Remove everything that isn't a digit
-                        import re
-                        clean_price = re.sub(r'[^\d]', '', price_text)
-                        try:
-                            price = float(clean_price)
-                        except ValueError:
-                            pass
-                            
-                    regular_price = None
-                    if old_price_el:
-                        old_price_text = await old_price_el.inner_text()
-                        clean_old_price = re.sub(r'[^\d]', '', old_price_text)
-                        try:
-                            regular_price = float(clean_old_price)
-                        except ValueError:
-                            pass
+                    price = parse_price(raw["price_text"])
+                    regular_price = parse_price(raw["old_price_text"]) or None
                             
                     if title and price > 0:
                         products.append(Product(
@@ -253,8 +229,7 @@ class ScraperEngine:
                         ))
             except Exception as e:
                 logger.error(f"[EXTRACT_FAULT] Source C execution dropped with exception: {str(e)}", exc_info=True)
-            finally:
-                await browser.close()
+            logger.info(f"[WAITS] Source C: {waits.summary()}")
                 
         logger.info(f"[EXTRACT_COMPLETE] Extracted {len(products)} entities from Source C.")
         return products